@@ -0,0 +1,279 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Hubitat - Async Runtime © Autolog 2022 - 2023
+#
+
+import asyncio
+import collections
+import concurrent.futures
+import logging
+
+try:
+    import paho.mqtt.client as mqtt
+except ImportError:
+    pass
+
+import sys
+import threading
+import traceback
+import time
+
+from constants import *
+from mqttHandler import reconnect_delay
+
+
+class AsyncRuntime(threading.Thread):
+
+    # This class runs the MQTT Brokers and the Hub, Tasmota and Export handlers in one asyncio event loop, instead of a thread for each, when the
+    #   plugin's 'Single Event Loop' option is set
+    #   MQTT Brokers: each paho client's socket is watched by the event loop (add_reader / add_writer) so the MQTT network traffic of all the
+    #     brokers is handled by this one thread. Received messages are routed to the ingest queues as before.
+    #   Handlers: aren't started as threads. Their queued messages are processed in a small thread pool, as processing is mostly Indigo server
+    #     calls, which must not hold up the event loop. Each handler has a lane: the calls submitted for it run one at a time, in order, so a
+    #     handler still processes its messages in arrival order and is never run by two pool threads at once.
+
+    def __init__(self, pluginGlobals, event):
+        try:
+
+            threading.Thread.__init__(self)
+
+            self.globals = pluginGlobals
+
+            self.asyncRuntimeLogger = logging.getLogger("Plugin.ASYNC")
+
+            self.threadStop = event
+
+            self.loop = None
+            self.loop_ready = threading.Event()  # Set once the event loop is running, so that MQTT Brokers can be added to it
+
+            self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=ASYNC_RUNTIME_WORKERS, thread_name_prefix="Hubitat")
+            self.lanes = dict()  # Deque of (future, function, arguments) still to run, keyed by lane (Hub device id, MQTT Broker device id etc.)
+            self.lanes_lock = threading.Lock()
+
+            # Handlers keyed by handler key (Hub device id, MQTT_TASMOTA_QUEUE or MQTT_EXPORT_QUEUE): (handler, ingest queue)
+            self.handlers = dict()
+            self.handlers_pending = set()  # Handler keys with a call to process their queue submitted but not yet started
+            self.handlers_timers = dict()  # Event loop timer handle of each handler's next housekeeping
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def exception_handler(self, exception_error_message, log_failing_statement):
+        filename, line_number, method, statement = traceback.extract_tb(sys.exc_info()[2])[-1]  # noqa [Ignore duplicate code warning]
+        module = filename.split('/')
+        log_message = f"'{exception_error_message}' in module '{module[-1]}', method '{method}'"
+        if log_failing_statement:
+            log_message = log_message + f"\n   Failing statement [line {line_number}]: '{statement}'"
+        else:
+            log_message = log_message + f" at line {line_number}"
+        self.asyncRuntimeLogger.error(log_message)
+
+    def run(self):
+        try:
+            self.loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self.loop)
+            self.loop_ready.set()
+
+            self.loop.run_until_complete(self.wait_for_stop(self.threadStop, None))
+
+            # Let the MQTT Brokers disconnect (each sees the plugin stopping as its own event is set) and then the handlers finish
+            pending_tasks = asyncio.all_tasks(self.loop)
+            if len(pending_tasks) > 0:
+                self.loop.run_until_complete(asyncio.wait(pending_tasks, timeout=MQTT_SUPERVISOR_INTERVAL))
+            self.executor.shutdown(wait=True)
+            self.loop.close()
+
+            self.asyncRuntimeLogger.debug("Async Runtime Thread close-down commencing.")
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    async def wait_for_stop(self, stop_event, timeout):
+        # Wait until stop_event is set (returning True) or, if a timeout is given, until it has elapsed (returning False)
+        #   Checked every MQTT_NETWORK_LOOP_TIMEOUT, as threading events can't be awaited
+        wake = None if timeout is None else time.monotonic() + timeout
+        while not stop_event.is_set() and not self.threadStop.is_set():
+            if wake is None:
+                await asyncio.sleep(MQTT_NETWORK_LOOP_TIMEOUT)
+                continue
+            remaining = wake - time.monotonic()
+            if remaining <= 0.0:
+                return False
+            await asyncio.sleep(min(remaining, MQTT_NETWORK_LOOP_TIMEOUT))
+        return True
+
+    def submit(self, lane_key, function, *args):
+        # Run function in the thread pool after any functions already submitted for the same lane, returning a concurrent.futures.Future
+        #   Called from any thread
+        future = concurrent.futures.Future()
+        with self.lanes_lock:
+            lane = self.lanes.get(lane_key, None)
+            if lane is not None:
+                lane.append((future, function, args))  # Run by the pool thread already running the lane
+                return future
+            lane = self.lanes[lane_key] = collections.deque([(future, function, args)])
+        self.executor.submit(self.run_lane, lane_key, lane)
+        return future
+
+    def run_lane(self, lane_key, lane):
+        # Run the lane's functions in order until there are none left
+        while True:
+            future, function, args = lane[0]
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(function(*args))
+                except Exception as exception_error:
+                    future.set_exception(exception_error)
+                    self.exception_handler(exception_error, True)  # Log error and display failing statement
+            with self.lanes_lock:
+                lane.popleft()
+                if len(lane) == 0:
+                    del self.lanes[lane_key]
+                    return
+
+    def add_handler(self, handler_key, handler, ingest_queue):
+        # Run a Hub, Tasmota or Export handler (not started as a thread) for messages put on its ingest queue
+        self.loop_ready.wait()
+        self.handlers[handler_key] = (handler, ingest_queue)
+        self.queued(handler_key)  # Messages may have been queued before the handler was added
+
+    def remove_handler(self, handler_key, timeout):
+        # Stop running a handler (its event has been set), waiting up to timeout seconds for it to finish what it is processing and close down
+        handler_and_queue = self.handlers.pop(handler_key, None)
+        if handler_and_queue is None:
+            return
+        self.loop.call_soon_threadsafe(self.cancel_handler_timer, handler_key)
+        try:
+            self.submit(handler_key, handler_and_queue[0].close_down).result(timeout)
+        except concurrent.futures.TimeoutError:
+            pass
+
+    def queued(self, handler_key):
+        # A message has been put on the handler's queue (or its housekeeping is due): have the handler process its queue
+        #   Called from any thread: the MQTT Brokers call it after each message they queue
+        with self.lanes_lock:
+            if handler_key in self.handlers_pending:
+                return  # Still to start processing, so this message will be processed with the others
+            self.handlers_pending.add(handler_key)
+        self.submit(handler_key, self.process_handler_queue, handler_key)
+
+    def process_handler_queue(self, handler_key):
+        # Run in the handler's lane: process its queued messages and housekeeping, then time its next housekeeping
+        with self.lanes_lock:
+            self.handlers_pending.discard(handler_key)
+        handler_and_queue = self.handlers.get(handler_key, None)
+        if handler_and_queue is None:
+            return
+        handler, ingest_queue = handler_and_queue
+        handler.process_queue(0.0)  # Messages queued, or else the housekeeping only
+        while ingest_queue.qsize() > 0 and not handler.threadStop.is_set():
+            handler.process_queue(0.0)
+        if not handler.threadStop.is_set():
+            self.loop.call_soon_threadsafe(self.set_handler_timer, handler_key, handler.queue_timeout())
+
+    def set_handler_timer(self, handler_key, timeout):
+        self.cancel_handler_timer(handler_key)
+        if handler_key in self.handlers:
+            self.handlers_timers[handler_key] = self.loop.call_later(timeout, self.queued, handler_key)
+
+    def cancel_handler_timer(self, handler_key):
+        handler_timer = self.handlers_timers.pop(handler_key, None)
+        if handler_timer is not None:
+            handler_timer.cancel()
+
+    def add_mqtt_broker(self, mqtt_handler):
+        # Run an MQTT Broker (its ThreadMqttHandler isn't started as a thread) as a task of the event loop
+        self.loop_ready.wait()
+        mqtt_handler.runtime = self
+        asyncio.run_coroutine_threadsafe(self.run_mqtt_broker(mqtt_handler), self.loop)
+
+    async def run_mqtt_broker(self, mqtt_handler):
+        # The equivalent of ThreadMqttHandler.run: the network traffic is handled by the event loop as the client's socket becomes readable or
+        #   writable, and the Indigo server calls (in creating the client, on_connect, on_disconnect and housekeeping) are run in the MQTT Broker's lane
+        mqtt_broker_dev_id = mqtt_handler.mqtt_broker_dev_id
+        try:
+            await asyncio.wrap_future(self.submit(mqtt_broker_dev_id, mqtt_handler.create_client))
+            mqtt_client = mqtt_handler.mqtt_client
+
+            mqtt_client.on_connect = lambda *args: self.submit(mqtt_broker_dev_id, mqtt_handler.on_connect, *args)
+            mqtt_client.on_disconnect = lambda *args: self.submit(mqtt_broker_dev_id, mqtt_handler.on_disconnect, *args)
+            # paho calls these from whichever thread opens the socket or publishes, so they are passed to the event loop to action
+            #   The socket's file descriptor is passed as paho closes the socket as soon as on_socket_close returns
+            mqtt_client.on_socket_open = lambda client, userdata, sock: self.loop.call_soon_threadsafe(self.watch_socket, mqtt_handler, sock.fileno())
+            mqtt_client.on_socket_close = lambda client, userdata, sock: self.loop.call_soon_threadsafe(self.unwatch_socket, sock.fileno())
+            mqtt_client.on_socket_register_write = lambda client, userdata, sock: self.loop.call_soon_threadsafe(self.watch_socket_writable, mqtt_handler, sock.fileno())
+            mqtt_client.on_socket_unregister_write = lambda client, userdata, sock: self.loop.call_soon_threadsafe(self.unwatch_socket_writable, sock.fileno())
+
+            housekeeping = None
+            housekeeping_due = time.monotonic() + MQTT_SUPERVISOR_INTERVAL
+            misc_due = time.monotonic() + ASYNC_RUNTIME_MISC_INTERVAL
+            while not mqtt_handler.threadStop.is_set() and not self.threadStop.is_set():
+                if not mqtt_handler.network_connected:
+                    if mqtt_handler.failed_connection_attempts > 0:
+                        delay = reconnect_delay(mqtt_handler.failed_connection_attempts)
+                        mqtt_handler.mqttHandlerLogger.warning(f"Retrying connection to MQTT Broker at {self.globals[MQTT][mqtt_broker_dev_id][MQTT_IP]}:{self.globals[MQTT][mqtt_broker_dev_id][MQTT_PORT]} in {delay:.1f} seconds")
+                        if await self.wait_for_stop(mqtt_handler.threadStop, delay):
+                            break
+                    mqtt_handler.connection_lost = False
+                    mqtt_handler.network_connected = await asyncio.wrap_future(self.submit(mqtt_broker_dev_id, mqtt_handler.connect_to_broker, mqtt_handler.failed_connection_attempts == 0))
+                    mqtt_handler.failed_connection_attempts += 1  # Until on_connect confirms the MQTT Broker has accepted the connection
+                    continue
+
+                await asyncio.sleep(MQTT_NETWORK_LOOP_TIMEOUT)
+
+                now = time.monotonic()
+                if now >= misc_due:
+                    misc_due = now + ASYNC_RUNTIME_MISC_INTERVAL
+                    if mqtt_client.loop_misc() != mqtt.MQTT_ERR_SUCCESS:
+                        mqtt_handler.connection_lost = True
+
+                if mqtt_handler.connection_lost:
+                    # Connection lost or refused - reconnect using the backoff above
+                    self.submit(mqtt_broker_dev_id, mqtt_handler.report_connection_lost)  # After any on_disconnect already submitted by paho
+                    mqtt_handler.network_connected = False
+                    continue
+
+                self.globals[EXPORT][EXPORT_PUBLISHER].drain(mqtt_client, mqtt_broker_dev_id)  # Publish Indigo Export topics deferred by a full window
+
+                if now >= housekeeping_due and (housekeeping is None or housekeeping.done()):
+                    housekeeping_due = now + MQTT_SUPERVISOR_INTERVAL
+                    housekeeping = self.submit(mqtt_broker_dev_id, mqtt_handler.housekeeping)
+
+            mqtt_handler.mqttHandlerLogger.debug("MQTT Handler Task close-down commencing.")
+
+            await asyncio.wrap_future(self.submit(mqtt_broker_dev_id, mqtt_handler.handle_quit))
+            await asyncio.sleep(MQTT_NETWORK_LOOP_TIMEOUT)  # Time for the event loop to send the DISCONNECT, after which paho closes the socket
+            if mqtt_client.socket() is not None:
+                self.unwatch_socket(mqtt_client.socket().fileno())
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def watch_socket(self, mqtt_handler, fd):
+        self.loop.add_reader(fd, self.socket_readable, mqtt_handler)
+
+    def unwatch_socket(self, fd):
+        self.loop.remove_reader(fd)
+        self.loop.remove_writer(fd)
+
+    def watch_socket_writable(self, mqtt_handler, fd):
+        self.loop.add_writer(fd, self.socket_writable, mqtt_handler)
+
+    def unwatch_socket_writable(self, fd):
+        self.loop.remove_writer(fd)
+
+    def socket_readable(self, mqtt_handler):
+        # Received messages are routed (by handle_message) to the ingest queues during loop_read
+        try:
+            if mqtt_handler.mqtt_client.loop_read() != mqtt.MQTT_ERR_SUCCESS:
+                mqtt_handler.connection_lost = True
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def socket_writable(self, mqtt_handler):
+        try:
+            if mqtt_handler.mqtt_client.loop_write() != mqtt.MQTT_ERR_SUCCESS:
+                mqtt_handler.connection_lost = True
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
@@ -49,6 +49,41 @@ HE_STATE_DIM = 36
 HE_STATE_VALVE_LEVEL = 37
 HE_TEMPERATURE = 38
 HE_INDIGO_HUB_ID = 39
+HE_INGEST_PLANS = 59
+HE_HUB_STATISTICS = 60
+HE_STATISTICS_MESSAGES = 61
+HE_STATISTICS_STATE_UPDATES = 62
+HE_STATISTICS_SERVER_ROUND_TRIPS = 63
+HE_LAST_WRITTEN_STATES = 64
+HE_STATISTICS_STATE_UPDATES_SUPPRESSED = 65
+HE_RATE_LIMITS = 66
+HE_STATISTICS_RATE_LIMITED = 67
+HE_STATISTICS_RATE_LIMITED_PUBLISHED = 68
+HE_SECONDARY_DEVICES = 69
+HE_HUB_LAST_MESSAGE = 70
+
+# Modes of the compiled MQTT message log filters: HE_MQTT_FILTERS, TASMOTA_MQTT_FILTERS and EXPORT_FILTERS are (mode, frozenset of device keys)
+MQTT_LOG_FILTER_NONE = 71  # Don't log any devices
+MQTT_LOG_FILTER_ALL = 72  # Log all devices
+MQTT_LOG_FILTER_SELECTED = 73  # Only log devices whose key is in the frozenset
+
+HE_RATE_LIMITED_PROPERTIES = ["Energy", "Illuminance", "Power", "Temperature", "Voltage"]  # Suffix of the 'usp' plugin properties and the Hubitat Elevation Hub 'suppressed...Updates' states
+HE_RATE_LIMITED_STATES_UPDATE_INTERVAL = 60.0  # Seconds between updates of the Hubitat Elevation Hub 'suppressed...Updates' states
+
+# Ingest latency histograms: LATENCY_HISTOGRAMS is keyed by Indigo hub device id, MQTT_TASMOTA_QUEUE or MQTT_EXPORT_QUEUE, each entry being a histogram per stage
+LATENCY_HISTOGRAMS = 74
+LATENCY_STAGE_DECODE = 75  # MQTT message received to queued (MQTT Broker thread)
+LATENCY_STAGE_QUEUE_WAIT = 76  # Queued to taken off the queue by the handler thread
+LATENCY_STAGE_DISPATCH = 77  # Processing by handle_topics
+LATENCY_STAGE_WRITES = 78  # Writing the batched state updates to the Indigo server (Hubitat Hubs only - Tasmota and Export write whilst dispatching)
+LATENCY_STAGE_TOTAL = 79  # MQTT message received to processing complete
+LATENCY_STAGES = (LATENCY_STAGE_DECODE, LATENCY_STAGE_QUEUE_WAIT, LATENCY_STAGE_DISPATCH, LATENCY_STAGE_WRITES, LATENCY_STAGE_TOTAL)
+LATENCY_STAGE_NAMES = {LATENCY_STAGE_DECODE: "Decode", LATENCY_STAGE_QUEUE_WAIT: "Queue Wait", LATENCY_STAGE_DISPATCH: "Dispatch", LATENCY_STAGE_WRITES: "Indigo Writes", LATENCY_STAGE_TOTAL: "End to End"}
+LATENCY_BUCKET_BOUNDS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)  # Seconds
+HE_STATISTICS_LATENCY_PUBLISHED = 80
+HE_LATENCY_STATES_UPDATE_INTERVAL = 60.0  # Seconds between updates of the Hubitat Elevation Hub, Indigo Export and MQTT Broker 'latency...' states
+HE_STATISTICS_RETAINED_MESSAGES = 81
+HE_BOOTSTRAP_BATCH_PERIOD = 2.0  # Maximum seconds that retained message state updates are accumulated before being written to the Indigo server
 
 # HE_VIRTUAL_DEVICES = 40
 # HE_VRTUAL_DEVICE_TYPE = 41
@@ -71,6 +106,24 @@ EXPORT_TOPIC_PROCESSED = 55
 EXPORT_TOPIC_IGNORED = 56
 EXPORT_DEVICES = 57
 STORED_COLOR_MODE = 58
+EXPORT_PUBLISHER = 82  # Publishes Indigo Export topics to the MQTT Brokers
+EXPORT_PUBLISH_WINDOW = 20  # Maximum unacknowledged QoS 1 Indigo Export messages per MQTT Broker
+EXPORT_PUBLISH_ACK_TIMEOUT = 5.0  # Seconds after which a full window of unacknowledged messages is abandoned so that deferred messages are published
+EXPORT_PUBLISH_SENT = 83  # Results of publishing an Indigo Export topic to an MQTT Broker ...
+EXPORT_PUBLISH_UNCHANGED = 84  # ... not published as the MQTT Broker already holds the payload
+EXPORT_PUBLISH_FAILED = 85
+EXPORT_PUBLISH_DEFERRED = 92  # ... to be published by the MQTT Broker thread once the broker's window has room
+EXPORT_PUBLISHED_NODES = 86  # Indigo device ids whose nodes have been published under EXPORT_ROOT_TOPIC_ID (None until the first export is published)
+EXPORT_NODE_TOPICS = 87  # Topics published for each node keyed by node id e.g. dev-12345678 - used to clear the retained topics of a removed node
+EXPORT_CONNECTED = 88  # True if any of the Indigo Export's MQTT Brokers is connected - maintained by the MQTT Broker threads as they connect and disconnect
+EXPORT_INDIGO_DEV_ID = 93  # Indigo device id of the Indigo Export device whilst it is started, otherwise None
+EXPORT_SET_QUIET_PERIOD = 91  # Seconds a debounced Hubitat /set command must be unchanged before it is applied (zero = apply every command)
+EXPORT_SET_QUIET_PERIOD_DEFAULT = 250  # Milliseconds
+EXPORT_DEBOUNCED_SET_PROPERTIES = frozenset(["dim", "color", "color-temperature"])  # Properties set by dragging a Hubitat dashboard slider
+
+DEVICE_UPDATED_ROUTES = 89  # Frozenset of the Indigo device ids that deviceUpdated processes: this plugin's devices and exported devices
+PLUGIN_DEVICE_IDS = 90  # Indigo device ids of this plugin's devices
+DEVICE_UPDATED_BENCHMARK_UPDATES = 10000  # Number of unrelated device updates replayed by the deviceUpdated benchmark
 
 HE_EXPORT_DEVICE_TYPE_ALL = 0
 HE_EXPORT_DEVICE_TYPE_DIMMER = 1
@@ -148,6 +201,7 @@ MQTT_TASMOTA_QUEUE = 512
 MQTT_SUBSCRIBED_TOPICS = 513
 MQTT_PROCESS_COMMAND_HANDLE_TOPICS = 514
 MQTT_PROCESS_COMMAND_HANDLE_STOP_THREAD = 515
+MQTT_PROCESS_COMMAND_HANDLE_RETAINED_TOPICS = 532  # Retained message replayed by the MQTT Broker on subscribing (as opposed to a live event)
 MQTT_CONNECTED = 516
 MQTT_CLIENT_PREFIX = 517
 MQTT_BROKERS = 518
@@ -158,11 +212,38 @@ MQTT_SUBSCRIBE_TO_TASMOTA = 521
 MQTT_PUBLISH_TO_HOMIE = 522
 MQTT_PUBLISH_TO_TASMOTA = 523
 MQTT_PROTOCOL = 524
+MQTT_INGEST_QUEUE_SIZE = 525
+MQTT_INGEST_OVERLOAD_POLICY = 526
+
+# Overload policies applied by the MQTT Broker threads when an ingest queue (MQTT_HUB_QUEUE, MQTT_TASMOTA_QUEUE, MQTT_EXPORT_QUEUE) is full
+MQTT_INGEST_POLICY_BLOCK = 527  # Block the MQTT network loop until the handler thread makes room
+MQTT_INGEST_POLICY_DROP_OLDEST = 528  # Drop the oldest queued message
+MQTT_INGEST_POLICY_COALESCE = 529  # Replace the queued message for the same topic, otherwise drop the oldest queued message
+MQTT_INGEST_POLICIES = {"block": MQTT_INGEST_POLICY_BLOCK, "dropOldest": MQTT_INGEST_POLICY_DROP_OLDEST, "coalesce": MQTT_INGEST_POLICY_COALESCE}
+MQTT_INGEST_QUEUE_SIZE_DEFAULT = 1000  # Maximum number of messages in each ingest queue (zero = unbounded)
+HE_COALESCE_EXEMPT_PROPERTIES = frozenset(["button", "hsmAlert"])  # Hubitat topics whose queued messages are never replaced by a newer message (every event must be processed)
+MQTT_INGEST_STATES_UPDATE_INTERVAL = 10.0  # Seconds between updates of the MQTT Broker 'queue...' states
+
+# MQTT subscription modes: discovery subscribes to everything (MQTT_SUBSCRIBED_TOPICS), operational only to the topics of linked devices
+MQTT_SUBSCRIPTION_MODE_DISCOVERY = 530
+MQTT_SUBSCRIPTION_MODE_OPERATIONAL = 531
+MQTT_SUPERVISOR_INTERVAL = 2.0  # Seconds between MQTT Broker thread housekeeping (state updates, subscription mode, lost connection checks)
+MQTT_NETWORK_LOOP_TIMEOUT = 0.25  # Maximum seconds the MQTT Broker thread waits for network traffic before checking whether it is stopping
+MQTT_RECONNECT_DELAY_MINIMUM = 1.0  # Seconds before the first retry of a failed connection, doubling for each failure ...
+MQTT_RECONNECT_DELAY_MAXIMUM = 120.0  # ... up to this maximum
+MQTT_DISCOVERY_PERIOD = 30.0  # Seconds spent in discovery mode after connecting (or a rediscovery request) to receive the retained topics of all devices
+MQTT_DUPLICATE_FILTER = 533  # Shared by the MQTT Broker threads to suppress messages received through more than one MQTT Broker
+MQTT_DUPLICATE_WINDOW = 2.0  # Seconds within which the same payload for a topic received through another MQTT Broker is a duplicate
+MQTT_SINGLE_EVENT_LOOP = 534  # True to run the MQTT Brokers and handlers in one asyncio event loop (ASYNC_RUNTIME), read from the plugin config when the plugin starts
+ASYNC_RUNTIME = 535  # The AsyncRuntime running the MQTT Brokers and handlers, or None if each runs in its own thread
+ASYNC_RUNTIME_WORKERS = 4  # Threads of the single event loop runtime's pool that run the handlers and other Indigo server calls
+ASYNC_RUNTIME_MISC_INTERVAL = 1.0  # Seconds between calls of each MQTT client's loop_misc (keepalive pings and timeouts) in the single event loop runtime
 
 HE_PROPERTIES_SUPPORTED_BY_DEVICE_TYPES = dict()
 HE_PROPERTIES_SUPPORTED_BY_DEVICE_TYPES["acceleration"] = ["humiditySensor", "illuminanceSensor", "motionSensor", "multiSensor"]
 HE_PROPERTIES_SUPPORTED_BY_DEVICE_TYPES["battery"] = ["button", "contactSensor", "humiditySensor", "illuminanceSensor", "lock", "motionSensor", "multiSensor", "temperatureSensor", "thermostat"]
 HE_PROPERTIES_SUPPORTED_BY_DEVICE_TYPES["button"] = ["button"]
+HE_PROPERTIES_SUPPORTED_BY_DEVICE_TYPES["color"] = ["dimmer"]
 HE_PROPERTIES_SUPPORTED_BY_DEVICE_TYPES["color-mode"] = ["dimmer"]
 HE_PROPERTIES_SUPPORTED_BY_DEVICE_TYPES["color-name"] = ["dimmer"]
 HE_PROPERTIES_SUPPORTED_BY_DEVICE_TYPES["color-temperature"] = ["dimmer"]
@@ -188,6 +269,28 @@ HE_PROPERTIES_SUPPORTED_BY_DEVICE_TYPES["voltage"] = ["button", "contactSensor",
 HE_PROPERTIES_SUPPORTED_BY_DEVICE_TYPES["hsm"] = ["hubitatElevationHub"]
 HE_PROPERTIES_SUPPORTED_BY_DEVICE_TYPES["refresh"] = ["outlet", "thermostat"]
 
+# The Hub handler's property dispatch table is built from HE_PROPERTIES_SUPPORTED_BY_DEVICE_TYPES: each property is received on the topic
+#   'homie/<hub>/<device>/<property>' and handled by handle_property_<property> (with '-' as '_'), except as listed below
+HE_PROPERTY_HANDLER_NAMES = dict()
+HE_PROPERTY_HANDLER_NAMES["mode"] = "handle_property_hvac_mode"
+HE_PROPERTY_HANDLER_NAMES["presence"] = "handle_property_presence_and_radar"  # Published by both presence sensors and the Aqara FP1 radar sensor
+HE_PROPERTY_HANDLER_NAMES["presence-sensor"] = "handle_property_presence"
+HE_PROPERTY_HANDLER_NAMES["state"] = "handle_property_hvac_state"
+HE_PROPERTY_HANDLER_NAMES["thermostat-setpoint"] = "handle_property_setpoint"
+
+HE_PROPERTY_TOPICS = dict()  # The topic properties a property is received on, where that isn't just the property itself
+HE_PROPERTY_TOPICS["battery"] = ["battery", "measure-battery"]
+HE_PROPERTY_TOPICS["energy"] = ["energy", "measure-energy"]
+HE_PROPERTY_TOPICS["hsm"] = []  # Topics starting with 'hsm' are processed before the property dispatch
+HE_PROPERTY_TOPICS["humidity"] = ["humidity", "measure-humidity"]
+HE_PROPERTY_TOPICS["illuminance"] = ["illuminance", "measure-illuminance"]
+HE_PROPERTY_TOPICS["power"] = ["power", "measure-power"]
+HE_PROPERTY_TOPICS["pressure"] = ["pressure", "measure-pressure"]
+HE_PROPERTY_TOPICS["radar"] = ["presence_derived", "presence_event"]
+HE_PROPERTY_TOPICS["refresh"] = []  # Only published to Hubitat
+HE_PROPERTY_TOPICS["temperature"] = ["temperature", "measure-temperature"]
+HE_PROPERTY_TOPICS["voltage"] = ["voltage", "measure-voltage"]
+
 HE_PRIMARY_INDIGO_DEVICE_TYPES_AND_HABITAT_PROPERTIES = dict()
 # HE_PRIMARY_INDIGO_DEVICE_TYPES_AND_HABITAT_PROPERTIES["hubitatElevationHub"] = ["hsm"]
 HE_PRIMARY_INDIGO_DEVICE_TYPES_AND_HABITAT_PROPERTIES["button"] = ["button"]
@@ -0,0 +1,40 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Hubitat - Duplicate Filter © Autolog 2022 - 2023
+#
+
+import collections
+import threading
+import time
+
+from constants import *
+
+
+class DuplicateFilter:
+
+    # This class suppresses copies of an MQTT message received through more than one MQTT Broker e.g. when brokers are bridged together
+    #   A message is a duplicate if the same payload was received for its topic through a different MQTT Broker within MQTT_DUPLICATE_WINDOW
+    #   Repeats received through the same MQTT Broker are never suppressed, as they are real events e.g. a button pushed twice
+    #   Every message accepted for a topic within the window is kept, so copies that arrive interleaved (A:10, A:20, B:10, B:20) are all caught
+    #   and a late copy can't replay an older value over a newer one; entries older than the window are pruned as each topic is checked
+
+    def __init__(self):
+        self.lock = threading.Lock()  # Shared by the MQTT Broker threads
+        self.recently_received = dict()  # Deque of (payload hash, MQTT Broker device id, time received), oldest first, keyed by topic
+
+    def is_duplicate(self, topic, payload, mqtt_broker_dev_id, received=None):
+        if received is None:
+            received = time.monotonic()
+        payload_hash = hash(payload)
+        with self.lock:
+            recently_received = self.recently_received.get(topic, None)
+            if recently_received is None:
+                recently_received = self.recently_received[topic] = collections.deque()
+            while recently_received and (received - recently_received[0][2]) >= MQTT_DUPLICATE_WINDOW:
+                recently_received.popleft()
+            for received_hash, received_mqtt_broker_dev_id, received_time in recently_received:
+                if received_hash == payload_hash and received_mqtt_broker_dev_id != mqtt_broker_dev_id:
+                    return True
+            recently_received.append((payload_hash, mqtt_broker_dev_id, received))
+            return False
@@ -15,9 +15,11 @@ import logging
 import queue
 import sys
 import threading
+import time
 import traceback
 
 from constants import *
+from latencyHistogram import latency_percentile_states, record_ingest_latency
 
 
 def _no_image():
@@ -43,6 +45,14 @@ class ThreadExportHandler(threading.Thread):
 
             self.threadStop = event
 
+            # Debounced /set commands: the latest (time due, topic, topic list, payload) keyed by (Indigo device id, property)
+            self.pending_set_commands = dict()
+            self.set_commands_received = 0
+            self.set_commands_coalesced = 0
+            self.set_commands_dropped = 0  # Held commands not applied as the Indigo Export changed whilst they were held
+
+            self.latency_published = [None, 0.0]  # Message count when the latency states were last written and when
+
         except Exception as exception_error:
             self.exception_handler(exception_error, True)  # Log error and display failing statement
 
@@ -59,16 +69,7 @@ class ThreadExportHandler(threading.Thread):
     def run(self):
         try:
             while not self.threadStop.is_set():
-                try:
-                    mqtt_message_sequence, mqtt_process_command, mqtt_topics, mqtt_topics_list, mqtt_payload = self.globals[QUEUES][MQTT_EXPORT_QUEUE].get(True, 5)
-
-                    if mqtt_process_command == MQTT_PROCESS_COMMAND_HANDLE_TOPICS:
-                        self.handle_topics(mqtt_topics, mqtt_topics_list, mqtt_payload)
-
-                except queue.Empty:
-                    pass
-                except Exception as exception_error:
-                    self.exception_handler(exception_error, True)  # Log error and display failing statement
+                self.process_queue(self.queue_timeout())
             else:
                 if not self.globals[EXPORT][EXPORT_NAME] is None:
 
@@ -76,12 +77,82 @@ class ThreadExportHandler(threading.Thread):
                     # TODO: At this point, queue a recovery for n seconds time
                     # TODO: In the meanwhile, just disable and then enable the Indigo Hubitat Elevation Hub device
 
-            self.exportHandlerLogger.debug("Hub Handler Thread close-down commencing.")
+            self.close_down()
 
         except Exception as exception_error:
             self.exception_handler(exception_error, True)  # Log error and display failing statement
 
-    def handle_topics(self, topics_unsplit, topics_list, payload):  # noqa
+    def queue_timeout(self):
+        # Seconds to wait for the next message before the earliest held /set command is due
+        queue_timeout = 5.0
+        if len(self.pending_set_commands) > 0:
+            queue_timeout = max(0.0, min(queue_timeout, min(pending_set_command[0] for pending_set_command in self.pending_set_commands.values()) - time.monotonic()))
+        return queue_timeout
+
+    def process_queue(self, timeout):
+        # Process the next queued message, waiting up to timeout seconds for one, and then apply the held /set commands now due
+        #   Called repeatedly by run or, if the plugin uses the single event loop, by the AsyncRuntime with a zero timeout whilst messages are queued
+        try:
+            try:
+                mqtt_message_sequence, mqtt_message_received, mqtt_message_enqueued, mqtt_process_command, mqtt_topics, mqtt_topics_list, mqtt_payload = self.globals[QUEUES][MQTT_EXPORT_QUEUE].get(True, timeout)
+
+                if mqtt_process_command == MQTT_PROCESS_COMMAND_HANDLE_TOPICS:
+                    dequeued = time.monotonic()
+                    self.handle_topics(mqtt_topics, mqtt_topics_list, mqtt_payload)
+                    record_ingest_latency(self.globals[LATENCY_HISTOGRAMS][MQTT_EXPORT_QUEUE], mqtt_message_received, mqtt_message_enqueued, dequeued, time.monotonic())
+
+            except queue.Empty:
+                pass
+            except Exception as exception_error:
+                self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+            self.apply_set_commands(due_only=True)
+            self.update_latency_states()
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def update_latency_states(self):
+        try:
+            # Expose the end to end latency percentiles (milliseconds) of /set commands as states of the Indigo Export device, at most once per interval
+            total_histogram = self.globals[LATENCY_HISTOGRAMS][MQTT_EXPORT_QUEUE][LATENCY_STAGE_TOTAL]
+            published_count, published_time = self.latency_published
+            if total_histogram.count == published_count:
+                return
+            now = time.monotonic()
+            if published_count is not None and (now - published_time) < HE_LATENCY_STATES_UPDATE_INTERVAL:
+                return
+            self.latency_published = [total_histogram.count, now]
+
+            export_dev_id = self.globals[EXPORT][EXPORT_INDIGO_DEV_ID]
+            if export_dev_id is None or export_dev_id not in indigo.devices:
+                return
+            latency_states = latency_percentile_states(total_histogram)
+            if len(latency_states) > 0:
+                indigo.devices[export_dev_id].updateStatesOnServer(latency_states)
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def close_down(self):
+        self.apply_set_commands()  # Don't lose the final value of a slider that was being dragged
+
+        self.exportHandlerLogger.debug("Hub Handler Thread close-down commencing.")
+
+    def apply_set_commands(self, dev_id=None, due_only=False):
+        # Apply pending debounced /set commands: those now due, those of one device or (by default) all of them
+        try:
+            now = time.monotonic()
+            for set_command_key, (due, topics_unsplit, topics_list, payload) in list(self.pending_set_commands.items()):
+                if (due_only and due > now) or (dev_id is not None and set_command_key[0] != dev_id):
+                    continue
+                del self.pending_set_commands[set_command_key]
+                self.handle_topics(topics_unsplit, topics_list, payload, False)
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def handle_topics(self, topics_unsplit, topics_list, payload, debounce=True):  # noqa
         # Note that there are a minimum of three topic entries in the topics_list
         try:
             if len(topics_list) != 5:
@@ -99,6 +170,8 @@ class ThreadExportHandler(threading.Thread):
                         subscribed = True
 
             if not subscribed:
+                if not debounce:
+                    self.log_dropped_set_command(topics_unsplit, payload, "no MQTT Broker of the Indigo Export is connected")
                 return
 
             # hub_dev = indigo.devices[hub_id]
@@ -113,8 +186,21 @@ class ThreadExportHandler(threading.Thread):
             dev_id = int(topic_id[4:])  # e.g. 12345678
 
             if dev_id not in self.globals[EXPORT][ENABLED]:
+                if not debounce:
+                    self.log_dropped_set_command(topics_unsplit, payload, "the Indigo device is no longer exported")
                 return
 
+            if debounce:
+                self.set_commands_received += 1
+                if topics_list[3] in EXPORT_DEBOUNCED_SET_PROPERTIES and self.globals[EXPORT_SET_QUIET_PERIOD] > 0.0:
+                    # Hold the command until no newer value has been received for the quiet period, so a dragged slider sends one command to the device
+                    set_command_key = (dev_id, topics_list[3])
+                    if set_command_key in self.pending_set_commands:
+                        self.set_commands_coalesced += 1
+                    self.pending_set_commands[set_command_key] = (time.monotonic() + self.globals[EXPORT_SET_QUIET_PERIOD], topics_unsplit, topics_list, payload)
+                    return
+                self.apply_set_commands(dev_id)  # Keep this device's commands in the order received e.g. a dim held back must not undo a later off
+
             dev = indigo.devices[dev_id]
 
             # self.log_export_topic(topic_id, dev.name, topics_unsplit, payload)
@@ -182,29 +268,26 @@ class ThreadExportHandler(threading.Thread):
         except Exception as exception_error:
             self.exception_handler(exception_error, True)  # Log error and display failing statement
 
+    def log_dropped_set_command(self, topic, payload, reason):
+        # A held (debounced) /set command is re-checked when applied: report it if it can no longer be actioned, as Hubitat believes it was sent
+        self.set_commands_dropped += 1
+        self.exportHandlerLogger.warning(f">>> Dropped held Indigo Exported command as {reason}: Topic='{topic}', Payload='{payload}'")
+
     def log_export_topic(self, device_key, device_name, topic, payload, logging_type):
         try:
             if logging_type == EXPORT_TOPIC_PAYLOAD_ERROR:
                 self.exportHandlerLogger.error(f">>> Received Indigo Exported: Topic='{topic}', INVALID PAYLOAD='{payload}' for '{device_name}'")  # noqa [unresolved attribute reference]
                 return
 
-            log_mqtt_msg = False  # Assume MQTT message should NOT be logged
-            # Check if MQTT message filtering required
-            if EXPORT_FILTERS in self.globals:
-                if len(self.globals[EXPORT_FILTERS]) > 0:
-                    if len(self.globals[EXPORT_FILTERS]) == 1:
-                        if self.globals[EXPORT_FILTERS][0] == "dev-none":
-                            return
-                        elif  self.globals[EXPORT_FILTERS][0] == "dev-all":
-                            log_mqtt_msg = True
-                    else:
-                        # As entries exist in the filter list, only log an MQTT message in Export device in the filter list
-                        if device_key in self.globals[EXPORT_FILTERS]:
-                            log_mqtt_msg = True
+            if not self.exportHandlerLogger.isEnabledFor(LOG_LEVEL_TOPIC) and logging_type == EXPORT_TOPIC_PROCESSED:
+                return
+
+            log_filter_mode, log_filter_keys = self.globals[EXPORT_FILTERS]
+            log_mqtt_msg = log_filter_mode == MQTT_LOG_FILTER_ALL or (log_filter_mode == MQTT_LOG_FILTER_SELECTED and device_key in log_filter_keys)
 
             if log_mqtt_msg:
                 if logging_type == EXPORT_TOPIC_PROCESSED:
-                    self.exportHandlerLogger.topic(f">>> Received Indigo Exported: Topic='{topic}', Payload='{payload}' for '{device_name}'")  # noqa [unresolved attribute reference]
+                    self.exportHandlerLogger.topic(">>> Received Indigo Exported: Topic='%s', Payload='%s' for '%s'", topic, payload, device_name)  # noqa [unresolved attribute reference]
                 else:
                     # Assume EXPORT_TOPIC_IGNORED
                     self.exportHandlerLogger.warning(f">>> Ignoring Received Indigo Exported: Topic='{topic}', Payload='{payload}' for '{device_name}'")  # noqa [unresolved attribute reference]
@@ -0,0 +1,143 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Hubitat - Export Publisher © Autolog 2022 - 2023
+#
+
+try:
+    import paho.mqtt.client as mqtt
+except ImportError:
+    pass
+
+import threading
+import time
+
+from constants import *
+from latencyHistogram import LatencyHistogram
+
+
+class ExportPublisher:
+
+    # This class publishes Indigo Export topics (QoS 1, retained) to the MQTT Brokers, keeping a bounded window of unacknowledged messages per broker
+    #   Topics are published from the plugin thread; the MQTT Broker threads acknowledge them from on_publish as the broker's PUBACKs arrive
+    #   Publishing never blocks the plugin thread: when a broker's window is full, the topic is deferred and the MQTT Broker thread publishes it
+    #   (see drain) as acknowledgements make room, so a large export streams at the rate the broker accepts it
+    #   A topic isn't published if its payload is unchanged from the payload last published to (or retained by) the broker
+
+    def __init__(self, window=EXPORT_PUBLISH_WINDOW):
+        self.window = window
+        self.lock = threading.Lock()  # Shared by the plugin thread and the MQTT Broker threads
+        self.in_flight = dict()  # (time published, MQTTMessageInfo) keyed by message id, keyed by MQTT Broker device id
+        self.deferred = dict()  # Payload keyed by topic in publishing order, keyed by MQTT Broker device id
+        self.draining = set()  # MQTT Broker device ids whose thread is publishing a deferred topic
+        self.last_published = dict()  # Payload text keyed by topic, keyed by MQTT Broker device id - seeded from the broker's retained topics
+        self.requested = 0  # Topics requested to be published
+        self.published = 0  # Topics accepted by paho for sending
+        self.failed = 0  # Topics paho refused to send e.g. as the connection had been lost
+        self.deferrals = 0  # Topics deferred as the broker's window was full
+        self.skipped = 0  # Topics not published as unchanged
+        self.acknowledged = 0
+        self.first_published = None
+        self.last_acknowledged = None
+        self.ack_latency = LatencyHistogram()
+
+    def publish(self, mqtt_client, mqtt_broker_dev_id, topic, payload):
+        # Returns EXPORT_PUBLISH_SENT if the topic was handed to paho for sending, EXPORT_PUBLISH_DEFERRED, EXPORT_PUBLISH_UNCHANGED or EXPORT_PUBLISH_FAILED
+        payload_text = payload if isinstance(payload, str) else str(payload)
+        with self.lock:
+            self.requested += 1
+            if self.last_published.get(mqtt_broker_dev_id, dict()).get(topic, None) == payload_text:
+                self.skipped += 1
+                return EXPORT_PUBLISH_UNCHANGED
+            deferred = self.deferred.setdefault(mqtt_broker_dev_id, dict())
+            if (len(deferred) > 0 or mqtt_broker_dev_id in self.draining  # Topics are published in the order requested
+                    or len(self.sweep(self.in_flight.setdefault(mqtt_broker_dev_id, dict()))) >= self.window):
+                deferred.pop(topic, None)  # A topic deferred again is moved to the end with its latest payload, as it then follows the topics before it
+                deferred[topic] = payload
+                self.last_published.setdefault(mqtt_broker_dev_id, dict())[topic] = payload_text  # What the broker will hold once the topic is published
+                self.deferrals += 1
+                return EXPORT_PUBLISH_DEFERRED
+        return self.send(mqtt_client, mqtt_broker_dev_id, topic, payload)
+
+    def send(self, mqtt_client, mqtt_broker_dev_id, topic, payload):
+        # Called without the lock held, as paho holds its own lock whilst calling on_publish (and so acknowledge) from the MQTT Broker thread
+        message_info = mqtt_client.publish(topic, payload, 1, True)  # n.b. QOS=1 Retain=True
+        now = time.monotonic()
+
+        with self.lock:
+            if message_info.rc != mqtt.MQTT_ERR_SUCCESS:
+                self.failed += 1
+                self.last_published.get(mqtt_broker_dev_id, dict()).pop(topic, None)  # Unknown what the broker holds, so publish the topic next time
+                return EXPORT_PUBLISH_FAILED
+            self.published += 1
+            if self.first_published is None:
+                self.first_published = now
+            self.last_published.setdefault(mqtt_broker_dev_id, dict())[topic] = payload if isinstance(payload, str) else str(payload)
+            if not message_info.is_published():  # Otherwise already acknowledged, before on_publish could match it to this message
+                self.in_flight.setdefault(mqtt_broker_dev_id, dict())[message_info.mid] = (now, message_info)
+        return EXPORT_PUBLISH_SENT
+
+    def drain(self, mqtt_client, mqtt_broker_dev_id):
+        # Called by the MQTT Broker thread after each pass of its network loop: publish deferred topics whilst the broker's window has room
+        while True:
+            with self.lock:
+                deferred = self.deferred.get(mqtt_broker_dev_id, None)
+                if not deferred:
+                    return
+                in_flight = self.sweep(self.in_flight.setdefault(mqtt_broker_dev_id, dict()))
+                if len(in_flight) >= self.window:
+                    oldest_published = min(published_time for published_time, message_info in in_flight.values())
+                    if (time.monotonic() - oldest_published) < EXPORT_PUBLISH_ACK_TIMEOUT:
+                        return
+                    in_flight.clear()  # The broker isn't acknowledging - don't hold up publishing any longer
+                topic = next(iter(deferred))
+                payload = deferred.pop(topic)
+                self.draining.add(mqtt_broker_dev_id)
+            try:
+                self.send(mqtt_client, mqtt_broker_dev_id, topic, payload)
+            finally:
+                with self.lock:
+                    self.draining.discard(mqtt_broker_dev_id)
+
+    def seed(self, mqtt_broker_dev_id, topic, payload):
+        # Called by the MQTT Broker thread with the retained Indigo Export topics received on subscribing
+        #   A topic already published on this connection is left alone, as the retained payload may have been sent before it was replaced
+        with self.lock:
+            self.last_published.setdefault(mqtt_broker_dev_id, dict()).setdefault(topic, payload)
+
+    def acknowledge(self, mqtt_broker_dev_id, mid):
+        # Called by the MQTT Broker thread from on_publish - message ids of other publishes (e.g. Tasmota) aren't in flight and are ignored
+        with self.lock:
+            in_flight_message = self.in_flight.get(mqtt_broker_dev_id, dict()).pop(mid, None)
+            if in_flight_message is None:
+                return
+            self.last_acknowledged = time.monotonic()
+            self.acknowledged += 1
+            self.ack_latency.record(self.last_acknowledged - in_flight_message[0])
+
+    def reset(self, mqtt_broker_dev_id):
+        # Called when the connection to the MQTT Broker is lost or closed, as its unacknowledged messages won't be acknowledged on this connection
+        #   and what it retains is learnt again from the retained topics received on reconnecting (it may have restarted without them)
+        # Deferred topics are kept, to be published by drain once the connection is re-established
+        with self.lock:
+            self.in_flight.pop(mqtt_broker_dev_id, None)
+            self.last_published.pop(mqtt_broker_dev_id, None)
+
+    def sweep(self, in_flight):
+        # Remove messages paho has marked as published whose acknowledgement wasn't matched, returning the messages still in flight
+        for mid, (published_time, message_info) in list(in_flight.items()):
+            if message_info.is_published():
+                del in_flight[mid]
+        return in_flight
+
+    def skip_ratio(self):
+        # Fraction of Indigo Export topics not published as unchanged, out of those published successfully or skipped (failures are excluded)
+        if self.published + self.skipped == 0:
+            return None
+        return self.skipped / (self.published + self.skipped)
+
+    def throughput(self):
+        # Messages acknowledged per second, from the first publish to the latest acknowledgement
+        if self.first_published is None or self.last_acknowledged is None or self.last_acknowledged <= self.first_published:
+            return None
+        return self.acknowledged / (self.last_acknowledged - self.first_published)
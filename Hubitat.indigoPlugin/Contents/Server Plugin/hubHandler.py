@@ -15,9 +15,12 @@ import logging
 import queue
 import sys
 import threading
+import time
 import traceback
 
 from constants import *
+from ingestPlan import IngestPlan
+from latencyHistogram import latency_percentile_states, new_latency_histograms, record_ingest_latency
 
 
 def _no_image():
@@ -39,10 +42,65 @@ class ThreadHubHandler(threading.Thread):
 
             self.globals = pluginGlobals
 
+            self.hubitat_hub_id = hubitat_hub_id
+            self.hub_queue = self.globals[QUEUES][MQTT_HUB_QUEUE][hubitat_hub_id]  # Queue dedicated to this Hubitat Hub
+
             self.hubHandlerLogger = logging.getLogger("Plugin.HE_HUB")
 
+            # Dispatch table of Hubitat property (fourth topic level e.g. 'homie/home-1/study-lamp/dim') to its handler method, built from the
+            #   supported properties so that a new property only needs its entry in HE_PROPERTIES_SUPPORTED_BY_DEVICE_TYPES and its handler method
+            self.property_handlers = dict()
+            for hubitat_property in HE_PROPERTIES_SUPPORTED_BY_DEVICE_TYPES:
+                for topic_property in HE_PROPERTY_TOPICS.get(hubitat_property, [hubitat_property]):
+                    handler_name = HE_PROPERTY_HANDLER_NAMES.get(hubitat_property, f"handle_property_{hubitat_property.replace('-', '_')}")
+                    self.property_handlers[topic_property] = getattr(self, handler_name)
+
             self.threadStop = event
 
+            # State updates for each Indigo device, accumulated whilst processing a message and then written to the Indigo server together
+            self.pending_state_updates = dict()
+
+            self.statistics = dict()
+            self.statistics[HE_STATISTICS_MESSAGES] = 0
+            self.statistics[HE_STATISTICS_STATE_UPDATES] = 0  # Number of state and state image updates requested
+            self.statistics[HE_STATISTICS_SERVER_ROUND_TRIPS] = 0  # Number of calls made to the Indigo server to action them
+            self.statistics[HE_STATISTICS_STATE_UPDATES_SUPPRESSED] = 0  # Number of state and state image updates not written as the value was unchanged
+            self.statistics[HE_STATISTICS_RETAINED_MESSAGES] = 0  # Number of retained messages ingested as part of a bootstrap snapshot
+            self.statistics[HE_STATISTICS_RATE_LIMITED] = dict()  # Number of property updates suppressed by deadband / minimum interval, keyed by property
+            for rate_limited_property in HE_RATE_LIMITED_PROPERTIES:
+                self.statistics[HE_STATISTICS_RATE_LIMITED][rate_limited_property] = 0
+            self.statistics[HE_STATISTICS_RATE_LIMITED_PUBLISHED] = [None, 0.0]  # Counts last written to the Hubitat Elevation Hub device states and when
+            self.statistics[HE_STATISTICS_LATENCY_PUBLISHED] = [None, 0.0]  # Message count when the latency states were last written and when
+            self.globals[HE_HUB_STATISTICS][hubitat_hub_id] = self.statistics
+
+            self.latency_histograms = new_latency_histograms()
+            self.globals[LATENCY_HISTOGRAMS][hubitat_hub_id] = self.latency_histograms
+
+            # Most recent Hubitat device message - always kept in memory but only sampled into the hub device's lastTopic / lastPayload states
+            self.last_message = (None, None)
+            self.last_message_hub_dev = None
+            self.last_message_interval = 0.0
+            self.last_message_pending = False
+            self.last_message_published = 0.0
+
+            # Property updates held back by a minimum update interval, keyed by (Indigo device id, property): the latest held message is replayed
+            #   through the property handler once the interval has elapsed. Whilst replaying, only that device and property is updated.
+            self.rate_limited_pending = dict()
+            self.rate_limited_replay = None
+            self.rate_limited_handlers = dict()
+            self.rate_limited_handlers["Energy"] = self.handle_property_energy
+            self.rate_limited_handlers["Illuminance"] = self.handle_property_illuminance
+            self.rate_limited_handlers["Power"] = self.handle_property_power
+            self.rate_limited_handlers["Temperature"] = self.handle_property_temperature
+            self.rate_limited_handlers["Voltage"] = self.handle_property_voltage
+
+            # Retained message bootstrap: set whilst a retained message is handled, and when the current batch of retained messages started
+            self.bootstrapping = False
+            self.bootstrap_started = None
+
+            # Log filter decision for each Hubitat device, valid whilst the compiled filter it was derived from is current
+            self.log_filter_decisions = (None, dict())
+
         except Exception as exception_error:
             self.exception_handler(exception_error, True)  # Log error and display failing statement
 
@@ -59,26 +117,74 @@ class ThreadHubHandler(threading.Thread):
     def run(self):
         try:
             while not self.threadStop.is_set():
-                try:
-                    mqtt_message_sequence, mqtt_process_command, mqtt_hub_id, mqtt_topics, mqtt_topics_list, mqtt_payload = self.globals[QUEUES][MQTT_HUB_QUEUE].get(True, 5)
-
-                    if mqtt_process_command == MQTT_PROCESS_COMMAND_HANDLE_TOPICS:
-                        self.handle_topics(mqtt_hub_id, mqtt_topics, mqtt_topics_list, mqtt_payload)
-
-                except queue.Empty:
-                    pass
-                except Exception as exception_error:
-                    self.exception_handler(exception_error, True)  # Log error and display failing statement
+                self.process_queue(self.queue_timeout())
             else:
                 pass
                 # TODO: At this point, queue a recovery for n seconds time
                 # TODO: In the meanwhile, just disable and then enable the Indigo Hubitat Elevation Hub device
 
-            self.hubHandlerLogger.debug("Hub Handler Thread close-down commencing.")
+            self.close_down()
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def queue_timeout(self):
+        # Seconds to wait for the next message before housekeeping (held updates, states) is due
+        return self.rate_limited_pending_timeout()
+
+    def process_queue(self, timeout):
+        # Process the next queued message, waiting up to timeout seconds for one, and then the housekeeping
+        #   Called repeatedly by run or, if the plugin uses the single event loop, by the AsyncRuntime with a zero timeout whilst messages are queued
+        try:
+            try:
+                mqtt_message_sequence, mqtt_message_received, mqtt_message_enqueued, mqtt_process_command, mqtt_hub_id, mqtt_topics, mqtt_topics_list, mqtt_payload = self.hub_queue.get(True, timeout)
+
+                if mqtt_process_command == MQTT_PROCESS_COMMAND_HANDLE_TOPICS:
+                    dequeued = time.monotonic()
+                    self.statistics[HE_STATISTICS_MESSAGES] += 1
+                    self.handle_topics(mqtt_hub_id, mqtt_topics, mqtt_topics_list, mqtt_payload)
+                    dispatched = time.monotonic()
+                    self.flush_state_updates()  # Also writes any retained snapshot updates accumulated so far
+                    self.bootstrap_started = None
+                    record_ingest_latency(self.latency_histograms, mqtt_message_received, mqtt_message_enqueued, dequeued, dispatched, time.monotonic())
+
+                elif mqtt_process_command == MQTT_PROCESS_COMMAND_HANDLE_RETAINED_TOPICS:
+                    # Retained snapshot replayed by the MQTT Broker: state updates accumulate across messages (so only the final value of each
+                    #   state is written, in one call per device) and broadcast log lines are suppressed as these aren't live events
+                    dequeued = time.monotonic()
+                    if self.bootstrap_started is None:
+                        self.bootstrap_started = dequeued
+                    self.statistics[HE_STATISTICS_MESSAGES] += 1
+                    self.statistics[HE_STATISTICS_RETAINED_MESSAGES] += 1
+                    self.bootstrapping = True
+                    try:
+                        self.handle_topics(mqtt_hub_id, mqtt_topics, mqtt_topics_list, mqtt_payload)
+                    finally:
+                        self.bootstrapping = False
+                    record_ingest_latency(self.latency_histograms, mqtt_message_received, mqtt_message_enqueued, dequeued, time.monotonic())
+
+            except queue.Empty:
+                pass
+            except Exception as exception_error:
+                self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+            if self.bootstrap_started is not None:
+                if self.hub_queue.qsize() > 0 and (time.monotonic() - self.bootstrap_started) < HE_BOOTSTRAP_BATCH_PERIOD:
+                    return  # More of the retained snapshot to accumulate before writing
+                self.bootstrap_started = None
+
+            self.update_rate_limited_pending()
+            self.update_rate_limited_states()
+            self.update_latency_states()
+            self.update_last_message_states()
+            self.flush_state_updates()
 
         except Exception as exception_error:
             self.exception_handler(exception_error, True)  # Log error and display failing statement
 
+    def close_down(self):
+        self.hubHandlerLogger.debug("Hub Handler Thread close-down commencing.")
+
     def handle_topics(self, hub_id, topics, topics_list, payload):
         # print(f"Payload Type: {type(payload)}")
         try:
@@ -107,12 +213,12 @@ class ThreadHubHandler(threading.Thread):
                 return
 
             if hub_dev.states["status"] == "disconnected":
-                hub_dev.updateStateOnServer(key=u'status', value="connected")
-                hub_dev.updateStateImageOnServer(indigo.kStateImageSel.SensorOn)
+                self.update_state(hub_dev, key='status', value="connected")
+                self.update_state_image(hub_dev, indigo.kStateImageSel.SensorOn)
 
             if len(topics_list) == 3 and topics_list[2] == "$heartbeat":
                 heartbeat = int(payload.split(",")[0])
-                hub_dev.updateStateOnServer(key='heartbeat', value=heartbeat)
+                self.update_state(hub_dev, key='heartbeat', value=heartbeat)
                 return
             elif topics_list[2] == "$fw":
                 return
@@ -125,71 +231,55 @@ class ThreadHubHandler(threading.Thread):
 
             # At this point it should be a Hubitat device (including 'hub')
 
-            keyValueList = [
-                {'key': 'lastTopic', 'value': topics},
-                {'key': 'lastPayload', 'value': payload}
-            ]
-            indigo.devices[hub_id].updateStatesOnServer(keyValueList)
+            self.record_last_message(hub_dev, topics, payload)
 
             hubitat_device_name = topics_list[2]
 
-            log_mqtt_msg = True  # Assume MQTT message should be logged
-            # Check if MQTT message filtering required
-            if HE_MQTT_FILTERS in self.globals:
-                if len(self.globals[HE_MQTT_FILTERS]) > 0:
-                    mqtt_filter_key = f"{hub_name.lower()}|||{hubitat_device_name.lower()}"
-                    # As entries exist in the filter list, only log MQTT message in Hubitat device in the filter list
-                    if mqtt_filter_key not in self.globals[HE_MQTT_FILTERS]:
-                        log_mqtt_msg = False  # As Hubitat device not in the filter list (and filter entries present) - don't log MQTT message
-
-            if log_mqtt_msg:
-                self.hubHandlerLogger.topic(f"Received from '{hub_name}': Topic='{topics_list}', Payload='{payload}'")
-
-            mqtt_filter_key = f"{hub_name.lower()}|{hubitat_device_name.lower()}"
-            self.mqtt_filter_log_processing(mqtt_filter_key, hub_name, topics, payload)
+            self.mqtt_filter_log_processing(hub_name, hubitat_device_name, topics, payload)
 
             if len(topics_list) == 3:
                 return
 
             if topics_list[2] == "hub":
                 if topics_list[3][0:3] == "hsm":  # Check if topic starts with "hsm"
-                    hub_props = hub_dev.ownerProps
-                    if "hubitatPropertyHsm" in hub_props:
-                        if hub_props["hubitatPropertyHsm"] is not True:
-                            hub_props["hubitatPropertyHsm"] = True
-                            hub_dev.replacePluginPropsOnServer(hub_props)
+                    hub_plan = self.ingest_plan(hub_dev)
+                    if hub_plan.hsm_property is not None:
+                        if hub_plan.hsm_property is not True:
+                            hub_owner_props = hub_dev.ownerProps
+                            hub_owner_props["hubitatPropertyHsm"] = True
+                            hub_dev.replacePluginPropsOnServer(hub_owner_props)
                         # Check for HSM secondary device
                         linked_dev_id = self.determine_secondary_device_id(hub_id, "hsmSensorSecondary")
                         if bool(linked_dev_id):
                             hsm_dev = indigo.devices[linked_dev_id]
 
                             if topics_list[3] == "hsmStatus" and len(topics_list) == 4:
-                                hsm_dev.updateStateOnServer(key='hsmStatus', value=payload)
+                                self.update_state(hsm_dev, key='hsmStatus', value=payload)
                                 if payload == "disarmed":
-                                    hsm_dev.updateStateImageOnServer(indigo.kStateImageSel.SensorOff)
+                                    self.update_state_image(hsm_dev, indigo.kStateImageSel.SensorOff)
                                 elif payload[0:5] == "armed":
-                                    hsm_dev.updateStateImageOnServer(indigo.kStateImageSel.SensorOn)
+                                    self.update_state_image(hsm_dev, indigo.kStateImageSel.SensorOn)
                                     # hsm_dev.updateStateOnServer(key='alarmStatus', value=payload)
                                 if hsm_dev.states["hsmAlert"] == "cancel" or hsm_dev.states["hsmAlert"] == "none" or payload == "disarmed":
-                                    hsm_dev.updateStateOnServer(key='alarmStatus', value=payload)
-                                if not bool(hub_dev.pluginProps.get("hideHsmBroadcast", False)):
-                                    self.hubHandlerLogger.info(f"received \"{hsm_dev.name}\" Hubitat Safety Monitor Status \"{payload}\" event")
+                                    self.update_state(hsm_dev, key='alarmStatus', value=payload)
+                                if hub_plan.properties["Hsm"].broadcast:
+                                    self.log_broadcast(f"received \"{hsm_dev.name}\" Hubitat Safety Monitor Status \"{payload}\" event")
 
                             elif topics_list[3] == "hsmAlert" and len(topics_list) == 4:
-                                hsm_dev.updateStateOnServer(key='hsmAlert', value=payload)
+                                self.update_state(hsm_dev, key='hsmAlert', value=payload)
                                 if payload == "cancel" or payload == "none":
                                     hsm_status = hsm_dev.states["hsmStatus"]
-                                    hsm_dev.updateStateOnServer(key='alarmStatus', value=hsm_status)
+                                    self.update_state(hsm_dev, key='alarmStatus', value=hsm_status)
                                 else:
-                                    hsm_dev.updateStateImageOnServer(indigo.kStateImageSel.SensorTripped)
-                                    hsm_dev.updateStateOnServer(key='alarmStatus', value=payload)
-                                if not bool(hub_dev.pluginProps.get("hideHsmBroadcast", False)):
-                                    self.hubHandlerLogger.info(f"received \"{hsm_dev.name}\" Hubitat Safety Monitor Alert \"{payload}\" event")
+                                    self.update_state_image(hsm_dev, indigo.kStateImageSel.SensorTripped)
+                                    self.update_state(hsm_dev, key='alarmStatus', value=payload)
+                                if hub_plan.properties["Hsm"].broadcast:
+                                    self.log_broadcast(f"received \"{hsm_dev.name}\" Hubitat Safety Monitor Alert \"{payload}\" event")
 
                             elif topics_list[3] == "hsmArm" and len(topics_list) == 4:
-                                hsm_dev.updateStateOnServer(key='hsmArm', value=payload)
-                                if not bool(hub_dev.pluginProps.get("hideHsmBroadcast", False)):
-                                    self.hubHandlerLogger.info(f"received \"{hsm_dev.name}\" Hubitat Safety Monitor Arm \"{payload}\" event")
+                                self.update_state(hsm_dev, key='hsmArm', value=payload)
+                                if hub_plan.properties["Hsm"].broadcast:
+                                    self.log_broadcast(f"received \"{hsm_dev.name}\" Hubitat Safety Monitor Arm \"{payload}\" event")
                 return
 
             # if hubitat_device_name == "Presence Sensor 1":  # Testing Debug to add breakpoint for specific device
@@ -214,886 +304,1255 @@ class ThreadHubHandler(threading.Thread):
                 self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_DEVICE_DRIVER] = payload
                 return
 
-            # Check for Acceleration
-            if topics_list[3] == "acceleration":
-                if len(topics_list) == 5 and topics_list[4] == "status":
-                    with self.globals[LOCK_HE_LINKED_INDIGO_DEVICES]:
-                        for dev_id in self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES]:
-                            dev = indigo.devices[dev_id]
-                            if dev.pluginProps.get("uspAcceleration", False):
-                                uiValue = payload
-                                if uiValue == "active":
-                                    value = True
-                                elif uiValue == "inactive":
-                                    value = False
-                                else:
-                                    return
-
-                                uspAccelerationIndigo = dev.pluginProps.get("uspAccelerationIndigo", INDIGO_PRIMARY_DEVICE_ADDITIONAL_STATE)
-
-                                broadcast_device_name = dev.name
-                                if uspAccelerationIndigo == INDIGO_PRIMARY_DEVICE_ADDITIONAL_STATE:
-                                    dev.updateStateOnServer(key='acceleration', value=value, uiValue=uiValue)
-                                elif uspAccelerationIndigo == INDIGO_SECONDARY_DEVICE:
-                                    # Find linked device in device group
-                                    linked_dev_id = self.determine_secondary_device_id(dev_id, "accelerationSensorSecondary")
-                                    if bool(linked_dev_id):
-                                        linked_dev = indigo.devices[linked_dev_id]
-                                        linked_dev.updateStateOnServer(key='onOffState', value=value, uiValue=uiValue)
-                                        if value:
-                                            linked_dev.updateStateImageOnServer(indigo.kStateImageSel.SensorOn)
-                                        else:
-                                            linked_dev.updateStateImageOnServer(indigo.kStateImageSel.SensorOff)
-                                        broadcast_device_name = linked_dev.name
-                                else:
-                                    self.hubHandlerLogger.error(f"received \"{broadcast_device_name}\" acceleration update but unable to determine how to store update?")
-                                    return
-
-                                if not bool(dev.pluginProps.get("hideAccelerationBroadcast", False)):
-                                    self.hubHandlerLogger.info(f"received \"{broadcast_device_name}\" acceleration sensor \"{uiValue}\" event")
-
-            # Check for Battery
-            elif (topics_list[3] == "measure-battery" or topics_list[3] == "battery") and len(topics_list) == 4:
-                with self.globals[LOCK_HE_LINKED_INDIGO_DEVICES]:
-                    for dev_id in self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES]:
-                        dev = indigo.devices[dev_id]
-                        if dev.pluginProps.get("SupportsBatteryLevel", False):
-                            try:
-                                battery_level = int(payload)
-                            except ValueError:
-                                try:
-                                    battery_level = int(float(payload))
-                                except ValueError:
-                                    self.hubHandlerLogger.warning(f"received battery level event with an invalid payload of \"{payload}\" for device \"{dev.name}\". Event discarded and ignored.")
-                                    return
-
-                            if dev.states["batteryLevel"] != battery_level:
-                                dev.updateStateOnServer(key='batteryLevel', value=battery_level)
-                                self.hubHandlerLogger.info(f"received \"{dev.name}\" status update battery level {battery_level}")
-                            # else:
-                            #     self.hubHandlerLogger.info(f"received \"{dev.name}\" status update for unchanged battery level {battery_level}")
-
-            # Check for Button
-            elif topics_list[3] == "button":
-                with self.globals[LOCK_HE_LINKED_INDIGO_DEVICES]:
-                    for dev_id in self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES]:
-                        dev = indigo.devices[dev_id]
-                        if bool(dev.pluginProps.get("uspButton", False)):
-                            if len(topics_list) == 5 and topics_list[4][0:7] == "button-":
-                                button_number = topics_list[4].split("-")[1]
-                                button_state_id = f"button_{button_number}"
-                                if int(button_number) <= int(dev.pluginProps.get("uspNumberOfButtons", 1)):
-                                    dev.updateStateOnServer(key=button_state_id, value=payload)
-                                    if payload == "idle":
-                                        dev.updateStateImageOnServer(indigo.kStateImageSel.SensorOff)
-                                    else:
-                                        dev.updateStateImageOnServer(indigo.kStateImageSel.SensorOn)
-                                    button_ui = f"Button {button_number}"
-                                    dev.updateStateOnServer(key="lastButtonPressed", value=button_number, uiValue=button_ui)
-                                    if not bool(dev.pluginProps.get("hideButtonBroadcast", False)):
-                                        self.hubHandlerLogger.info(f"received \"{dev.name}\" button {button_number} {payload} event")
-                                else:
-                                    self.hubHandlerLogger.warning(f"received \"{dev.name}\" unsupported button {button_number} {payload} event")
-
-            # Check for Color Mode
-            elif topics_list[3] == "color-mode":
-                with self.globals[LOCK_HE_LINKED_INDIGO_DEVICES]:
-                    for dev_id in self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES]:
-                        dev = indigo.devices[dev_id]
-                        if bool(dev.pluginProps.get("uspColorRGB", False)) or bool(dev.pluginProps.get("uspWhiteTemperature", False)):
-                            color_mode_ui = f"{payload} Unknown"
-                            if payload == "CT":
-                                color_mode_ui = "Color Temperature"
-                            elif payload == "RGB":
-                                color_mode_ui = "Red/Green/Blue"
-                            dev.updateStateOnServer(key="colorMode", value=payload, uiValue=color_mode_ui)
-
-            # Check for Color Name
-            elif topics_list[3] == "color-name":
-                with self.globals[LOCK_HE_LINKED_INDIGO_DEVICES]:
-                    for dev_id in self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES]:
-                        dev = indigo.devices[dev_id]
-                        if bool(dev.pluginProps.get("uspColorRGB", False)) or bool(dev.pluginProps.get("uspWhiteTemperature", False)):
-                            color_name = f"{payload}"
-                            dev.updateStateOnServer(key="colorName", value=color_name)
-
-            # Check for Color
-            elif topics_list[3] == "color":
-                # if len(topics_list) == 5 and topics_list[4] == "rgb":
-                #     with self.globals[LOCK_HE_LINKED_INDIGO_DEVICES]:
-                #         for dev_id in self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES]:
-                #             dev = indigo.devices[dev_id]
-                #             if bool(dev.pluginProps.get("uspColorRGB", False)):
-                #                 try:
-                #                     if len(payload) != 7 or payload[0] != "#":
-                #                         return
-                #                     hex_string = payload[1:]
-                #                     rgb = bytearray.fromhex(hex_string)
-                #                     red, green, blue = list(rgb)
-                #                     red = int((float(red) / 256.0) * 100.0)
-                #                     green = int((float(green) / 256.0) * 100.0)
-                #                     blue = int((float(blue) / 256.0) * 100.0)
-                #                 except ValueError:
-                #                     return
-                #                 key_value_list = list()
-                #                 key_value_list.append({"key": "redLevel", "value": red})
-                #                 key_value_list.append({"key": "greenLevel", "value": green})
-                #                 key_value_list.append({"key": "blueLevel", "value": blue})
-                #                 dev.updateStatesOnServer(key_value_list)
-                if len(topics_list) == 4:
-                    # Assume HSV format published from HE for the moment!
-
-                    with self.globals[LOCK_HE_LINKED_INDIGO_DEVICES]:
-                        for dev_id in self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES]:
-                            dev = indigo.devices[dev_id]
-                            if bool(dev.pluginProps.get("uspColorRGB", False)):
-
-                                hue, saturation, value = payload.split(",")
-
-                                # def hsv2rgb(h, s, v):  # https://stackoverflow.com/questions/24852345/hsv-to-rgb-color-conversion
-                                #     return tuple(round(i * 100) for i in colorsys.hsv_to_rgb(h, s, v))
-
-                                try:
-                                    hue = int(hue) / 360.0  # TODO: SHOULD THIS BE FLOAT ???
-                                    saturation = int(saturation) / 100.0
-                                    value = int(value) / 100.0
-                                    red, green, blue = colorsys.hsv_to_rgb(hue, saturation, value)
-                                    red = int(red * 100.0)
-                                    green = int(green * 100.0)
-                                    blue = int(blue * 100.0)
-                                except Exception:
-                                    return
-
-                                # red, green, blue = hsv2rgb(int(hue), int(saturation), int(value))
-                                key_value_list = list()
-                                key_value_list.append({"key": "redLevel", "value": red})
-                                key_value_list.append({"key": "greenLevel", "value": green})
-                                key_value_list.append({"key": "blueLevel", "value": blue})
-                                dev.updateStatesOnServer(key_value_list)
-
-            # Check for Color Temperature
-            elif topics_list[3] == "color-temperature" and len(topics_list) == 4:
-                with self.globals[LOCK_HE_LINKED_INDIGO_DEVICES]:
-                    for dev_id in self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES]:
-                        dev = indigo.devices[dev_id]
-                        if bool(dev.pluginProps.get("uspWhiteTemperature", False)):
-                            try:
-                                white_temperature = int(payload)
-                                white_temperature_ui = f"{payload}°K"
-                            except ValueError:
-                                return
-                            dev.updateStateOnServer(key="whiteTemperature", value=white_temperature, uiValue=white_temperature_ui)
-
-            # Check for Contact
-            elif topics_list[3] == "contact":
-                if len(topics_list) == 5 and topics_list[4] == "status":
-                    with self.globals[LOCK_HE_LINKED_INDIGO_DEVICES]:
-                        for dev_id in self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES]:
-                            dev = indigo.devices[dev_id]
-                            if dev.pluginProps.get("uspContact", False):
-                                if payload == "open":
-                                    dev.updateStateOnServer(key="onOffState", value=True)
-                                    if topics_list[3] in HE_PRIMARY_INDIGO_DEVICE_TYPES_AND_HABITAT_PROPERTIES[dev.deviceTypeId]:
-                                        dev.updateStateImageOnServer(indigo.kStateImageSel.SensorOn)
-                                else:
-                                    dev.updateStateOnServer(key="onOffState", value=False)
-                                    if topics_list[3] in HE_PRIMARY_INDIGO_DEVICE_TYPES_AND_HABITAT_PROPERTIES[dev.deviceTypeId]:
-                                        dev.updateStateImageOnServer(indigo.kStateImageSel.SensorOff)
-                                if not bool(dev.pluginProps.get("hideContactBroadcast", False)):
-                                    self.hubHandlerLogger.info(f"received \"{dev.name}\" contact sensor \"{payload}\" event")
-
-            # Check for POSITION
-            elif topics_list[3] == "position" and len(topics_list) == 4:  # Checking that this isn't a message from the plugin to set the value; topic would be '.../position/set'
-                with self.globals[LOCK_HE_LINKED_INDIGO_DEVICES]:
-                    for dev_id in self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES]:
-                        dev = indigo.devices[dev_id]
-                        if dev.subType != indigo.kDimmerDeviceSubType.Blind:
-                            continue
-
-                        if bool(dev.pluginProps.get("uspPosition", False)):
-                            try:
-                                brightness_level = int(payload)
-                                brightness_level_ui = f"{brightness_level}%"
-                            except ValueError:
-                                return
+            property_handler = self.property_handlers.get(topics_list[3], None)
+            if property_handler is not None:
+                property_handler(hub_name, hubitat_device_name, topics_list, payload)
 
-                            self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_STATES][HE_STATE_DIM] = brightness_level
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
 
-                            brighten_dim_ui = "set"
-                            if brightness_level > 0:
-                                if brightness_level > dev.brightness:
-                                    brighten_dim_ui = "opened"
+    def handle_property_acceleration(self, hub_name, hubitat_device_name, topics_list, payload):
+        try:
+            if len(topics_list) == 5 and topics_list[4] == "status":
+                for dev_id in self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES]:
+                    dev = indigo.devices[dev_id]
+                    dev_plan = self.ingest_plan(dev)
+                    if dev_plan.properties["Acceleration"].enabled:
+                        uiValue = payload
+                        if uiValue == "active":
+                            value = True
+                        elif uiValue == "inactive":
+                            value = False
+                        else:
+                            return
+
+                        uspAccelerationIndigo = dev_plan.properties["Acceleration"].storage
+
+                        broadcast_device_name = dev.name
+                        if uspAccelerationIndigo == INDIGO_PRIMARY_DEVICE_ADDITIONAL_STATE:
+                            self.update_state(dev, key='acceleration', value=value, uiValue=uiValue)
+                        elif uspAccelerationIndigo == INDIGO_SECONDARY_DEVICE:
+                            # Find linked device in device group
+                            linked_dev_id = self.determine_secondary_device_id(dev_id, "accelerationSensorSecondary")
+                            if bool(linked_dev_id):
+                                linked_dev = indigo.devices[linked_dev_id]
+                                self.update_state(linked_dev, key='onOffState', value=value, uiValue=uiValue)
+                                if value:
+                                    self.update_state_image(linked_dev, indigo.kStateImageSel.SensorOn)
                                 else:
-                                    brighten_dim_ui = "closed"
+                                    self.update_state_image(linked_dev, indigo.kStateImageSel.SensorOff)
+                                broadcast_device_name = linked_dev.name
+                        else:
+                            self.hubHandlerLogger.error(f"received \"{broadcast_device_name}\" acceleration update but unable to determine how to store update?")
+                            return
+
+                        if dev_plan.properties["Acceleration"].broadcast:
+                            self.log_broadcast(f"received \"{broadcast_device_name}\" acceleration sensor \"{uiValue}\" event")
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
 
-                            if brightness_level > 0:
-                                dev.updateStateImageOnServer(indigo.kStateImageSel.DimmerOn)
+    def handle_property_battery(self, hub_name, hubitat_device_name, topics_list, payload):
+        try:
+            if len(topics_list) != 4:
+                return
+
+            for dev_id in self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES]:
+                dev = indigo.devices[dev_id]
+                dev_plan = self.ingest_plan(dev)
+                if dev_plan.supports_battery_level:
+                    try:
+                        battery_level = int(payload)
+                    except ValueError:
+                        try:
+                            battery_level = int(float(payload))
+                        except ValueError:
+                            self.hubHandlerLogger.warning(f"received battery level event with an invalid payload of \"{payload}\" for device \"{dev.name}\". Event discarded and ignored.")
+                            return
+
+                    if dev.states["batteryLevel"] != battery_level:
+                        self.update_state(dev, key='batteryLevel', value=battery_level)
+                        self.log_broadcast(f"received \"{dev.name}\" status update battery level {battery_level}")
+                    # else:
+                    #     self.log_broadcast(f"received \"{dev.name}\" status update for unchanged battery level {battery_level}")
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def handle_property_button(self, hub_name, hubitat_device_name, topics_list, payload):
+        try:
+            for dev_id in self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES]:
+                dev = indigo.devices[dev_id]
+                dev_plan = self.ingest_plan(dev)
+                if dev_plan.properties["Button"].enabled:
+                    if len(topics_list) == 5 and topics_list[4][0:7] == "button-":
+                        button_number = topics_list[4].split("-")[1]
+                        button_state_id = f"button_{button_number}"
+                        if int(button_number) <= dev_plan.number_of_buttons:
+                            self.update_state(dev, key=button_state_id, value=payload)
+                            if payload == "idle":
+                                self.update_state_image(dev, indigo.kStateImageSel.SensorOff)
                             else:
-                                dev.updateStateImageOnServer(indigo.kStateImageSel.DimmerOff)
-
-                            dev.updateStateOnServer(key='brightnessLevel', value=brightness_level, uiValue=brightness_level_ui)
-                            if not bool(dev.pluginProps.get("hidePositionBroadcast", False)):
-                                self.hubHandlerLogger.info(f"received {brighten_dim_ui} \"{dev.name}\" to {brightness_level_ui}")
-
-            # Check for DIM
-            elif topics_list[3] == "dim" and len(topics_list) == 4:  # Checking that this isn't a message from the plugin to set the value; topic would be '.../dim/set'
-                with self.globals[LOCK_HE_LINKED_INDIGO_DEVICES]:
-                    for dev_id in self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES]:
-                        dev = indigo.devices[dev_id]
-                        if dev.subType == indigo.kDimmerDeviceSubType.Blind:
-                            continue
-                        if bool(dev.pluginProps.get("uspDimmer", False)):
+                                self.update_state_image(dev, indigo.kStateImageSel.SensorOn)
+                            button_ui = f"Button {button_number}"
+                            self.update_state(dev, key="lastButtonPressed", value=button_number, uiValue=button_ui)
+                            if dev_plan.properties["Button"].broadcast:
+                                self.log_broadcast(f"received \"{dev.name}\" button {button_number} {payload} event")
+                        else:
+                            self.hubHandlerLogger.warning(f"received \"{dev.name}\" unsupported button {button_number} {payload} event")
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def handle_property_color_mode(self, hub_name, hubitat_device_name, topics_list, payload):
+        try:
+            for dev_id in self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES]:
+                dev = indigo.devices[dev_id]
+                dev_plan = self.ingest_plan(dev)
+                if dev_plan.properties["ColorRGB"].enabled or dev_plan.properties["WhiteTemperature"].enabled:
+                    color_mode_ui = f"{payload} Unknown"
+                    if payload == "CT":
+                        color_mode_ui = "Color Temperature"
+                    elif payload == "RGB":
+                        color_mode_ui = "Red/Green/Blue"
+                    self.update_state(dev, key="colorMode", value=payload, uiValue=color_mode_ui)
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def handle_property_color_name(self, hub_name, hubitat_device_name, topics_list, payload):
+        try:
+            for dev_id in self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES]:
+                dev = indigo.devices[dev_id]
+                dev_plan = self.ingest_plan(dev)
+                if dev_plan.properties["ColorRGB"].enabled or dev_plan.properties["WhiteTemperature"].enabled:
+                    color_name = f"{payload}"
+                    self.update_state(dev, key="colorName", value=color_name)
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def handle_property_color(self, hub_name, hubitat_device_name, topics_list, payload):
+        try:
+            # if len(topics_list) == 5 and topics_list[4] == "rgb":
+            #     with self.globals[LOCK_HE_LINKED_INDIGO_DEVICES]:
+            #         for dev_id in self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES]:
+            #             dev = indigo.devices[dev_id]
+            #             if bool(dev.pluginProps.get("uspColorRGB", False)):
+            #                 try:
+            #                     if len(payload) != 7 or payload[0] != "#":
+            #                         return
+            #                     hex_string = payload[1:]
+            #                     rgb = bytearray.fromhex(hex_string)
+            #                     red, green, blue = list(rgb)
+            #                     red = int((float(red) / 256.0) * 100.0)
+            #                     green = int((float(green) / 256.0) * 100.0)
+            #                     blue = int((float(blue) / 256.0) * 100.0)
+            #                 except ValueError:
+            #                     return
+            #                 key_value_list = list()
+            #                 key_value_list.append({"key": "redLevel", "value": red})
+            #                 key_value_list.append({"key": "greenLevel", "value": green})
+            #                 key_value_list.append({"key": "blueLevel", "value": blue})
+            #                 dev.updateStatesOnServer(key_value_list)
+            if len(topics_list) == 4:
+                # Assume HSV format published from HE for the moment!
+
+                for dev_id in self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES]:
+                    dev = indigo.devices[dev_id]
+                    dev_plan = self.ingest_plan(dev)
+                    if dev_plan.properties["ColorRGB"].enabled:
+
+                        hue, saturation, value = payload.split(",")
+
+                        # def hsv2rgb(h, s, v):  # https://stackoverflow.com/questions/24852345/hsv-to-rgb-color-conversion
+                        #     return tuple(round(i * 100) for i in colorsys.hsv_to_rgb(h, s, v))
+
+                        try:
+                            hue = int(hue) / 360.0  # TODO: SHOULD THIS BE FLOAT ???
+                            saturation = int(saturation) / 100.0
+                            value = int(value) / 100.0
+                            red, green, blue = colorsys.hsv_to_rgb(hue, saturation, value)
+                            red = int(red * 100.0)
+                            green = int(green * 100.0)
+                            blue = int(blue * 100.0)
+                        except Exception:
+                            return
+
+                        # red, green, blue = hsv2rgb(int(hue), int(saturation), int(value))
+                        key_value_list = list()
+                        key_value_list.append({"key": "redLevel", "value": red})
+                        key_value_list.append({"key": "greenLevel", "value": green})
+                        key_value_list.append({"key": "blueLevel", "value": blue})
+                        self.update_states(dev, key_value_list)
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def handle_property_color_temperature(self, hub_name, hubitat_device_name, topics_list, payload):
+        try:
+            if len(topics_list) != 4:
+                return
+
+            for dev_id in self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES]:
+                dev = indigo.devices[dev_id]
+                dev_plan = self.ingest_plan(dev)
+                if dev_plan.properties["WhiteTemperature"].enabled:
+                    try:
+                        white_temperature = int(payload)
+                        white_temperature_ui = f"{payload}°K"
+                    except ValueError:
+                        return
+                    self.update_state(dev, key="whiteTemperature", value=white_temperature, uiValue=white_temperature_ui)
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def handle_property_contact(self, hub_name, hubitat_device_name, topics_list, payload):
+        try:
+            if len(topics_list) == 5 and topics_list[4] == "status":
+                for dev_id in self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES]:
+                    dev = indigo.devices[dev_id]
+                    dev_plan = self.ingest_plan(dev)
+                    if dev_plan.properties["Contact"].enabled:
+                        if payload == "open":
+                            self.update_state(dev, key="onOffState", value=True)
+                            if topics_list[3] in HE_PRIMARY_INDIGO_DEVICE_TYPES_AND_HABITAT_PROPERTIES[dev.deviceTypeId]:
+                                self.update_state_image(dev, indigo.kStateImageSel.SensorOn)
+                        else:
+                            self.update_state(dev, key="onOffState", value=False)
+                            if topics_list[3] in HE_PRIMARY_INDIGO_DEVICE_TYPES_AND_HABITAT_PROPERTIES[dev.deviceTypeId]:
+                                self.update_state_image(dev, indigo.kStateImageSel.SensorOff)
+                        if dev_plan.properties["Contact"].broadcast:
+                            self.log_broadcast(f"received \"{dev.name}\" contact sensor \"{payload}\" event")
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def handle_property_position(self, hub_name, hubitat_device_name, topics_list, payload):
+        try:
+            if len(topics_list) != 4:  # Checking that this isn't a message from the plugin to set the value; topic would be '.../position/set'
+                return
+
+            for dev_id in self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES]:
+                dev = indigo.devices[dev_id]
+                dev_plan = self.ingest_plan(dev)
+                if dev.subType != indigo.kDimmerDeviceSubType.Blind:
+                    continue
+
+                if dev_plan.properties["Position"].enabled:
+                    try:
+                        brightness_level = int(payload)
+                        brightness_level_ui = f"{brightness_level}%"
+                    except ValueError:
+                        return
+
+                    self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_STATES][HE_STATE_DIM] = brightness_level
+
+                    brighten_dim_ui = "set"
+                    if brightness_level > 0:
+                        if brightness_level > dev.brightness:
+                            brighten_dim_ui = "opened"
+                        else:
+                            brighten_dim_ui = "closed"
+
+                    if brightness_level > 0:
+                        self.update_state_image(dev, indigo.kStateImageSel.DimmerOn)
+                    else:
+                        self.update_state_image(dev, indigo.kStateImageSel.DimmerOff)
+
+                    self.update_state(dev, key='brightnessLevel', value=brightness_level, uiValue=brightness_level_ui)
+                    if dev_plan.properties["Position"].broadcast:
+                        self.log_broadcast(f"received {brighten_dim_ui} \"{dev.name}\" to {brightness_level_ui}")
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def handle_property_dim(self, hub_name, hubitat_device_name, topics_list, payload):
+        try:
+            if len(topics_list) != 4:  # Checking that this isn't a message from the plugin to set the value; topic would be '.../dim/set'
+                return
+
+            for dev_id in self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES]:
+                dev = indigo.devices[dev_id]
+                dev_plan = self.ingest_plan(dev)
+                if dev.subType == indigo.kDimmerDeviceSubType.Blind:
+                    continue
+                if dev_plan.properties["Dimmer"].enabled:
+                    try:
+                        brightness_level = int(payload)
+                        brightness_level_ui = f"{brightness_level}"
+                    except ValueError:
+                        return
+
+                    self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_STATES][HE_STATE_DIM] = brightness_level
+
+                    brighten_dim_ui = "set"
+                    if brightness_level > 0:
+                        if brightness_level > dev.brightness:
+                            brighten_dim_ui = "brighten"
+                        else:
+                            brighten_dim_ui = "dim"
+
+                    if brightness_level > 0:
+                        self.update_state_image(dev, indigo.kStateImageSel.DimmerOn)
+                    else:
+                        self.update_state_image(dev, indigo.kStateImageSel.DimmerOff)
+
+                    self.update_state(dev, key='brightnessLevel', value=brightness_level, uiValue=brightness_level_ui)
+                    if dev_plan.supports_white:
+                        self.update_state(dev, key='whiteLevel', value=brightness_level)
+                    if dev_plan.properties["Dimmer"].broadcast:
+                        self.log_broadcast(f"received {brighten_dim_ui} \"{dev.name}\" to {brightness_level_ui}")
+
+                elif dev_plan.properties["Valve"].enabled:
+                    def _evaluate_valve(_payload, _previous_valve_level):
+                        try:
+                            _valve_level = int(_payload)
+                            _valve_level_ui = f"{_valve_level}%"
+                        except ValueError:
+                            return False
+
+                        _valve_action_ui = "set"
+                        if _valve_level > 0:
                             try:
-                                brightness_level = int(payload)
-                                brightness_level_ui = f"{brightness_level}"
+                                _current_valve_level = int(_previous_valve_level)
                             except ValueError:
-                                return
+                                _current_valve_level = 0
+                            if _valve_level > _current_valve_level:
+                                _valve_action_ui = "open"
+                            else:
+                                _valve_action_ui = "close"
+
+                        return True, _valve_level, _valve_level_ui, _valve_action_ui
+
+                    if dev_plan.properties["Valve"].storage == INDIGO_PRIMARY_DEVICE_ADDITIONAL_STATE:
 
-                            self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_STATES][HE_STATE_DIM] = brightness_level
+                        evaluated_valve = _evaluate_valve(payload, dev.states["valve"])
+                        if evaluated_valve[0]:
+                            valve_level = evaluated_valve[1]
+                            valve_level_ui = evaluated_valve[2]
+                            valve_action_ui = evaluated_valve[3]
+                            self.update_state(dev, key='valve', value=valve_level, uiValue=valve_level_ui)
+                            if dev_plan.properties["Valve"].broadcast:
+                                self.log_broadcast(f"received {valve_action_ui} \"{dev.name}\" valve to {valve_level_ui}")
 
-                            brighten_dim_ui = "set"
-                            if brightness_level > 0:
-                                if brightness_level > dev.brightness:
-                                    brighten_dim_ui = "brighten"
+                    elif dev_plan.properties["Valve"].storage == INDIGO_SECONDARY_DEVICE:
+                        valve_dev_id = self.determine_secondary_device_id(dev_id, "valveSecondary")
+                        if bool(valve_dev_id):
+                            valve_dev = indigo.devices[valve_dev_id]
+
+                            evaluated_valve = _evaluate_valve(payload, valve_dev.brightness)
+                            if evaluated_valve[0]:
+                                valve_level = evaluated_valve[1]
+                                valve_level_ui = evaluated_valve[2]
+                                valve_action_ui = evaluated_valve[3]
+
+                                self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_STATES][HE_STATE_VALVE_LEVEL] = valve_dev.brightness
+
+                                if valve_level > 0:
+                                    self.update_state_image(valve_dev, indigo.kStateImageSel.SensorOn)
                                 else:
-                                    brighten_dim_ui = "dim"
+                                    self.update_state_image(valve_dev, indigo.kStateImageSel.SensorOff)
+
+                                self.update_state(valve_dev, key='brightnessLevel', value=valve_level, uiValue=valve_level_ui)
+                                if dev_plan.properties["Valve"].broadcast:
+                                    self.log_broadcast(f"received {valve_action_ui} \"{valve_dev.name}\" to {valve_level_ui}")
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
 
-                            if brightness_level > 0:
-                                dev.updateStateImageOnServer(indigo.kStateImageSel.DimmerOn)
+    def handle_property_energy(self, hub_name, hubitat_device_name, topics_list, payload):
+        try:
+            for dev_id in self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES]:
+                dev = indigo.devices[dev_id]
+                dev_plan = self.ingest_plan(dev)
+                if dev_plan.properties["Energy"].enabled:
+                    energy_units_ui = f" {dev_plan.properties['Energy'].units}"
+                    try:
+                        energy = float(payload)
+                    except ValueError:
+                        return
+                    decimal_places = dev_plan.properties["Energy"].decimal_places
+                    value, uiValue = self.processDecimalPlaces(energy, decimal_places, energy_units_ui, INDIGO_NO_SPACE_BEFORE_UNITS)
+                    if self.rate_limited(dev, dev_plan, "Energy", value, (hub_name, hubitat_device_name, topics_list, payload)):
+                        continue
+                    self.update_state(dev, key='accumEnergyTotal', value=value, uiValue=uiValue)
+                    if dev_plan.properties["Energy"].broadcast:
+                        self.log_broadcast(f"received \"{dev.name}\" accumulated energy total update to {uiValue}")
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def handle_property_humidity(self, hub_name, hubitat_device_name, topics_list, payload):
+        try:
+            for dev_id in self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES]:
+                dev = indigo.devices[dev_id]
+                dev_plan = self.ingest_plan(dev)
+                if dev_plan.properties["Humidity"].enabled:
+                    try:
+                        humidity = float(payload)
+                    except ValueError:
+                        return
+
+                    decimal_places = dev_plan.properties["Humidity"].decimal_places
+                    value, uiValue = self.processDecimalPlaces(humidity, decimal_places, "%", INDIGO_NO_SPACE_BEFORE_UNITS)
+
+                    uspHumidityIndigo = dev_plan.properties["Humidity"].storage
+
+                    broadcast_device_name = dev.name
+                    if uspHumidityIndigo == INDIGO_PRIMARY_DEVICE_MAIN_UI_STATE:
+                        self.update_state(dev, key='sensorValue', value=value, uiValue=uiValue)
+                        self.update_state_image(dev, indigo.kStateImageSel.HumiditySensor)
+
+                    elif uspHumidityIndigo == INDIGO_PRIMARY_DEVICE_ADDITIONAL_STATE:
+                        self.update_state(dev, key='humidity', value=value, uiValue=uiValue)
+                    # elif uspHumidityIndigo in (INDIGO_SECONDARY_DEVICE_ADDITIONAL_STATE, INDIGO_SECONDARY_DEVICE):
+                    elif uspHumidityIndigo in INDIGO_SECONDARY_DEVICE:
+                        # Find linked device in device group
+                        linked_dev_id = self.determine_secondary_device_id(dev_id, "humiditySensorSecondary")
+                        if bool(linked_dev_id):
+                            linked_dev = indigo.devices[linked_dev_id]
+                            # if uspHumidityIndigo == INDIGO_SECONDARY_DEVICE_ADDITIONAL_STATE:
+                            #     linked_dev.updateStateOnServer(key='humidityInput1', value=value, uiValue=uiValue)
+                            #     linked_dev.updateStateImageOnServer(indigo.kStateImageSel.HumiditySensor)
+                            # else:
+                            #     linked_dev.updateStateOnServer(key='sensorValue', value=value, uiValue=uiValue)
+                            if "sensorValue" in linked_dev.states:
+                                self.update_state(linked_dev, key='sensorValue', value=value, uiValue=uiValue)
                             else:
-                                dev.updateStateImageOnServer(indigo.kStateImageSel.DimmerOff)
-
-                            dev.updateStateOnServer(key='brightnessLevel', value=brightness_level, uiValue=brightness_level_ui)
-                            if bool(dev.pluginProps.get("SupportsWhite", False)):
-                                dev.updateStateOnServer(key='whiteLevel', value=brightness_level)
-                            if not bool(dev.pluginProps.get("hideDimmerBroadcast", False)):
-                                self.hubHandlerLogger.info(f"received {brighten_dim_ui} \"{dev.name}\" to {brightness_level_ui}")
-
-                        elif bool(dev.pluginProps.get("uspValve", False)):
-                            def _evaluate_valve(_payload, _previous_valve_level):
-                                try:
-                                    _valve_level = int(_payload)
-                                    _valve_level_ui = f"{_valve_level}%"
-                                except ValueError:
-                                    return False
-
-                                _valve_action_ui = "set"
-                                if _valve_level > 0:
-                                    try:
-                                        _current_valve_level = int(_previous_valve_level)
-                                    except ValueError:
-                                        _current_valve_level = 0
-                                    if _valve_level > _current_valve_level:
-                                        _valve_action_ui = "open"
-                                    else:
-                                        _valve_action_ui = "close"
-
-                                return True, _valve_level, _valve_level_ui, _valve_action_ui
-
-                            if dev.pluginProps.get("uspValveIndigo", INDIGO_PRIMARY_DEVICE_ADDITIONAL_STATE) == INDIGO_PRIMARY_DEVICE_ADDITIONAL_STATE:
-
-                                evaluated_valve = _evaluate_valve(payload, dev.states["valve"])
-                                if evaluated_valve[0]:
-                                    valve_level = evaluated_valve[1]
-                                    valve_level_ui = evaluated_valve[2]
-                                    valve_action_ui = evaluated_valve[3]
-                                    dev.updateStateOnServer(key='valve', value=valve_level, uiValue=valve_level_ui)
-                                    if not bool(dev.pluginProps.get("hideValveBroadcast", False)):
-                                        self.hubHandlerLogger.info(f"received {valve_action_ui} \"{dev.name}\" valve to {valve_level_ui}")
-
-                            elif dev.pluginProps.get("uspValveIndigo", INDIGO_PRIMARY_DEVICE_ADDITIONAL_STATE) == INDIGO_SECONDARY_DEVICE:
-                                dev_id_list = indigo.device.getGroupList(dev_id)
-                                if len(dev_id_list) > 1:
-                                    valve_dev_id = 0
-                                    for linked_dev_id in dev_id_list:
-                                        if linked_dev_id != dev_id and indigo.devices[linked_dev_id].deviceTypeId == "valveSecondary":
-                                            valve_dev_id = linked_dev_id
-                                    if valve_dev_id == 0:
-                                        return
-                                    valve_dev = indigo.devices[valve_dev_id]
-
-                                    evaluated_valve = _evaluate_valve(payload, valve_dev.brightness)
-                                    if evaluated_valve[0]:
-                                        valve_level = evaluated_valve[1]
-                                        valve_level_ui = evaluated_valve[2]
-                                        valve_action_ui = evaluated_valve[3]
-
-                                        self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_STATES][HE_STATE_VALVE_LEVEL] = valve_dev.brightness
-
-                                        if valve_level > 0:
-                                            valve_dev.updateStateImageOnServer(indigo.kStateImageSel.SensorOn)
-                                        else:
-                                            valve_dev.updateStateImageOnServer(indigo.kStateImageSel.SensorOff)
-
-                                        valve_dev.updateStateOnServer(key='brightnessLevel', value=valve_level, uiValue=valve_level_ui)
-                                        if not bool(dev.pluginProps.get("hideValveBroadcast", False)):
-                                            self.hubHandlerLogger.info(f"received {valve_action_ui} \"{valve_dev.name}\" to {valve_level_ui}")
-
-            # Check for Energy
-            elif topics_list[3] == "measure-energy" or topics_list[3] == "energy":
-                with self.globals[LOCK_HE_LINKED_INDIGO_DEVICES]:
-                    for dev_id in self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES]:
-                        dev = indigo.devices[dev_id]
-                        if bool(dev.pluginProps.get("uspEnergy", False)):
-                            energy_units_ui = f" {dev.pluginProps.get('uspEnergyUnits', '')}"
-                            try:
-                                energy = float(payload)
-                            except ValueError:
-                                return
-                            decimal_places = int(dev.pluginProps.get("uspEnergyDecimalPlaces", 0))
-                            value, uiValue = self.processDecimalPlaces(energy, decimal_places, energy_units_ui, INDIGO_NO_SPACE_BEFORE_UNITS)
-                            dev.updateStateOnServer(key='accumEnergyTotal', value=value, uiValue=uiValue)
-                            if not bool(dev.pluginProps.get("hideEnergyBroadcast", False)):
-                                self.hubHandlerLogger.info(f"received \"{dev.name}\" accumulated energy total update to {uiValue}")
-
-            # Check for Humidity
-            elif topics_list[3] == "measure-humidity" or topics_list[3] == "humidity":
-                with self.globals[LOCK_HE_LINKED_INDIGO_DEVICES]:
-                    for dev_id in self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES]:
-                        dev = indigo.devices[dev_id]
-                        if dev.pluginProps.get("uspHumidity", False):
-                            try:
-                                humidity = float(payload)
-                            except ValueError:
-                                return
+                                self.update_state(linked_dev, key='humidityInput1', value=value, uiValue=uiValue)
 
-                            decimal_places = int(dev.pluginProps.get("uspHumidityDecimalPlaces", 0))
-                            value, uiValue = self.processDecimalPlaces(humidity, decimal_places, "%", INDIGO_NO_SPACE_BEFORE_UNITS)
+                            self.update_state(linked_dev, key='sensorValue', value=value, uiValue=uiValue)
+                            self.update_state_image(linked_dev, indigo.kStateImageSel.HumiditySensor)
 
-                            uspHumidityIndigo = dev.pluginProps.get("uspHumidityIndigo", INDIGO_PRIMARY_DEVICE_ADDITIONAL_STATE)
+                            broadcast_device_name = linked_dev.name
+                    else:
+                        self.hubHandlerLogger.error(f"received \"{broadcast_device_name}\" humidity update but unable to determine how to store update?")
+                        return
 
-                            broadcast_device_name = dev.name
-                            if uspHumidityIndigo == INDIGO_PRIMARY_DEVICE_MAIN_UI_STATE:
-                                dev.updateStateOnServer(key='sensorValue', value=value, uiValue=uiValue)
-                                dev.updateStateImageOnServer(indigo.kStateImageSel.HumiditySensor)
-
-                            elif uspHumidityIndigo == INDIGO_PRIMARY_DEVICE_ADDITIONAL_STATE:
-                                dev.updateStateOnServer(key='humidity', value=value, uiValue=uiValue)
-                            # elif uspHumidityIndigo in (INDIGO_SECONDARY_DEVICE_ADDITIONAL_STATE, INDIGO_SECONDARY_DEVICE):
-                            elif uspHumidityIndigo in INDIGO_SECONDARY_DEVICE:
-                                # Find linked device in device group
-                                linked_dev_id = self.determine_secondary_device_id(dev_id, "humiditySensorSecondary")
-                                if bool(linked_dev_id):
-                                    linked_dev = indigo.devices[linked_dev_id]
-                                    # if uspHumidityIndigo == INDIGO_SECONDARY_DEVICE_ADDITIONAL_STATE:
-                                    #     linked_dev.updateStateOnServer(key='humidityInput1', value=value, uiValue=uiValue)
-                                    #     linked_dev.updateStateImageOnServer(indigo.kStateImageSel.HumiditySensor)
-                                    # else:
-                                    #     linked_dev.updateStateOnServer(key='sensorValue', value=value, uiValue=uiValue)
-                                    if "sensorValue" in linked_dev.states:
-                                        linked_dev.updateStateOnServer(key='sensorValue', value=value, uiValue=uiValue)
-                                    else:
-                                        linked_dev.updateStateOnServer(key='humidityInput1', value=value, uiValue=uiValue)
-
-                                    linked_dev.updateStateOnServer(key='sensorValue', value=value, uiValue=uiValue)
-                                    linked_dev.updateStateImageOnServer(indigo.kStateImageSel.HumiditySensor)
-
-                                    broadcast_device_name = linked_dev.name
+                    if dev_plan.properties["Humidity"].broadcast:
+                        self.log_broadcast(f"received \"{broadcast_device_name}\" humidity update to {uiValue}")
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def handle_property_illuminance(self, hub_name, hubitat_device_name, topics_list, payload):
+        try:
+            for dev_id in self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES]:
+                dev = indigo.devices[dev_id]
+                dev_plan = self.ingest_plan(dev)
+                if dev_plan.properties["Illuminance"].enabled:
+                    illuminance_units_ui = dev_plan.properties["Illuminance"].units
+                    try:
+                        illuminance = float(payload)
+                    except ValueError:
+                        return
+                    decimal_places = dev_plan.properties["Illuminance"].decimal_places
+                    value, uiValue = self.processDecimalPlaces(illuminance, decimal_places, illuminance_units_ui, INDIGO_ONE_SPACE_BEFORE_UNITS)
+                    if self.rate_limited(dev, dev_plan, "Illuminance", value, (hub_name, hubitat_device_name, topics_list, payload)):
+                        continue
+
+                    uspIlluminanceIndigo = dev_plan.properties["Illuminance"].storage
+
+                    broadcast_device_name = dev.name
+                    if uspIlluminanceIndigo == INDIGO_PRIMARY_DEVICE_MAIN_UI_STATE:
+                        self.update_state(dev, key='sensorValue', value=value, uiValue=uiValue)
+                        if value:
+                            self.update_state_image(dev, indigo.kStateImageSel.LightSensorOn)
+                        else:
+                            self.update_state_image(dev, indigo.kStateImageSel.LightSensor)
+                    elif uspIlluminanceIndigo == INDIGO_PRIMARY_DEVICE_ADDITIONAL_STATE:
+                        self.update_state(dev, key='illuminance', value=value, uiValue=uiValue)
+                    elif uspIlluminanceIndigo == INDIGO_SECONDARY_DEVICE:
+                        # Find linked device in device group
+                        linked_dev_id = self.determine_secondary_device_id(dev_id, "illuminanceSensorSecondary")
+                        if bool(linked_dev_id):
+                            linked_dev = indigo.devices[linked_dev_id]
+                            self.update_state(linked_dev, key='sensorValue', value=value, uiValue=uiValue)
+                            if value:
+                                self.update_state_image(linked_dev, indigo.kStateImageSel.LightSensorOn)
                             else:
-                                self.hubHandlerLogger.error(f"received \"{broadcast_device_name}\" humidity update but unable to determine how to store update?")
-                                return
-
-                            if not bool(dev.pluginProps.get("hideHumidityBroadcast", False)):
-                                self.hubHandlerLogger.info(f"received \"{broadcast_device_name}\" humidity update to {uiValue}")
-
-            # Check for Illuminance
-            elif topics_list[3] == "measure-illuminance" or topics_list[3] == "illuminance":
-                with self.globals[LOCK_HE_LINKED_INDIGO_DEVICES]:
-                    for dev_id in self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES]:
-                        dev = indigo.devices[dev_id]
-                        if dev.pluginProps.get("uspIlluminance", False):
-                            illuminance_units_ui = dev.pluginProps.get("uspIlluminanceUnits", "")
-                            try:
-                                illuminance = float(payload)
-                            except ValueError:
-                                return
-                            decimal_places = int(dev.pluginProps.get("uspIlluminanceDecimalPlaces", 0))
-                            value, uiValue = self.processDecimalPlaces(illuminance, decimal_places, illuminance_units_ui, INDIGO_ONE_SPACE_BEFORE_UNITS)
+                                self.update_state_image(linked_dev, indigo.kStateImageSel.LightSensor)
+                            broadcast_device_name = linked_dev.name
+                    else:
+                        self.hubHandlerLogger.error(f"received \"{broadcast_device_name}\" illuminance update but unable to determine how to store update?")
+                        return
 
-                            uspIlluminanceIndigo = dev.pluginProps.get("uspIlluminanceIndigo", INDIGO_PRIMARY_DEVICE_ADDITIONAL_STATE)
+                    if dev_plan.properties["Illuminance"].broadcast:
+                        self.log_broadcast(f"received \"{broadcast_device_name}\" illuminance sensor \"{uiValue}\" event")
 
-                            broadcast_device_name = dev.name
-                            if uspIlluminanceIndigo == INDIGO_PRIMARY_DEVICE_MAIN_UI_STATE:
-                                dev.updateStateOnServer(key='sensorValue', value=value, uiValue=uiValue)
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def handle_property_lock(self, hub_name, hubitat_device_name, topics_list, payload):
+        try:
+            for dev_id in self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES]:
+                dev = indigo.devices[dev_id]
+                dev_plan = self.ingest_plan(dev)
+                if dev_plan.properties["Lock"].enabled:
+                    if len(topics_list) != 4:
+                        return
+                    if payload not in ["true", "false"]:
+                        return
+                    if payload == "true":
+                        payload_ui = "lock"  # Force to Lock
+                        self.update_state(dev, key="onOffState", value=True)
+                        # dev.updateStateImageOnServer(indigo.kStateImageSel.SensorOn)
+                    else:
+                        # payload == "false"
+                        payload_ui = "unlock"  # Force to Unlock
+                        self.update_state(dev, key="onOffState", value=False)
+                        # dev.updateStateImageOnServer(indigo.kStateImageSel.SensorOff
+                    if dev_plan.properties["Lock"].broadcast:
+                        self.log_broadcast(f"received \"{dev.name}\" lock, \"{payload_ui}\" event")
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def handle_property_motion(self, hub_name, hubitat_device_name, topics_list, payload):
+        try:
+            if len(topics_list) == 5 and topics_list[4] == "status":
+                for dev_id in self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES]:
+                    dev = indigo.devices[dev_id]
+                    dev_plan = self.ingest_plan(dev)
+                    if dev_plan.properties["Motion"].enabled:
+                        uiValue = payload
+                        if uiValue == "active":
+                            value = True
+                        elif uiValue == "inactive":
+                            value = False
+                        else:
+                            return
+
+                        uspMotionIndigo = dev_plan.properties["Motion"].storage
+
+                        broadcast_device_name = dev.name
+                        if uspMotionIndigo == INDIGO_PRIMARY_DEVICE_MAIN_UI_STATE:
+                            self.update_state(dev, key='onOffState', value=value, uiValue=uiValue)
+                            if value:
+                                self.update_state_image(dev, indigo.kStateImageSel.MotionSensorTripped)
+                            else:
+                                self.update_state_image(dev, indigo.kStateImageSel.MotionSensor)
+                        elif uspMotionIndigo == INDIGO_PRIMARY_DEVICE_ADDITIONAL_STATE:
+                            self.update_state(dev, key='motion', value=value, uiValue=uiValue)
+                        elif uspMotionIndigo == INDIGO_SECONDARY_DEVICE:
+                            # Find linked device in device group
+                            linked_dev_id = self.determine_secondary_device_id(dev_id, "motionSensorSecondary")
+                            if bool(linked_dev_id):
+                                linked_dev = indigo.devices[linked_dev_id]
+                                self.update_state(linked_dev, key='onOffState', value=value, uiValue=uiValue)
                                 if value:
-                                    dev.updateStateImageOnServer(indigo.kStateImageSel.LightSensorOn)
+                                    self.update_state_image(linked_dev, indigo.kStateImageSel.MotionSensorTripped)
                                 else:
-                                    dev.updateStateImageOnServer(indigo.kStateImageSel.LightSensor)
-                            elif uspIlluminanceIndigo == INDIGO_PRIMARY_DEVICE_ADDITIONAL_STATE:
-                                dev.updateStateOnServer(key='illuminance', value=value, uiValue=uiValue)
-                            elif uspIlluminanceIndigo == INDIGO_SECONDARY_DEVICE:
-                                # Find linked device in device group
-                                linked_dev_id = self.determine_secondary_device_id(dev_id, "illuminanceSensorSecondary")
-                                if bool(linked_dev_id):
-                                    linked_dev = indigo.devices[linked_dev_id]
-                                    linked_dev.updateStateOnServer(key='sensorValue', value=value, uiValue=uiValue)
-                                    if value:
-                                        linked_dev.updateStateImageOnServer(indigo.kStateImageSel.LightSensorOn)
-                                    else:
-                                        linked_dev.updateStateImageOnServer(indigo.kStateImageSel.LightSensor)
-                                    broadcast_device_name = linked_dev.name
+                                    self.update_state_image(linked_dev, indigo.kStateImageSel.MotionSensor)
+                                broadcast_device_name = linked_dev.name
+                        else:
+                            self.hubHandlerLogger.error(f"received \"{broadcast_device_name}\" motion sensor update but unable to determine how to store update?")
+                            return
+
+                        if dev_plan.properties["Motion"].broadcast:
+                            self.log_broadcast(f"received \"{broadcast_device_name}\" motion sensor \"{uiValue}\" event")
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def handle_property_onoff(self, hub_name, hubitat_device_name, topics_list, payload):
+        try:
+            for dev_id in self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES]:
+                dev = indigo.devices[dev_id]
+                dev_plan = self.ingest_plan(dev)
+                if dev_plan.properties["OnOff"].enabled:
+                    if len(topics_list) != 4:
+                        return
+                    if payload not in ["on", "off", "true", "false"]:
+                        return
+                    if payload == "on" or payload == "true":
+                        payload_ui = "on"  # Force to On
+                        if dev.deviceTypeId != "thermostat":
+                            self.update_state(dev, key="onOffState", value=True)
+                            if dev.deviceTypeId == "dimmer":
+                                self.update_state_image(dev, indigo.kStateImageSel.DimmerOn)
+                            elif dev.deviceTypeId == "valveSecondary":
+                                self.update_state_image(dev, indigo.kStateImageSel.SensorOn)
                             else:
-                                self.hubHandlerLogger.error(f"received \"{broadcast_device_name}\" illuminance update but unable to determine how to store update?")
-                                return
-
-                            if not bool(dev.pluginProps.get("hideIlluminanceBroadcast", False)):
-                                self.hubHandlerLogger.info(f"received \"{broadcast_device_name}\" illuminance sensor \"{uiValue}\" event")
-
-            # Check for lock
-            elif topics_list[3] == "lock":
-                with self.globals[LOCK_HE_LINKED_INDIGO_DEVICES]:
-                    for dev_id in self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES]:
-                        dev = indigo.devices[dev_id]
-                        if dev.pluginProps.get("uspLock", False):
-                            if len(topics_list) != 4:
-                                return
-                            if payload not in ["true", "false"]:
-                                return
-                            if payload == "true":
-                                payload_ui = "lock"  # Force to Lock
-                                dev.updateStateOnServer(key="onOffState", value=True)
-                                # dev.updateStateImageOnServer(indigo.kStateImageSel.SensorOn)
+                                self.update_state_image(dev, indigo.kStateImageSel.PowerOn)
+                        else:
+                            # deviceTypeId is a Thermostat - Indigo On/off state isn't updated
+                            pass
+                        # Next bit of logic, restores previous dim level when a dimmer is switched on
+                        if HE_STATES in self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name]:
+                            if HE_STATE_DIM in self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_STATES]:
+                                if dev.deviceTypeId == "dimmer":
+                                    brightness_level = int(self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_STATES][HE_STATE_DIM])
+                                    brightness_level_ui = f"{brightness_level}"
+                                    self.update_state(dev, key='brightnessLevel', value=brightness_level, uiValue=brightness_level_ui)
+                                    self.update_state(dev, key='whiteLevel', value=brightness_level)
+                            elif HE_STATE_VALVE_LEVEL in self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_STATES]:
+                                if dev.deviceTypeId == "valveSecondary":
+                                    valve_level = int(self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_STATES][HE_STATE_VALVE_LEVEL])
+                                    valve_level_ui = f"{valve_level}%"
+                                    self.update_state(dev, key='brightnessLevel', value=valve_level, uiValue=valve_level_ui)
+                    else:
+                        # payload == "off" or payload == "false"
+                        payload_ui = "off"  # Force to Off
+                        if dev.deviceTypeId != "thermostat":
+                            if dev.deviceTypeId == "dimmer" or dev.deviceTypeId == "valveSecondary":
+                                # Save current Valve Level before switching off
+                                if dev.brightness != 0:
+                                    if HE_STATE_VALVE_LEVEL in self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_STATES]:
+                                        self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_STATES][HE_STATE_VALVE_LEVEL] = dev.brightness
+                                brightness_level_ui = "0"
+                                self.update_state(dev, key='brightnessLevel', value=0, uiValue=brightness_level_ui)
+
+                                if dev.deviceTypeId == "valveSecondary":
+                                    self.update_state_image(dev, indigo.kStateImageSel.SensorOff)
+                                elif dev.deviceTypeId == "dimmer":
+                                    if dev_plan.supports_white:
+                                        self.update_state(dev, key='whiteLevel', value=0)
+
+                                    self.update_state_image(dev, indigo.kStateImageSel.DimmerOff)
                             else:
-                                # payload == "false"
-                                payload_ui = "unlock"  # Force to Unlock
-                                dev.updateStateOnServer(key="onOffState", value=False)
-                                # dev.updateStateImageOnServer(indigo.kStateImageSel.SensorOff
-                            if not bool(dev.pluginProps.get("hideLockBroadcast", False)):
-                                self.hubHandlerLogger.info(f"received \"{dev.name}\" lock, \"{payload_ui}\" event")
-
-            # Check for Motion
-            elif topics_list[3] == "motion":
-                if len(topics_list) == 5 and topics_list[4] == "status":
-                    with self.globals[LOCK_HE_LINKED_INDIGO_DEVICES]:
-                        for dev_id in self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES]:
-                            dev = indigo.devices[dev_id]
-                            if dev.pluginProps.get("uspMotion", False):
-                                uiValue = payload
-                                if uiValue == "active":
-                                    value = True
-                                elif uiValue == "inactive":
-                                    value = False
-                                else:
-                                    return
-
-                                uspMotionIndigo = dev.pluginProps.get("uspMotionIndigo", INDIGO_PRIMARY_DEVICE_ADDITIONAL_STATE)
-
-                                broadcast_device_name = dev.name
-                                if uspMotionIndigo == INDIGO_PRIMARY_DEVICE_MAIN_UI_STATE:
-                                    dev.updateStateOnServer(key='onOffState', value=value, uiValue=uiValue)
-                                    if value:
-                                        dev.updateStateImageOnServer(indigo.kStateImageSel.MotionSensorTripped)
-                                    else:
-                                        dev.updateStateImageOnServer(indigo.kStateImageSel.MotionSensor)
-                                elif uspMotionIndigo == INDIGO_PRIMARY_DEVICE_ADDITIONAL_STATE:
-                                    dev.updateStateOnServer(key='motion', value=value, uiValue=uiValue)
-                                elif uspMotionIndigo == INDIGO_SECONDARY_DEVICE:
-                                    # Find linked device in device group
-                                    linked_dev_id = self.determine_secondary_device_id(dev_id, "motionSensorSecondary")
-                                    if bool(linked_dev_id):
-                                        linked_dev = indigo.devices[linked_dev_id]
-                                        linked_dev.updateStateOnServer(key='onOffState', value=value, uiValue=uiValue)
-                                        if value:
-                                            linked_dev.updateStateImageOnServer(indigo.kStateImageSel.MotionSensorTripped)
-                                        else:
-                                            linked_dev.updateStateImageOnServer(indigo.kStateImageSel.MotionSensor)
-                                        broadcast_device_name = linked_dev.name
-                                else:
-                                    self.hubHandlerLogger.error(f"received \"{broadcast_device_name}\" motion sensor update but unable to determine how to store update?")
-                                    return
-
-                                if not bool(dev.pluginProps.get("hideMotionBroadcast", False)):
-                                    self.hubHandlerLogger.info(f"received \"{broadcast_device_name}\" motion sensor \"{uiValue}\" event")
-
-            # Check for On / Off
-            elif topics_list[3] == "onoff":
-                with self.globals[LOCK_HE_LINKED_INDIGO_DEVICES]:
-                    for dev_id in self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES]:
-                        dev = indigo.devices[dev_id]
-                        if dev.pluginProps.get("uspOnOff", False):
-                            if len(topics_list) != 4:
-                                return
-                            if payload not in ["on", "off", "true", "false"]:
-                                return
-                            if payload == "on" or payload == "true":
-                                payload_ui = "on"  # Force to On
-                                if dev.deviceTypeId != "thermostat":
-                                    dev.updateStateOnServer(key="onOffState", value=True)
-                                    if dev.deviceTypeId == "dimmer":
-                                        dev.updateStateImageOnServer(indigo.kStateImageSel.DimmerOn)
-                                    elif dev.deviceTypeId == "valveSecondary":
-                                        dev.updateStateImageOnServer(indigo.kStateImageSel.SensorOn)
-                                    else:
-                                        dev.updateStateImageOnServer(indigo.kStateImageSel.PowerOn)
-                                else:
-                                    # deviceTypeId is a Thermostat - Indigo On/off state isn't updated
-                                    pass
-                                # Next bit of logic, restores previous dim level when a dimmer is switched on
-                                if HE_STATES in self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name]:
-                                    if HE_STATE_DIM in self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_STATES]:
-                                        if dev.deviceTypeId == "dimmer":
-                                            brightness_level = int(self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_STATES][HE_STATE_DIM])
-                                            brightness_level_ui = f"{brightness_level}"
-                                            dev.updateStateOnServer(key='brightnessLevel', value=brightness_level, uiValue=brightness_level_ui)
-                                            dev.updateStateOnServer(key='whiteLevel', value=brightness_level)
-                                    elif HE_STATE_VALVE_LEVEL in self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_STATES]:
-                                        if dev.deviceTypeId == "valveSecondary":
-                                            valve_level = int(self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_STATES][HE_STATE_VALVE_LEVEL])
-                                            valve_level_ui = f"{valve_level}%"
-                                            dev.updateStateOnServer(key='brightnessLevel', value=valve_level, uiValue=valve_level_ui)
+                                self.update_state_image(dev, indigo.kStateImageSel.PowerOff)
+                            self.update_state(dev, key="onOffState", value=False)
+                        elif dev.deviceTypeId == "thermostat":
+                            # deviceTypeId is a Thermostat - Indigo On/off state isn't updated
+                            pass
+
+                    if dev_plan.properties["Power"].broadcast:
+                        device_type_ui = ""
+                        if dev.deviceTypeId == "dimmer":
+                            device_type_ui = "dimmer"
+                        elif dev.deviceTypeId == "outlet (socket)":
+                            device_type_ui = "dimmer"
+                        elif dev.deviceTypeId == "valveSecondary":
+                            device_type_ui = "valve"
+                        self.log_broadcast(f"received \"{dev.name}\" {device_type_ui} \"{payload_ui}\" event")
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def handle_property_power(self, hub_name, hubitat_device_name, topics_list, payload):
+        try:
+            for dev_id in self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES]:
+                dev = indigo.devices[dev_id]
+                dev_plan = self.ingest_plan(dev)
+                if dev_plan.properties["Power"].enabled:
+                    power_units_ui = f" {dev_plan.properties['Power'].units}"
+                    try:
+                        power = float(payload)
+                    except ValueError:
+                        return
+                    minimumPowerLevel = dev_plan.power_minimum_reporting_level
+                    reportingPowerHysteresis = dev_plan.power_reporting_hysteresis
+                    if reportingPowerHysteresis > 0.0:  # noqa [Duplicated code fragment!]
+                        reportingPowerHysteresis = reportingPowerHysteresis / 2
+                    previousPowerLevel = float(dev.states["curEnergyLevel"])
+                    report_power_state = False
+                    power_variance_minimum = previousPowerLevel - reportingPowerHysteresis
+                    power_variance_maximum = previousPowerLevel + reportingPowerHysteresis
+                    if power_variance_minimum < 0.0:
+                        power_variance_minimum = 0.0
+                    if power >= minimumPowerLevel:
+                        # power_variance_minimum = previousPowerLevel - powerReportingVariance
+                        # power_variance_maximum = previousPowerLevel + powerReportingVariance
+                        if power < power_variance_minimum or power > power_variance_maximum:
+                            report_power_state = True
+                    elif previousPowerLevel >= minimumPowerLevel:
+                        if power < power_variance_minimum or power > power_variance_maximum:
+                            report_power_state = True
+
+                    # if power != previousPowerLevel:
+                    #     self.hubHandlerLogger.warning(
+                    #         f"HE Report Power State: Power={power}, Previous={previousPowerLevel}, Level={minimumPowerLevel}, Min={power_variance_minimum}, Max={power_variance_maximum}")
+
+                    decimal_places = dev_plan.properties["Power"].decimal_places
+                    value, uiValue = self.processDecimalPlaces(power, decimal_places, power_units_ui, INDIGO_NO_SPACE_BEFORE_UNITS)
+                    if self.rate_limited(dev, dev_plan, "Power", value, (hub_name, hubitat_device_name, topics_list, payload)):
+                        continue
+                    self.update_state(dev, key='curEnergyLevel', value=value, uiValue=uiValue)
+                    if report_power_state:
+                        if dev_plan.properties["Power"].broadcast:
+                            self.log_broadcast(f"received \"{dev.name}\" power update to {uiValue}")
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def handle_property_presence(self, hub_name, hubitat_device_name, topics_list, payload):
+        try:
+            if len(topics_list) == 5 and topics_list[4] == "status":
+                for dev_id in self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES]:
+                    dev = indigo.devices[dev_id]
+                    dev_plan = self.ingest_plan(dev)
+                    if dev_plan.properties["Presence"].enabled:
+                        uiValue = payload
+                        if uiValue == "present":
+                            value = True
+                        else:
+                            value = False
+
+                        uspPresenceIndigo = dev_plan.properties["Presence"].storage
+
+                        broadcast_device_name = dev.name
+                        if uspPresenceIndigo == INDIGO_PRIMARY_DEVICE_MAIN_UI_STATE:
+                            self.update_state(dev, key='onOffState', value=value, uiValue=uiValue)
+                            if value:
+                                self.update_state_image(dev, indigo.kStateImageSel.MotionSensorTripped)
                             else:
-                                # payload == "off" or payload == "false"
-                                payload_ui = "off"  # Force to Off
-                                if dev.deviceTypeId != "thermostat":
-                                    if dev.deviceTypeId == "dimmer" or dev.deviceTypeId == "valveSecondary":
-                                        # Save current Valve Level before switching off
-                                        if dev.brightness != 0:
-                                            if HE_STATE_VALVE_LEVEL in self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_STATES]:
-                                                self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_STATES][HE_STATE_VALVE_LEVEL] = dev.brightness
-                                        brightness_level_ui = "0"
-                                        dev.updateStateOnServer(key='brightnessLevel', value=0, uiValue=brightness_level_ui)
-
-                                        if dev.deviceTypeId == "valveSecondary":
-                                            dev.updateStateImageOnServer(indigo.kStateImageSel.SensorOff)
-                                        elif dev.deviceTypeId == "dimmer":
-                                            if bool(dev.pluginProps.get("SupportsWhite", False)):
-                                                dev.updateStateOnServer(key='whiteLevel', value=0)
-
-                                            dev.updateStateImageOnServer(indigo.kStateImageSel.DimmerOff)
-                                    else:
-                                        dev.updateStateImageOnServer(indigo.kStateImageSel.PowerOff)
-                                    dev.updateStateOnServer(key="onOffState", value=False)
-                                elif dev.deviceTypeId == "thermostat":
-                                    # deviceTypeId is a Thermostat - Indigo On/off state isn't updated
-                                    pass
-
-                            if not bool(dev.pluginProps.get("hidePowerBroadcast", False)):
-                                device_type_ui = ""
-                                if dev.deviceTypeId == "dimmer":
-                                    device_type_ui = "dimmer"
-                                elif dev.deviceTypeId == "outlet (socket)":
-                                    device_type_ui = "dimmer"
-                                elif dev.deviceTypeId == "valveSecondary":
-                                    device_type_ui = "valve"
-                                self.hubHandlerLogger.info(f"received \"{dev.name}\" {device_type_ui} \"{payload_ui}\" event")
-
-            # Check for Power
-            elif topics_list[3] == "measure-power" or topics_list[3] == "power":
-                with self.globals[LOCK_HE_LINKED_INDIGO_DEVICES]:
-                    for dev_id in self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES]:
-                        dev = indigo.devices[dev_id]
-                        if bool(dev.pluginProps.get("uspPower", False)):
-                            power_units_ui = f" {dev.pluginProps.get('uspPowerUnits', '')}"
-                            try:
-                                power = float(payload)
-                            except ValueError:
-                                return
-                            minimumPowerLevel = float(dev.pluginProps.get("uspPowerMinimumReportingLevel", 0.0))
-                            reportingPowerHysteresis = float(dev.pluginProps.get("uspPowerReportingHysteresis", 6.0))
-                            if reportingPowerHysteresis > 0.0:  # noqa [Duplicated code fragment!]
-                                reportingPowerHysteresis = reportingPowerHysteresis / 2
-                            previousPowerLevel = float(dev.states["curEnergyLevel"])
-                            report_power_state = False
-                            power_variance_minimum = previousPowerLevel - reportingPowerHysteresis
-                            power_variance_maximum = previousPowerLevel + reportingPowerHysteresis
-                            if power_variance_minimum < 0.0:
-                                power_variance_minimum = 0.0
-                            if power >= minimumPowerLevel:
-                                # power_variance_minimum = previousPowerLevel - powerReportingVariance
-                                # power_variance_maximum = previousPowerLevel + powerReportingVariance
-                                if power < power_variance_minimum or power > power_variance_maximum:
-                                    report_power_state = True
-                            elif previousPowerLevel >= minimumPowerLevel:
-                                if power < power_variance_minimum or power > power_variance_maximum:
-                                    report_power_state = True
-
-                            # if power != previousPowerLevel:
-                            #     self.hubHandlerLogger.warning(
-                            #         f"HE Report Power State: Power={power}, Previous={previousPowerLevel}, Level={minimumPowerLevel}, Min={power_variance_minimum}, Max={power_variance_maximum}")
-
-                            decimal_places = int(dev.pluginProps.get("uspPowerDecimalPlaces", 0))
-                            value, uiValue = self.processDecimalPlaces(power, decimal_places, power_units_ui, INDIGO_NO_SPACE_BEFORE_UNITS)
-                            dev.updateStateOnServer(key='curEnergyLevel', value=value, uiValue=uiValue)
-                            if report_power_state:
-                                if not bool(dev.pluginProps.get("hidePowerBroadcast", False)):
-                                    self.hubHandlerLogger.info(f"received \"{dev.name}\" power update to {uiValue}")
-
-            # Check for Presence
-            if topics_list[3] == "presence-sensor" or topics_list[3] == "presence":
-                if len(topics_list) == 5 and topics_list[4] == "status":
-                    with self.globals[LOCK_HE_LINKED_INDIGO_DEVICES]:
-                        for dev_id in self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES]:
-                            dev = indigo.devices[dev_id]
-                            if dev.pluginProps.get("uspPresence", False):
-                                uiValue = payload
-                                if uiValue == "present":
-                                    value = True
-                                else:
-                                    value = False
-
-                                uspPresenceIndigo = dev.pluginProps.get("uspPresenceIndigo", INDIGO_PRIMARY_DEVICE_ADDITIONAL_STATE)
-
-                                broadcast_device_name = dev.name
-                                if uspPresenceIndigo == INDIGO_PRIMARY_DEVICE_MAIN_UI_STATE:
-                                    dev.updateStateOnServer(key='onOffState', value=value, uiValue=uiValue)
-                                    if value:
-                                        dev.updateStateImageOnServer(indigo.kStateImageSel.MotionSensorTripped)
-                                    else:
-                                        dev.updateStateImageOnServer(indigo.kStateImageSel.MotionSensor)
-                                elif uspPresenceIndigo == INDIGO_PRIMARY_DEVICE_ADDITIONAL_STATE:
-                                    dev.updateStateOnServer(key='presence', value=value, uiValue=uiValue)
-                                elif uspPresenceIndigo == INDIGO_SECONDARY_DEVICE:
-                                    # Find linked device in device group
-                                    linked_dev_id = self.determine_secondary_device_id(dev_id, "presenceSensorSecondary")
-                                    if bool(linked_dev_id):
-                                        linked_dev = indigo.devices[linked_dev_id]
-                                        linked_dev.updateStateOnServer(key='onOffState', value=value, uiValue=uiValue)
-                                        if value:
-                                            linked_dev.updateStateImageOnServer(indigo.kStateImageSel.SensorOn)
-                                        else:
-                                            linked_dev.updateStateImageOnServer(indigo.kStateImageSel.SensorOff)
-                                        broadcast_device_name = linked_dev.name
+                                self.update_state_image(dev, indigo.kStateImageSel.MotionSensor)
+                        elif uspPresenceIndigo == INDIGO_PRIMARY_DEVICE_ADDITIONAL_STATE:
+                            self.update_state(dev, key='presence', value=value, uiValue=uiValue)
+                        elif uspPresenceIndigo == INDIGO_SECONDARY_DEVICE:
+                            # Find linked device in device group
+                            linked_dev_id = self.determine_secondary_device_id(dev_id, "presenceSensorSecondary")
+                            if bool(linked_dev_id):
+                                linked_dev = indigo.devices[linked_dev_id]
+                                self.update_state(linked_dev, key='onOffState', value=value, uiValue=uiValue)
+                                if value:
+                                    self.update_state_image(linked_dev, indigo.kStateImageSel.SensorOn)
                                 else:
-                                    self.hubHandlerLogger.error(f"received \"{broadcast_device_name}\" presence sensor update but unable to determine how to store update?")
-                                    return
-
-                                if not bool(dev.pluginProps.get("hidePresenceBroadcast", False)):
-                                    self.hubHandlerLogger.info(f"received \"{broadcast_device_name}\" presence sensor \"{uiValue}\" event")
-
-            # Check for Radar [Aqara FP1 Presence]
-            if topics_list[3] == "presence" or topics_list[3] == "presence_derived" or topics_list[3] == "presence_event":
-                if len(topics_list) == 4:
-                    with self.globals[LOCK_HE_LINKED_INDIGO_DEVICES]:
-                        for dev_id in self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES]:
-                            dev = indigo.devices[dev_id]
-                            if dev.pluginProps.get("uspRadar", False):
-                                value = True if payload == "true" else False
-                                if topics_list[3] == "presence":
-                                    dev.updateStateOnServer(key='presence', value=value)
-                                elif topics_list[3] == "presence_event":
-                                    dev.updateStateOnServer(key='presenceEvent', value=payload)
-                                else: # presence_derived
-                                    broadcast_device_name = dev.name
-                                    dev.updateStateOnServer(key='presenceDerived', value=value)
-                                    if value:
-                                        uiValue = "present"
-                                    else:
-                                        uiValue = "inactive"
-                                    dev.updateStateOnServer(key='onOffState', value=value, uiValue=uiValue)
-                                    if value:
-                                        dev.updateStateImageOnServer(indigo.kStateImageSel.MotionSensorTripped)
-                                    else:
-                                        dev.updateStateImageOnServer(indigo.kStateImageSel.MotionSensor)
-
-                                    if not bool(dev.pluginProps.get("hideRadarBroadcast", False)):
-                                        self.hubHandlerLogger.info(f"received \"{broadcast_device_name}\" radar [FP1] sensor \"{uiValue}\" event")
-
-            # Check for Pressure
-            elif topics_list[3] == "measure-pressure" or topics_list[3] == "pressure":
-                with self.globals[LOCK_HE_LINKED_INDIGO_DEVICES]:
-                    for dev_id in self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES]:
-                        dev = indigo.devices[dev_id]
-                        if dev.pluginProps.get("uspPressure", False):
-                            pressure_units_ui = dev.pluginProps.get("uspPressureUnits", "")
-                            try:
-                                pressure = float(payload)
-                            except ValueError:
-                                return
-                            decimal_places = int(dev.pluginProps.get("uspPressureDecimalPlaces", 0))
-                            value, uiValue = self.processDecimalPlaces(pressure, decimal_places, pressure_units_ui, INDIGO_ONE_SPACE_BEFORE_UNITS)
+                                    self.update_state_image(linked_dev, indigo.kStateImageSel.SensorOff)
+                                broadcast_device_name = linked_dev.name
+                        else:
+                            self.hubHandlerLogger.error(f"received \"{broadcast_device_name}\" presence sensor update but unable to determine how to store update?")
+                            return
 
-                            uspPressureIndigo = dev.pluginProps.get("uspPressureIndigo", INDIGO_PRIMARY_DEVICE_ADDITIONAL_STATE)
+                        if dev_plan.properties["Presence"].broadcast:
+                            self.log_broadcast(f"received \"{broadcast_device_name}\" presence sensor \"{uiValue}\" event")
 
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def handle_property_radar(self, hub_name, hubitat_device_name, topics_list, payload):
+        try:
+            if len(topics_list) == 4:
+                for dev_id in self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES]:
+                    dev = indigo.devices[dev_id]
+                    dev_plan = self.ingest_plan(dev)
+                    if dev_plan.properties["Radar"].enabled:
+                        value = True if payload == "true" else False
+                        if topics_list[3] == "presence":
+                            self.update_state(dev, key='presence', value=value)
+                        elif topics_list[3] == "presence_event":
+                            self.update_state(dev, key='presenceEvent', value=payload)
+                        else: # presence_derived
                             broadcast_device_name = dev.name
-                            if uspPressureIndigo == INDIGO_PRIMARY_DEVICE_ADDITIONAL_STATE:
-                                dev.updateStateOnServer(key='pressure', value=value, uiValue=uiValue)
-                            elif uspPressureIndigo == INDIGO_SECONDARY_DEVICE:
-                                # Find linked device in device group
-                                linked_dev_id = self.determine_secondary_device_id(dev_id, "pressureSensorSecondary")
-                                if bool(linked_dev_id):
-                                    linked_dev = indigo.devices[linked_dev_id]
-                                    linked_dev.updateStateOnServer(key='sensorValue', value=value, uiValue=uiValue)
-                                    if value:
-                                        linked_dev.updateStateImageOnServer(_no_image())  # TODO: Decide best icon
-                                    else:
-                                        linked_dev.updateStateImageOnServer(_no_image())  # TODO: Decide best icon
-                                    broadcast_device_name = linked_dev.name
+                            self.update_state(dev, key='presenceDerived', value=value)
+                            if value:
+                                uiValue = "present"
                             else:
-                                self.hubHandlerLogger.error(f"received \"{broadcast_device_name}\" pressure update but unable to determine how to store update?")
-                                return
-
-                            if not bool(dev.pluginProps.get("hidePressureBroadcast", False)):
-                                self.hubHandlerLogger.info(f"received \"{broadcast_device_name}\" pressure sensor update to \"{uiValue}\" event")
-
-            # Check for HVAC Mode
-            elif topics_list[3] == "mode":
-                with self.globals[LOCK_HE_LINKED_INDIGO_DEVICES]:
-                    for dev_id in self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES]:
-                        dev = indigo.devices[dev_id]
-                        if dev.deviceTypeId == "thermostat" and dev.pluginProps.get("uspHvacMode", False):
-                            if payload == "off" or payload == "switched off":
-                                indigo_state_value = indigo.kHvacMode.Off
-                            elif payload == "heat":
-                                indigo_state_value = indigo.kHvacMode.Heat
-                            elif payload == "eco":
-                                indigo_state_value = indigo.kHvacMode.Cool
-                            elif payload == "auto":
-                                indigo_state_value = indigo.kHvacMode.HeatCool
+                                uiValue = "inactive"
+                            self.update_state(dev, key='onOffState', value=value, uiValue=uiValue)
+                            if value:
+                                self.update_state_image(dev, indigo.kStateImageSel.MotionSensorTripped)
                             else:
-                                self.hubHandlerLogger.warning(f"received \"{dev.name}\" hvac unknown mode update: payload = '{payload}'")
-                                return
-
-                            dev.updateStateOnServer(key='hvacMode', value=payload)
-                            if not bool(dev.pluginProps.get("hideHvacModeBroadcast", False)):
-                                dev.updateStateOnServer(key='hvacOperationMode', value=indigo_state_value)
-                                self.hubHandlerLogger.info(f"received \"{dev.name}\" hvac mode update to {payload}")
-
-            # Check for HVAC State
-            elif topics_list[3] == "state":
-                with self.globals[LOCK_HE_LINKED_INDIGO_DEVICES]:
-                    for dev_id in self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES]:
-                        dev = indigo.devices[dev_id]
-                        if dev.subType == indigo.kDimmerDeviceSubType.Blind and dev.pluginProps.get("uspState", False):
-                            dev.updateStateOnServer(key='state', value=payload)
-                            if not bool(dev.pluginProps.get("hideStateBroadcast", False)):
-                                self.hubHandlerLogger.info(f"received \"{dev.name}\" state update to {payload}")
-
-            # Check for Setpoint
-            elif topics_list[3] == "thermostat-setpoint":
-                with self.globals[LOCK_HE_LINKED_INDIGO_DEVICES]:
-                    for dev_id in self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES]:
-                        dev = indigo.devices[dev_id]
-                        if dev.pluginProps.get("uspSetpoint", False):
-                            try:
-                                setpointUnitsConversion = dev.pluginProps.get("uspSetpointUnitsConversion", "C")
-                                if setpointUnitsConversion in ["C", "F>C"]:  # noqa [Duplicated code fragment!]
-                                    setpoint_unit_ui = "°C"
-                                else:
-                                    setpoint_unit_ui = "°F"
-                                if setpointUnitsConversion == "C>F":
-                                    setpoint = float(((float(payload) * 9) / 5) + 32.0)
-                                elif setpointUnitsConversion == "F>C":
-                                    setpoint = float(((float(payload) - 32.0) * 5) / 9)
-                                else:
-                                    setpoint = float(payload)
-                            except ValueError:
-                                return
-
-                            decimal_places = int(dev.pluginProps.get("uspSetpointDecimalPlaces", 0))
-                            value, uiValue = self.processDecimalPlaces(setpoint, decimal_places, setpoint_unit_ui, INDIGO_NO_SPACE_BEFORE_UNITS)
-                            dev.updateStateOnServer(key='setpointHeat', value=value, uiValue=uiValue)
-                            # if topics_list[3] in HE_DEVICE_TYPES_MAIN_HABITAT_PROPERTIES[dev.deviceTypeId]:
-                            #     dev.updateStateImageOnServer(indigo.kStateImageSel.TemperatureSensor)
-                            if not bool(dev.pluginProps.get("hideSetpointBroadcast", False)):
-                                self.hubHandlerLogger.info(f"received \"{dev.name}\" setpoint update to {uiValue}")
-
-            # Check for Temperature
-            elif topics_list[3] == "measure-temperature" or topics_list[3] == "temperature":
-                with self.globals[LOCK_HE_LINKED_INDIGO_DEVICES]:
-                    for dev_id in self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES]:
-                        dev = indigo.devices[dev_id]
-                        if dev.pluginProps.get("uspTemperature", False):
-                            try:
-                                temperatureUnitsConversion = dev.pluginProps.get("uspTemperatureUnitsConversion", "C")
-                                if temperatureUnitsConversion in ["C", "F>C"]:  # noqa [Duplicated code fragment!]
-                                    temperature_unit_ui = "°C"
-                                else:
-                                    temperature_unit_ui = "°F"
-                                if temperatureUnitsConversion == "C>F":
-                                    temperature = float(((float(payload) * 9) / 5) + 32.0)
-                                elif temperatureUnitsConversion == "F>C":
-                                    temperature = float(((float(payload) - 32.0) * 5) / 9)
-                                else:
-                                    temperature = float(payload)
-                            except ValueError:
-                                return
+                                self.update_state_image(dev, indigo.kStateImageSel.MotionSensor)
 
-                            decimal_places = int(dev.pluginProps.get("uspTemperatureDecimalPlaces", 0))
-                            value, uiValue = self.processDecimalPlaces(temperature, decimal_places, temperature_unit_ui, INDIGO_NO_SPACE_BEFORE_UNITS)
+                            if dev_plan.properties["Radar"].broadcast:
+                                self.log_broadcast(f"received \"{broadcast_device_name}\" radar [FP1] sensor \"{uiValue}\" event")
 
-                            uspTemperatureIndigo = dev.pluginProps.get("uspTemperatureIndigo", INDIGO_PRIMARY_DEVICE_ADDITIONAL_STATE)
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
 
-                            broadcast_device_name = dev.name
-                            if uspTemperatureIndigo == INDIGO_PRIMARY_DEVICE_MAIN_UI_STATE:
-                                if dev.deviceTypeId == "thermostat":
-                                    dev.updateStateOnServer(key='temperatureInput1', value=value, uiValue=uiValue)
-                                else:
-                                    # Temperature Sensor
-                                    if "sensorValue" in dev.states:
-                                        dev.updateStateOnServer(key='sensorValue', value=value, uiValue=uiValue)
-                                    else:
-                                        dev.updateStateOnServer(key='temperatureInput1', value=value, uiValue=uiValue)
-                                dev.updateStateImageOnServer(indigo.kStateImageSel.TemperatureSensor)
-                            elif uspTemperatureIndigo == INDIGO_PRIMARY_DEVICE_ADDITIONAL_STATE:
-                                dev.updateStateOnServer(key='temperature', value=value, uiValue=uiValue)
-                            elif uspTemperatureIndigo == INDIGO_SECONDARY_DEVICE:
-                                # Find linked device in device group
-                                linked_dev_id = self.determine_secondary_device_id(dev_id, "temperatureSensorSecondary")
-                                if bool(linked_dev_id):
-                                    linked_dev = indigo.devices[linked_dev_id]
-                                    if "sensorValue" in linked_dev.states:
-                                        linked_dev.updateStateOnServer(key='sensorValue', value=value, uiValue=uiValue)
-                                    else:
-                                        linked_dev.updateStateOnServer(key='temperatureInput1', value=value, uiValue=uiValue)
-                                    linked_dev.updateStateImageOnServer(indigo.kStateImageSel.TemperatureSensor)
-                                    broadcast_device_name = linked_dev.name
+    def handle_property_presence_and_radar(self, hub_name, hubitat_device_name, topics_list, payload):
+        try:
+            self.handle_property_presence(hub_name, hubitat_device_name, topics_list, payload)
+            self.handle_property_radar(hub_name, hubitat_device_name, topics_list, payload)
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def handle_property_pressure(self, hub_name, hubitat_device_name, topics_list, payload):
+        try:
+            for dev_id in self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES]:
+                dev = indigo.devices[dev_id]
+                dev_plan = self.ingest_plan(dev)
+                if dev_plan.properties["Pressure"].enabled:
+                    pressure_units_ui = dev_plan.properties["Pressure"].units
+                    try:
+                        pressure = float(payload)
+                    except ValueError:
+                        return
+                    decimal_places = dev_plan.properties["Pressure"].decimal_places
+                    value, uiValue = self.processDecimalPlaces(pressure, decimal_places, pressure_units_ui, INDIGO_ONE_SPACE_BEFORE_UNITS)
+
+                    uspPressureIndigo = dev_plan.properties["Pressure"].storage
+
+                    broadcast_device_name = dev.name
+                    if uspPressureIndigo == INDIGO_PRIMARY_DEVICE_ADDITIONAL_STATE:
+                        self.update_state(dev, key='pressure', value=value, uiValue=uiValue)
+                    elif uspPressureIndigo == INDIGO_SECONDARY_DEVICE:
+                        # Find linked device in device group
+                        linked_dev_id = self.determine_secondary_device_id(dev_id, "pressureSensorSecondary")
+                        if bool(linked_dev_id):
+                            linked_dev = indigo.devices[linked_dev_id]
+                            self.update_state(linked_dev, key='sensorValue', value=value, uiValue=uiValue)
+                            if value:
+                                self.update_state_image(linked_dev, _no_image())  # TODO: Decide best icon
                             else:
-                                self.hubHandlerLogger.error(f"received \"{broadcast_device_name}\" temperature update but unable to determine how to store update?")
-                                return
-
-                            if not bool(dev.pluginProps.get("hideTemperatureBroadcast", False)):
-                                # self.hubHandlerLogger.error(f"TYPE UIVALUE: \"{type(uiValue)}\", TYPE BROADCAST_DEVICE_NAME: \"{type(broadcast_device_name)}\"")
-                                self.hubHandlerLogger.info(f"received \"{broadcast_device_name}\" temperature update to {uiValue}")
-
-            # Check for Voltage
-            elif topics_list[3] == "measure-voltage" or topics_list[3] == "voltage":
-                with self.globals[LOCK_HE_LINKED_INDIGO_DEVICES]:
-                    for dev_id in self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES]:
-                        dev = indigo.devices[dev_id]
-                        if dev.pluginProps.get("uspVoltage", False):
-                            try:
-                                voltage = float(payload)
-                            except ValueError:
-                                return
-                            decimal_places = int(dev.pluginProps.get("uspVoltageDecimalPlaces", 0))
-                            value, uiValue = self.processDecimalPlaces(voltage, decimal_places, "Volts", INDIGO_ONE_SPACE_BEFORE_UNITS)
+                                self.update_state_image(linked_dev, _no_image())  # TODO: Decide best icon
+                            broadcast_device_name = linked_dev.name
+                    else:
+                        self.hubHandlerLogger.error(f"received \"{broadcast_device_name}\" pressure update but unable to determine how to store update?")
+                        return
 
-                            uspVoltageIndigo = dev.pluginProps.get("uspVoltageIndigo", INDIGO_PRIMARY_DEVICE_ADDITIONAL_STATE)
+                    if dev_plan.properties["Pressure"].broadcast:
+                        self.log_broadcast(f"received \"{broadcast_device_name}\" pressure sensor update to \"{uiValue}\" event")
 
-                            broadcast_device_name = dev.name
-                            if uspVoltageIndigo == INDIGO_PRIMARY_DEVICE_ADDITIONAL_STATE:
-                                dev.updateStateOnServer(key='voltage', value=value, uiValue=uiValue)
-                            elif uspVoltageIndigo == INDIGO_SECONDARY_DEVICE:
-                                # Find linked device in device group
-                                linked_dev_id = self.determine_secondary_device_id(dev_id, "voltageSensorSecondary")
-                                if bool(linked_dev_id):
-                                    linked_dev = indigo.devices[linked_dev_id]
-                                    linked_dev.updateStateOnServer(key='sensorValue', value=value, uiValue=uiValue)
-                                    if value:
-                                        linked_dev.updateStateImageOnServer(indigo.kStateImageSel.LightSensorOn)
-                                    else:
-                                        linked_dev.updateStateImageOnServer(indigo.kStateImageSel.LightSensorOff)
-                                    broadcast_device_name = linked_dev.name
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def handle_property_hvac_mode(self, hub_name, hubitat_device_name, topics_list, payload):
+        try:
+            for dev_id in self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES]:
+                dev = indigo.devices[dev_id]
+                dev_plan = self.ingest_plan(dev)
+                if dev.deviceTypeId == "thermostat" and dev_plan.properties["HvacMode"].enabled:
+                    if payload == "off" or payload == "switched off":
+                        indigo_state_value = indigo.kHvacMode.Off
+                    elif payload == "heat":
+                        indigo_state_value = indigo.kHvacMode.Heat
+                    elif payload == "eco":
+                        indigo_state_value = indigo.kHvacMode.Cool
+                    elif payload == "auto":
+                        indigo_state_value = indigo.kHvacMode.HeatCool
+                    else:
+                        self.hubHandlerLogger.warning(f"received \"{dev.name}\" hvac unknown mode update: payload = '{payload}'")
+                        return
+
+                    self.update_state(dev, key='hvacMode', value=payload)
+                    if dev_plan.properties["HvacMode"].broadcast:
+                        self.update_state(dev, key='hvacOperationMode', value=indigo_state_value)
+                        self.log_broadcast(f"received \"{dev.name}\" hvac mode update to {payload}")
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def handle_property_hvac_state(self, hub_name, hubitat_device_name, topics_list, payload):
+        try:
+            for dev_id in self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES]:
+                dev = indigo.devices[dev_id]
+                dev_plan = self.ingest_plan(dev)
+                if dev.subType == indigo.kDimmerDeviceSubType.Blind and dev_plan.properties["State"].enabled:
+                    self.update_state(dev, key='state', value=payload)
+                    if dev_plan.properties["State"].broadcast:
+                        self.log_broadcast(f"received \"{dev.name}\" state update to {payload}")
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def handle_property_setpoint(self, hub_name, hubitat_device_name, topics_list, payload):
+        try:
+            for dev_id in self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES]:
+                dev = indigo.devices[dev_id]
+                dev_plan = self.ingest_plan(dev)
+                if dev_plan.properties["Setpoint"].enabled:
+                    try:
+                        setpointUnitsConversion = dev_plan.properties["Setpoint"].units_conversion
+                        if setpointUnitsConversion in ["C", "F>C"]:  # noqa [Duplicated code fragment!]
+                            setpoint_unit_ui = "°C"
+                        else:
+                            setpoint_unit_ui = "°F"
+                        if setpointUnitsConversion == "C>F":
+                            setpoint = float(((float(payload) * 9) / 5) + 32.0)
+                        elif setpointUnitsConversion == "F>C":
+                            setpoint = float(((float(payload) - 32.0) * 5) / 9)
+                        else:
+                            setpoint = float(payload)
+                    except ValueError:
+                        return
+
+                    decimal_places = dev_plan.properties["Setpoint"].decimal_places
+                    value, uiValue = self.processDecimalPlaces(setpoint, decimal_places, setpoint_unit_ui, INDIGO_NO_SPACE_BEFORE_UNITS)
+                    self.update_state(dev, key='setpointHeat', value=value, uiValue=uiValue)
+                    # if topics_list[3] in HE_DEVICE_TYPES_MAIN_HABITAT_PROPERTIES[dev.deviceTypeId]:
+                    #     dev.updateStateImageOnServer(indigo.kStateImageSel.TemperatureSensor)
+                    if dev_plan.properties["Setpoint"].broadcast:
+                        self.log_broadcast(f"received \"{dev.name}\" setpoint update to {uiValue}")
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def handle_property_temperature(self, hub_name, hubitat_device_name, topics_list, payload):
+        try:
+            for dev_id in self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES]:
+                dev = indigo.devices[dev_id]
+                dev_plan = self.ingest_plan(dev)
+                if dev_plan.properties["Temperature"].enabled:
+                    try:
+                        temperatureUnitsConversion = dev_plan.properties["Temperature"].units_conversion
+                        if temperatureUnitsConversion in ["C", "F>C"]:  # noqa [Duplicated code fragment!]
+                            temperature_unit_ui = "°C"
+                        else:
+                            temperature_unit_ui = "°F"
+                        if temperatureUnitsConversion == "C>F":
+                            temperature = float(((float(payload) * 9) / 5) + 32.0)
+                        elif temperatureUnitsConversion == "F>C":
+                            temperature = float(((float(payload) - 32.0) * 5) / 9)
+                        else:
+                            temperature = float(payload)
+                    except ValueError:
+                        return
+
+                    decimal_places = dev_plan.properties["Temperature"].decimal_places
+                    value, uiValue = self.processDecimalPlaces(temperature, decimal_places, temperature_unit_ui, INDIGO_NO_SPACE_BEFORE_UNITS)
+                    if self.rate_limited(dev, dev_plan, "Temperature", value, (hub_name, hubitat_device_name, topics_list, payload)):
+                        continue
+
+                    uspTemperatureIndigo = dev_plan.properties["Temperature"].storage
+
+                    broadcast_device_name = dev.name
+                    if uspTemperatureIndigo == INDIGO_PRIMARY_DEVICE_MAIN_UI_STATE:
+                        if dev.deviceTypeId == "thermostat":
+                            self.update_state(dev, key='temperatureInput1', value=value, uiValue=uiValue)
+                        else:
+                            # Temperature Sensor
+                            if "sensorValue" in dev.states:
+                                self.update_state(dev, key='sensorValue', value=value, uiValue=uiValue)
+                            else:
+                                self.update_state(dev, key='temperatureInput1', value=value, uiValue=uiValue)
+                        self.update_state_image(dev, indigo.kStateImageSel.TemperatureSensor)
+                    elif uspTemperatureIndigo == INDIGO_PRIMARY_DEVICE_ADDITIONAL_STATE:
+                        self.update_state(dev, key='temperature', value=value, uiValue=uiValue)
+                    elif uspTemperatureIndigo == INDIGO_SECONDARY_DEVICE:
+                        # Find linked device in device group
+                        linked_dev_id = self.determine_secondary_device_id(dev_id, "temperatureSensorSecondary")
+                        if bool(linked_dev_id):
+                            linked_dev = indigo.devices[linked_dev_id]
+                            if "sensorValue" in linked_dev.states:
+                                self.update_state(linked_dev, key='sensorValue', value=value, uiValue=uiValue)
+                            else:
+                                self.update_state(linked_dev, key='temperatureInput1', value=value, uiValue=uiValue)
+                            self.update_state_image(linked_dev, indigo.kStateImageSel.TemperatureSensor)
+                            broadcast_device_name = linked_dev.name
+                    else:
+                        self.hubHandlerLogger.error(f"received \"{broadcast_device_name}\" temperature update but unable to determine how to store update?")
+                        return
+
+                    if dev_plan.properties["Temperature"].broadcast:
+                        # self.hubHandlerLogger.error(f"TYPE UIVALUE: \"{type(uiValue)}\", TYPE BROADCAST_DEVICE_NAME: \"{type(broadcast_device_name)}\"")
+                        self.log_broadcast(f"received \"{broadcast_device_name}\" temperature update to {uiValue}")
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def handle_property_voltage(self, hub_name, hubitat_device_name, topics_list, payload):
+        try:
+            for dev_id in self.globals[HE_HUBS][hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES]:
+                dev = indigo.devices[dev_id]
+                dev_plan = self.ingest_plan(dev)
+                if dev_plan.properties["Voltage"].enabled:
+                    try:
+                        voltage = float(payload)
+                    except ValueError:
+                        return
+                    decimal_places = dev_plan.properties["Voltage"].decimal_places
+                    value, uiValue = self.processDecimalPlaces(voltage, decimal_places, "Volts", INDIGO_ONE_SPACE_BEFORE_UNITS)
+                    if self.rate_limited(dev, dev_plan, "Voltage", value, (hub_name, hubitat_device_name, topics_list, payload)):
+                        continue
+
+                    uspVoltageIndigo = dev_plan.properties["Voltage"].storage
+
+                    broadcast_device_name = dev.name
+                    if uspVoltageIndigo == INDIGO_PRIMARY_DEVICE_ADDITIONAL_STATE:
+                        self.update_state(dev, key='voltage', value=value, uiValue=uiValue)
+                    elif uspVoltageIndigo == INDIGO_SECONDARY_DEVICE:
+                        # Find linked device in device group
+                        linked_dev_id = self.determine_secondary_device_id(dev_id, "voltageSensorSecondary")
+                        if bool(linked_dev_id):
+                            linked_dev = indigo.devices[linked_dev_id]
+                            self.update_state(linked_dev, key='sensorValue', value=value, uiValue=uiValue)
+                            if value:
+                                self.update_state_image(linked_dev, indigo.kStateImageSel.LightSensorOn)
                             else:
-                                self.hubHandlerLogger.error(f"received \"{broadcast_device_name}\" voltage update but unable to determine how to store update?")
-                                return
+                                self.update_state_image(linked_dev, indigo.kStateImageSel.LightSensorOff)
+                            broadcast_device_name = linked_dev.name
+                    else:
+                        self.hubHandlerLogger.error(f"received \"{broadcast_device_name}\" voltage update but unable to determine how to store update?")
+                        return
+
+                    if dev_plan.properties["Voltage"].broadcast:
+                        self.log_broadcast(f"received \"{broadcast_device_name}\" voltage \"{uiValue}\" event")
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+
+    def log_broadcast(self, message):
+        # Log a 'received ... event' line, unless ingesting the retained snapshot
+        if not self.bootstrapping:
+            self.hubHandlerLogger.info(message, stacklevel=2)  # Attribute the log line to the calling method
+
+    def update_state(self, dev, key, value, uiValue=None):
+        try:
+            # Queue a state update for the device; it is written to the Indigo server by flush_state_updates
+            if dev.id not in self.pending_state_updates:
+                self.pending_state_updates[dev.id] = [dev, dict(), None]
+            state = {"key": key, "value": value}
+            if uiValue is not None:
+                state["uiValue"] = uiValue
+            self.pending_state_updates[dev.id][1][key] = state  # A later update of the same state replaces an earlier one
+            self.statistics[HE_STATISTICS_STATE_UPDATES] += 1
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def update_states(self, dev, key_value_list):
+        try:
+            for state in key_value_list:
+                self.update_state(dev, state["key"], state["value"], state.get("uiValue", None))
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def update_state_image(self, dev, state_image):
+        try:
+            # Queue a state image update for the device; only the last one requested is written to the Indigo server
+            if dev.id not in self.pending_state_updates:
+                self.pending_state_updates[dev.id] = [dev, dict(), None]
+            self.pending_state_updates[dev.id][2] = state_image
+            self.statistics[HE_STATISTICS_STATE_UPDATES] += 1
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def flush_state_updates(self):
+        try:
+            # Write the queued state updates for each device with one updateStatesOnServer call plus at most one state image update
+            # States (and the state image) whose value is unchanged since last written are suppressed unless the device is set to force refresh
+            pending_state_updates = self.pending_state_updates
+            self.pending_state_updates = dict()
+            for dev, key_value_dict, state_image in pending_state_updates.values():
+                try:
+                    force_refresh = self.force_state_refresh(dev)
+                    if dev.id not in self.globals[HE_LAST_WRITTEN_STATES]:
+                        self.globals[HE_LAST_WRITTEN_STATES][dev.id] = [dict(), None]
+                    last_written_states = self.globals[HE_LAST_WRITTEN_STATES][dev.id][0]
+
+                    key_value_list = list()
+                    for state in key_value_dict.values():
+                        if not force_refresh and last_written_states.get(state["key"], None) == (state["value"], state.get("uiValue", None)):
+                            if dev.states.get(state["key"], None) == state["value"]:  # Guard against the state having been changed elsewhere
+                                self.statistics[HE_STATISTICS_STATE_UPDATES_SUPPRESSED] += 1
+                                continue
+                        key_value_list.append(state)
+                    if len(key_value_list) > 0:
+                        dev.updateStatesOnServer(key_value_list)
+                        self.statistics[HE_STATISTICS_SERVER_ROUND_TRIPS] += 1
+                        for state in key_value_list:
+                            last_written_states[state["key"]] = (state["value"], state.get("uiValue", None))
+
+                    if state_image is not None:
+                        if (not force_refresh and self.globals[HE_LAST_WRITTEN_STATES][dev.id][1] == state_image
+                                and dev.displayStateImageSel == state_image):  # Guard against the state image having been changed elsewhere
+                            self.statistics[HE_STATISTICS_STATE_UPDATES_SUPPRESSED] += 1
+                        else:
+                            dev.updateStateImageOnServer(state_image)
+                            self.statistics[HE_STATISTICS_SERVER_ROUND_TRIPS] += 1
+                            self.globals[HE_LAST_WRITTEN_STATES][dev.id][1] = state_image
+                except Exception as exception_error:
+                    self.exception_handler(f"Unable to update states of '{dev.name}': {exception_error}", True)  # Log error and continue with other devices
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def force_state_refresh(self, dev):
+        try:
+            # A secondary device follows the 'Force State Refresh' setting of its primary device, read from the primary's compiled plan so that
+            #   no Indigo server call is made. If the primary isn't started (so has no plan), the secondary's own setting is used.
+            dev_plan = self.ingest_plan(dev)
+            primary_dev_id = dev_plan.linked_primary_dev_id
+            if primary_dev_id != 0 and primary_dev_id != dev.id:
+                dev_plan = self.globals[HE_INGEST_PLANS].get(primary_dev_id, dev_plan)
+            return dev_plan.force_state_refresh
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def rate_limited(self, dev, dev_plan, rate_limited_property, value, message):
+        try:
+            # Apply the device's deadband and minimum update interval settings for the property (e.g. 'Power' for 'uspPowerDeadband').
+            # Returns True if the update is to be suppressed; otherwise the value is recorded as the last one accepted for the property.
+            # An update arriving within the minimum interval that would pass the deadband is held (message is the property handler's
+            #   hub_name, hubitat_device_name, topics_list and payload) and written by update_rate_limited_pending once the interval has elapsed.
+            rate_limited_key = (dev.id, rate_limited_property)
+            if self.rate_limited_replay is not None:
+                if self.rate_limited_replay != rate_limited_key:
+                    return True  # Replaying a held update for another device or property linked to the same Hubitat device
+                self.globals[HE_RATE_LIMITS].setdefault(dev.id, dict())[rate_limited_property] = (value, time.monotonic())
+                return False
+
+            property_plan = dev_plan.properties[rate_limited_property]
+            deadband = property_plan.deadband
+            minimum_interval = property_plan.minimum_interval
+
+            now = time.monotonic()
+            if dev.id not in self.globals[HE_RATE_LIMITS]:
+                self.globals[HE_RATE_LIMITS][dev.id] = dict()
+            last_accepted = self.globals[HE_RATE_LIMITS][dev.id].get(rate_limited_property, None)
+            if last_accepted is not None:
+                last_value, last_time = last_accepted
+                within_deadband = False
+                if deadband > 0.0:
+                    if property_plan.deadband_percentage:
+                        if last_value == 0:
+                            within_deadband = value == 0  # A percentage of zero is zero, so any change from zero is outside the deadband
+                        else:
+                            within_deadband = abs(value - last_value) < abs(last_value) * deadband / 100.0
+                    else:
+                        within_deadband = abs(value - last_value) < deadband
+                held = rate_limited_key in self.rate_limited_pending
+                if within_deadband or (minimum_interval > 0.0 and (now - last_time) < minimum_interval):
+                    if held:
+                        del self.rate_limited_pending[rate_limited_key]  # Superseded by this later update, so never written
+                        self.statistics[HE_STATISTICS_RATE_LIMITED][rate_limited_property] += 1
+                    if within_deadband:
+                        self.statistics[HE_STATISTICS_RATE_LIMITED][rate_limited_property] += 1
+                    else:
+                        self.rate_limited_pending[rate_limited_key] = (last_time + minimum_interval, message)
+                    return True
+                if held:
+                    del self.rate_limited_pending[rate_limited_key]  # Superseded by this later update, so never written
+                    self.statistics[HE_STATISTICS_RATE_LIMITED][rate_limited_property] += 1
+
+            self.globals[HE_RATE_LIMITS][dev.id][rate_limited_property] = (value, now)
+            return False
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def rate_limited_pending_timeout(self):
+        try:
+            # How long the hub thread can wait for the next message before a held update is due to be written
+            if len(self.rate_limited_pending) == 0:
+                return 5
+            next_due = min(due for due, message in self.rate_limited_pending.values())
+            return min(5, max(0.01, next_due - time.monotonic()))
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+            return 5
+
+    def update_rate_limited_pending(self):
+        try:
+            # Write each held update whose minimum interval has elapsed by replaying its message through the property handler
+            if len(self.rate_limited_pending) == 0:
+                return
+            now = time.monotonic()
+            for rate_limited_key, (due, message) in list(self.rate_limited_pending.items()):
+                if due > now:
+                    continue
+                del self.rate_limited_pending[rate_limited_key]
+                dev_id, rate_limited_property = rate_limited_key
+                hub_name, hubitat_device_name, topics_list, payload = message
+                if hub_name not in self.globals[HE_HUBS] or hubitat_device_name not in self.globals[HE_HUBS][hub_name][HE_DEVICES]:
+                    continue
+                self.rate_limited_replay = rate_limited_key
+                try:
+                    self.rate_limited_handlers[rate_limited_property](hub_name, hubitat_device_name, topics_list, payload)
+                finally:
+                    self.rate_limited_replay = None
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
 
-                            if not bool(dev.pluginProps.get("hideVoltageBroadcast", False)):
-                                self.hubHandlerLogger.info(f"received \"{broadcast_device_name}\" voltage \"{uiValue}\" event")
+    def record_last_message(self, hub_dev, topics, payload):
+        try:
+            # Keep an in-memory copy of the most recent Hubitat device message and queue it for the hub device's lastTopic / lastPayload states,
+            #   which are updated at most once per the hub's 'Last Topic Update Interval' (or never if disabled)
+            self.last_message = (topics, payload)
+            self.globals[HE_HUB_LAST_MESSAGE][self.hubitat_hub_id] = self.last_message
+
+            last_message_interval = self.ingest_plan(hub_dev).last_message_interval
+            if last_message_interval is None:  # Disabled
+                return
+            self.last_message_interval = last_message_interval
+            self.last_message_hub_dev = hub_dev
+            self.last_message_pending = True
+            self.update_last_message_states()
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def update_last_message_states(self):
+        try:
+            # Write the most recent message to the hub device once the interval since the last write has elapsed
+            if not self.last_message_pending:
+                return
+            now = time.monotonic()
+            if (now - self.last_message_published) < self.last_message_interval:
+                return
+            self.last_message_pending = False
+            self.last_message_published = now
+
+            key_value_list = [
+                {'key': 'lastTopic', 'value': self.last_message[0]},
+                {'key': 'lastPayload', 'value': self.last_message[1]}
+            ]
+            self.update_states(self.last_message_hub_dev, key_value_list)
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def update_rate_limited_states(self):
+        try:
+            # Expose the counts of rate limited property updates as states of the Hubitat Elevation Hub device, at most once per interval
+            rate_limited_counts = tuple(self.statistics[HE_STATISTICS_RATE_LIMITED].values())
+            published_counts, published_time = self.statistics[HE_STATISTICS_RATE_LIMITED_PUBLISHED]
+            if rate_limited_counts == published_counts:
+                return
+            now = time.monotonic()
+            if published_counts is not None and (now - published_time) < HE_RATE_LIMITED_STATES_UPDATE_INTERVAL:
+                return
+            self.statistics[HE_STATISTICS_RATE_LIMITED_PUBLISHED] = [rate_limited_counts, now]
+
+            if self.hubitat_hub_id not in indigo.devices:
+                return
+            hub_dev = indigo.devices[self.hubitat_hub_id]
+            for rate_limited_property, count in self.statistics[HE_STATISTICS_RATE_LIMITED].items():
+                self.update_state(hub_dev, key=f"suppressed{rate_limited_property}Updates", value=count)
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def update_latency_states(self):
+        try:
+            # Expose the end to end latency percentiles (milliseconds) as states of the Hubitat Elevation Hub device, at most once per interval
+            total_histogram = self.latency_histograms[LATENCY_STAGE_TOTAL]
+            published_count, published_time = self.statistics[HE_STATISTICS_LATENCY_PUBLISHED]
+            if total_histogram.count == published_count:
+                return
+            now = time.monotonic()
+            if published_count is not None and (now - published_time) < HE_LATENCY_STATES_UPDATE_INTERVAL:
+                return
+            self.statistics[HE_STATISTICS_LATENCY_PUBLISHED] = [total_histogram.count, now]
+
+            if self.hubitat_hub_id not in indigo.devices:
+                return
+            hub_dev = indigo.devices[self.hubitat_hub_id]
+            for latency_state in latency_percentile_states(total_histogram):
+                self.update_state(hub_dev, **latency_state)
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def ingest_plan(self, dev):
+        try:
+            # Return the device's compiled ingest plan (see ingestPlan.py).
+            # The plan is built in deviceStartComm, replaced by closedDeviceConfigUi and deleted by deviceStopComm, all on the plugin thread.
+            # A device without a plan is stopped, so a plan is built for this message only: storing it would recreate the plan deviceStopComm deleted.
+            dev_plan = self.globals[HE_INGEST_PLANS].get(dev.id, None)
+            if dev_plan is None:
+                dev_plan = IngestPlan(dev.pluginProps)
+            return dev_plan
 
         except Exception as exception_error:
             self.exception_handler(exception_error, True)  # Log error and display failing statement
 
     def determine_secondary_device_id(self, dev_id, secondary_dev_type_id):
         try:
-            dev_id_list = indigo.device.getGroupList(dev_id)
-            secondary_dev_id = 0
-            if len(dev_id_list) > 1:
-                for grouped_dev_id in dev_id_list:
-                    if grouped_dev_id != dev_id and indigo.devices[grouped_dev_id].deviceTypeId == secondary_dev_type_id:
-                        secondary_dev_id = grouped_dev_id
-                        break
-            return secondary_dev_id
+            # The index of secondary devices is maintained by the plugin as device groups are started, created and deleted
+            return self.globals[HE_SECONDARY_DEVICES].get((dev_id, secondary_dev_type_id), 0)
 
         except Exception as exception_error:
             self.exception_handler(exception_error, True)  # Log error and display failing statement
@@ -1113,18 +1572,23 @@ class ThreadHubHandler(threading.Thread):
         except Exception as exception_error:
             self.exception_handler(exception_error, True)  # Log error and display failing statement
 
-    def mqtt_filter_log_processing(self, hubitat_key, hub_name, topics, payload):
+    def mqtt_filter_log_processing(self, hub_name, hubitat_device_name, topics, payload):
         try:
-            log_mqtt_msg = False  # Assume MQTT message should NOT be logged
-            # Check if MQTT message filtering required
-            if HE_MQTT_FILTERS in self.globals:
-                if len(self.globals[HE_MQTT_FILTERS]) > 0 and self.globals[HE_MQTT_FILTERS] != ["-0-"]:
-                    # As entries exist in the filter list, only log MQTT message in Hubitat device in the filter list
-                    if self.globals[HE_MQTT_FILTERS] == ["-1-"] or hubitat_key in self.globals[HE_MQTT_FILTERS]:
-                        log_mqtt_msg = True
+            if not self.hubHandlerLogger.isEnabledFor(LOG_LEVEL_TOPIC):
+                return
+
+            log_filter = self.globals[HE_MQTT_FILTERS]
+            if self.log_filter_decisions[0] is not log_filter:  # Filter replaced by closedPrefsConfigUi - discard decisions
+                self.log_filter_decisions = (log_filter, dict())
+            log_mqtt_msg = self.log_filter_decisions[1].get(hubitat_device_name, None)
+            if log_mqtt_msg is None:
+                log_filter_mode, log_filter_keys = log_filter
+                hubitat_key = f"{hub_name.lower()}|{hubitat_device_name.lower()}"
+                log_mqtt_msg = log_filter_mode == MQTT_LOG_FILTER_ALL or (log_filter_mode == MQTT_LOG_FILTER_SELECTED and hubitat_key in log_filter_keys)
+                self.log_filter_decisions[1][hubitat_device_name] = log_mqtt_msg
 
             if log_mqtt_msg:
-                self.hubHandlerLogger.topic(f"Received from '{hub_name}': Topic='{topics}', Payload='{payload}'")  # noqa [Unresolved attribute reference]
+                self.hubHandlerLogger.topic("Received from '%s': Topic='%s', Payload='%s'", hub_name, topics, payload)  # noqa [Unresolved attribute reference]
 
         except Exception as exception_error:
             self.exception_handler(exception_error, True)  # Log error and display failing statement
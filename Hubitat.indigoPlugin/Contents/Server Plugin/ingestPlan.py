@@ -0,0 +1,81 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Hubitat - Ingest Plan © Autolog 2022 - 2023
+#
+
+from constants import *
+
+# Hubitat properties that can be stored in an Indigo device: the suffix of the device's 'usp...' and 'hide...Broadcast' plugin properties
+INGEST_PLAN_PROPERTIES = ("Acceleration", "Button", "ColorRGB", "Contact", "Dimmer", "Energy", "Hsm", "Humidity", "HvacMode", "Illuminance", "Lock",
+                          "Motion", "OnOff", "Position", "Power", "Presence", "Pressure", "Radar", "Setpoint", "State", "Temperature", "Valve", "Voltage",
+                          "WhiteTemperature")
+
+
+def props_int(props, key, default):
+    try:
+        return int(props.get(key, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def props_float(props, key, default):
+    try:
+        return float(props.get(key, default))
+    except (TypeError, ValueError):
+        return default
+
+
+class IngestPropertyPlan:
+
+    # How a Hubitat property is stored in an Indigo device, resolved from the device's plugin properties for the property e.g. 'uspPowerDecimalPlaces'
+
+    __slots__ = ("enabled", "decimal_places", "units", "units_conversion", "storage", "broadcast", "deadband", "deadband_percentage", "minimum_interval")
+
+    def __init__(self, props, hubitat_property):
+        self.enabled = bool(props.get(f"usp{hubitat_property}", False))
+        self.decimal_places = props_int(props, f"usp{hubitat_property}DecimalPlaces", 0)
+        self.units = props.get(f"usp{hubitat_property}Units", "")
+        self.units_conversion = props.get(f"usp{hubitat_property}UnitsConversion", "C")
+        self.storage = props.get(f"usp{hubitat_property}Indigo", INDIGO_PRIMARY_DEVICE_ADDITIONAL_STATE)
+        self.broadcast = not bool(props.get(f"hide{hubitat_property}Broadcast", False))
+        self.deadband = props_float(props, f"usp{hubitat_property}Deadband", 0.0)
+        self.deadband_percentage = props.get(f"usp{hubitat_property}DeadbandType", "absolute") == "percentage"
+        self.minimum_interval = props_float(props, f"usp{hubitat_property}MinimumInterval", 0.0)
+
+
+class IngestPlan:
+
+    # The plugin properties of a Hubitat Elevation Hub or Hubitat device, compiled once into attributes for the hub handler thread to use on every
+    #   received message instead of materialising and parsing dev.pluginProps each time
+    # A plan is never modified once built: when the device's properties change, a new plan replaces it in the HE_INGEST_PLANS dict (a single,
+    #   atomic, assignment) so the hub handler thread always sees either the complete old plan or the complete new one
+
+    __slots__ = ("properties", "hsm_property", "supports_battery_level", "supports_white", "number_of_buttons", "power_minimum_reporting_level",
+                 "power_reporting_hysteresis", "linked_primary_dev_id", "force_state_refresh", "last_message_interval")
+
+    def __init__(self, props):
+        props = dict(props)  # A single copy, as each access of dev.pluginProps returns a fresh one
+
+        self.properties = dict()
+        for hubitat_property in INGEST_PLAN_PROPERTIES:
+            self.properties[hubitat_property] = IngestPropertyPlan(props, hubitat_property)
+
+        self.hsm_property = props.get("hubitatPropertyHsm", None)  # Hubitat Elevation Hub only: None if the hub hasn't been set up for HSM
+        self.supports_battery_level = bool(props.get("SupportsBatteryLevel", False))
+        self.supports_white = bool(props.get("SupportsWhite", False))
+        self.number_of_buttons = props_int(props, "uspNumberOfButtons", 1)
+        self.power_minimum_reporting_level = props_float(props, "uspPowerMinimumReportingLevel", 0.0)
+        self.power_reporting_hysteresis = props_float(props, "uspPowerReportingHysteresis", 6.0)
+        self.linked_primary_dev_id = props_int(props, "linkedPrimaryIndigoDeviceId", 0)
+        self.force_state_refresh = bool(props.get("forceStateRefresh", False))
+
+        # Hubitat Elevation Hub only: seconds between writes of the lastTopic / lastPayload states, or None if disabled
+        last_message_interval = props.get("lastMessageStatesInterval", "1000")
+        if last_message_interval == "disabled":
+            self.last_message_interval = None
+        else:
+            try:
+                self.last_message_interval = float(last_message_interval) / 1000.0
+            except ValueError:
+                self.last_message_interval = 0.0
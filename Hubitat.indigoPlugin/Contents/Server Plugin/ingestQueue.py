@@ -0,0 +1,90 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Hubitat - Ingest Queue © Autolog 2022 - 2023
+#
+
+import queue
+
+from constants import *
+
+
+class IngestQueue(queue.Queue):
+
+    # This class queues received MQTT messages for a handler thread (Hub, Tasmota or Export)
+    #   Messages are lists whose topic is the third entry from the end e.g. [sequence, command, <hub id>, topic, topic list, payload]
+    #   The MQTT Broker threads call put_message, which applies the selected overload policy when the queue is full
+    #   If coalescing, a newer message replaces the unprocessed message for the same topic, keeping the first arrival's place in the queue
+
+    def __init__(self, maxsize=0, coalescing=False):
+        queue.Queue.__init__(self, maxsize)
+        self.coalescing = coalescing
+
+    def _init(self, maxsize):
+        queue.Queue._init(self, maxsize)
+        self.queued_topics = dict()  # Latest unprocessed message for each topic, used to coalesce
+        self.high_water_mark = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.closed = False
+
+    def _put(self, item):
+        self.queue.append(item)
+        self.queued_topics[item[-3]] = item
+        if len(self.queue) > self.high_water_mark:
+            self.high_water_mark = len(self.queue)
+
+    def _get(self):
+        item = self.queue.popleft()
+        if self.queued_topics.get(item[-3]) is item:
+            del self.queued_topics[item[-3]]
+        return item
+
+    def put_message(self, item, overload_policy, stop_event, coalescible=True):
+        # Returns the number of messages dropped to queue the message; coalescible is False for messages that must each be processed e.g. button pushes
+        with self.not_full:
+            if self.coalescing and coalescible:
+                queued_item = self.queued_topics.get(item[-3])
+                if queued_item is not None:
+                    queued_item[:] = item  # Latest value wins: replace the unprocessed message for this topic in place
+                    self.coalesced += 1
+                    return 0
+
+            if 0 < self.maxsize <= self._qsize():
+                if overload_policy == MQTT_INGEST_POLICY_BLOCK:
+                    # Block the MQTT network loop (the broker stops receiving) until there is room, the queue is closed or the MQTT Broker thread is stopping
+                    while 0 < self.maxsize <= self._qsize() and not self.closed and not stop_event.is_set():
+                        self.not_full.wait(1.0)
+                    if self.closed or stop_event.is_set():
+                        self.dropped += 1
+                        return 1
+                else:
+                    if overload_policy == MQTT_INGEST_POLICY_COALESCE and coalescible:
+                        queued_item = self.queued_topics.get(item[-3])
+                        if queued_item is not None:
+                            queued_item[:] = item  # Replace the unprocessed message for this topic in place, so it keeps its position in the queue
+                            self.dropped += 1
+                            return 1
+                    self._get()  # Drop the oldest message to make room
+                    self.unfinished_tasks -= 1
+                    self.dropped += 1
+                    self._put(item)
+                    self.unfinished_tasks += 1
+                    self.not_empty.notify()
+                    return 1
+
+            self._put(item)
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+            return 0
+
+    def resize(self, maxsize):
+        with self.mutex:
+            self.maxsize = maxsize
+            self.not_full.notify_all()
+
+    def close(self):
+        # Called when the handler thread stops, releasing any MQTT Broker thread blocked on the queue
+        with self.mutex:
+            self.closed = True
+            self.not_full.notify_all()
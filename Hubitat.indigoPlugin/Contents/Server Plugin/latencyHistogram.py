@@ -0,0 +1,76 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Hubitat - Latency Histogram © Autolog 2022 - 2023
+#
+
+import bisect
+import math
+import threading
+
+from constants import *
+
+
+def new_latency_histograms():
+    # One histogram per ingest stage for a path (a Hubitat Hub, Tasmota or Indigo Export)
+    return {latency_stage: LatencyHistogram() for latency_stage in LATENCY_STAGES}
+
+
+def record_ingest_latency(histograms, received, enqueued, dequeued, dispatched, written=None):
+    # Record the handler thread stages of a message, timed with time.monotonic() - the decode stage is recorded by the MQTT Broker thread
+    histograms[LATENCY_STAGE_QUEUE_WAIT].record(dequeued - enqueued)
+    histograms[LATENCY_STAGE_DISPATCH].record(dispatched - dequeued)
+    if written is None:
+        written = dispatched
+    else:
+        histograms[LATENCY_STAGE_WRITES].record(written - dispatched)
+    histograms[LATENCY_STAGE_TOTAL].record(written - received)
+
+
+def latency_percentile_states(histogram, state_prefix="latencyP"):
+    # The p50, p95 and p99 latencies (milliseconds) as device state updates e.g. 'latencyP95', omitting any not yet recorded
+    states = list()
+    for percent in (50, 95, 99):
+        latency = histogram.percentile(percent)
+        if latency is not None:
+            latency_ms = round(latency * 1000.0, 1)
+            states.append({"key": f"{state_prefix}{percent}", "value": latency_ms, "uiValue": f"{latency_ms} ms"})
+    return states
+
+
+class LatencyHistogram:
+
+    # This class counts latencies into fixed buckets, so recording is cheap and percentiles are accurate to the bucket bound
+    #   A histogram can be recorded to by several threads e.g. the decode stage by each MQTT Broker thread, so updates are made under a lock
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = [0] * (len(LATENCY_BUCKET_BOUNDS) + 1)  # Final bucket counts latencies above the highest bound
+        self.count = 0
+        self.maximum = 0.0
+
+    def record(self, seconds):
+        bucket = bisect.bisect_left(LATENCY_BUCKET_BOUNDS, seconds)
+        with self.lock:
+            self.counts[bucket] += 1
+            self.count += 1
+            if seconds > self.maximum:
+                self.maximum = seconds
+
+    def percentile(self, percent):
+        # Returns the upper bound in seconds of the bucket containing the percentile (capped at the maximum), or None if nothing recorded
+        with self.lock:
+            counts = list(self.counts)  # Snapshot, as the histogram is recorded to by other threads
+            maximum = self.maximum
+        total = sum(counts)
+        if total == 0:
+            return None
+        target = math.ceil(total * percent / 100.0)
+        cumulative = 0
+        for bucket, count in enumerate(counts):
+            cumulative += count
+            if cumulative >= target:
+                if bucket < len(LATENCY_BUCKET_BOUNDS):
+                    return min(LATENCY_BUCKET_BOUNDS[bucket], maximum)  # The bound can't exceed the largest latency recorded
+                break
+        return maximum
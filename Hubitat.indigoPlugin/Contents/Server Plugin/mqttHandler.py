@@ -24,6 +24,7 @@ try:
 except ImportError:
     pass
 
+import random
 import sys
 import threading
 import traceback
@@ -44,6 +45,19 @@ def decode(key, encrypted_password):
     return unencrypted_password
 
 
+def reconnect_delay(failed_connection_attempts):
+    # Exponential backoff from the minimum to the maximum delay, jittered to between half and all of it so that clients don't retry in step
+    delay = min(MQTT_RECONNECT_DELAY_MAXIMUM, MQTT_RECONNECT_DELAY_MINIMUM * (2 ** min(failed_connection_attempts - 1, 16)))
+    return random.uniform(delay / 2.0, delay)
+
+
+def update_export_connected(plugin_globals):
+    # Cache whether any of the Indigo Export's MQTT Brokers is connected, checked by deviceUpdated for every exported device update.
+    # Called as the Indigo Export is started and as each MQTT Broker connects or disconnects.
+    plugin_globals[EXPORT][EXPORT_CONNECTED] = any(plugin_globals[MQTT].get(mqtt_broker_dev_id, dict()).get(MQTT_CONNECTED, False)
+                                                   for mqtt_broker_dev_id in plugin_globals[EXPORT][MQTT_BROKERS])
+
+
 # noinspection PyPep8Naming
 class ThreadMqttHandler(threading.Thread):
 
@@ -64,16 +78,43 @@ class ThreadMqttHandler(threading.Thread):
             self.mqttHandlerLogger.debug(f"Debugging '{indigo.devices[self.mqtt_broker_dev_id]}' MQTT Handler Thread")
 
             self.threadStop = event
+            self.runtime = None  # The AsyncRuntime running this MQTT Broker if the plugin uses the single event loop, otherwise it runs as this thread
 
             self.bad_disconnection = False
 
+            # Connection supervision
+            self.network_connected = False  # A connection to the MQTT Broker is open and being serviced by this thread's network loop
+            self.connection_lost = False  # Set by on_connect / on_disconnect to have the supervisor reconnect
+            self.failed_connection_attempts = 0  # Reset once the MQTT Broker accepts a connection
+            self.connect_started = 0.0
+            self.reconnects = 0
+
             self.publish_to_homie = None
             self.publish_to_tasmota = None
             self.subscribe_to_homie = None
             self.subscribe_to_tasmota = None
 
             self.mqtt_message_sequence = 0
-            
+
+            # Ingest queue statistics: the queues this broker has routed messages to (keyed by hub id or queue constant) and the messages it has dropped
+            self.ingest_queues = dict()
+            self.ingest_dropped = 0
+            self.duplicates_suppressed = 0  # Messages already received through another MQTT Broker
+            self.ingest_states_published = [None, 0.0]  # Last published (depth, high-water mark, drops, duplicates) and when
+
+            # Subscription manager: topic filters currently subscribed, maintained incrementally by update_subscriptions
+            self.subscriptions = set()
+            self.subscriptions_lock = threading.Lock()  # Serialises updates made by this thread and the plugin (as devices start and stop)
+            self.subscription_mode = MQTT_SUBSCRIPTION_MODE_DISCOVERY
+            self.subscription_mode_started = 0.0
+            self.discovering_hubs = frozenset()  # Hubs subscribed to in full whilst operational, as none of their devices are linked
+
+            # Compile the topic routing table once: the root topic of a received message resolves directly to the method that routes it
+            self.topic_routes = dict()
+            self.topic_routes[MQTT_ROOT_TOPIC] = self.route_homie_topic
+            for tasmota_root_topic in (TASMOTA_ROOT_TOPIC_TASMOTA, TASMOTA_ROOT_TOPIC_STAT, TASMOTA_ROOT_TOPIC_TELE):
+                self.topic_routes[tasmota_root_topic] = self.route_tasmota_topic
+
         except Exception as exception_error:
             self.exception_handler(exception_error, True)  # Log error and display failing statement
 
@@ -89,8 +130,52 @@ class ThreadMqttHandler(threading.Thread):
 
     def run(self):
         try:
-            # Initialise routine on thread start
+            self.create_client()
+
+            # Supervise the connection: (re)connect with jittered exponential backoff, otherwise run paho's network loop in this thread
+            #   Running the network loop here (rather than in a second thread started by paho's loop_start) halves the threads per MQTT Broker
+            #   The loop waits at most MQTT_NETWORK_LOOP_TIMEOUT for traffic, so the thread ends promptly when the MQTT Broker device is stopped
+            housekeeping_due = time.monotonic() + MQTT_SUPERVISOR_INTERVAL
+            while not self.threadStop.is_set():
+                if not self.network_connected:
+                    if self.failed_connection_attempts > 0:
+                        delay = reconnect_delay(self.failed_connection_attempts)
+                        self.mqttHandlerLogger.warning(f"Retrying connection to MQTT Broker at {self.globals[MQTT][self.mqtt_broker_dev_id][MQTT_IP]}:{self.globals[MQTT][self.mqtt_broker_dev_id][MQTT_PORT]} in {delay:.1f} seconds")
+                        if self.threadStop.wait(delay):
+                            break
+                    self.connection_lost = False
+                    self.network_connected = self.connect_to_broker(self.failed_connection_attempts == 0)
+                    self.failed_connection_attempts += 1  # Until on_connect confirms the MQTT Broker has accepted the connection
+                    continue
+
+                if self.mqtt_client.loop(timeout=MQTT_NETWORK_LOOP_TIMEOUT) != mqtt.MQTT_ERR_SUCCESS or self.connection_lost:
+                    # Connection lost or refused - reconnect using the backoff above
+                    self.report_connection_lost()
+                    self.network_connected = False
+                    continue
+
+                self.globals[EXPORT][EXPORT_PUBLISHER].drain(self.mqtt_client, self.mqtt_broker_dev_id)  # Publish Indigo Export topics deferred by a full window
+
+                if time.monotonic() >= housekeeping_due:
+                    housekeeping_due = time.monotonic() + MQTT_SUPERVISOR_INTERVAL
+                    self.housekeeping()
+
+            self.mqttHandlerLogger.debug("MQTT Handler Thread close-down commencing.")
+
+            self.handle_quit()
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def is_running(self):
+        # True whilst the MQTT Broker is being serviced: by this thread or, if the plugin uses the single event loop, by the AsyncRuntime
+        if self.runtime is not None:
+            return not self.threadStop.is_set()
+        return self.is_alive()
 
+    def create_client(self):
+        # Create the paho MQTT client for the MQTT Broker: called as the thread (or the AsyncRuntime task) starts
+        try:
             mqtt_broker_dev = indigo.devices[self.mqtt_broker_dev_id]
             mqtt_broker_dev.updateStateOnServer(key="status", value="disconnected")
             mqtt_broker_dev.updateStateImageOnServer(indigo.kStateImageSel.SensorOff)
@@ -106,6 +191,7 @@ class ThreadMqttHandler(threading.Thread):
 
             self.mqtt_client.on_connect = self.on_connect
             self.mqtt_client.on_disconnect = self.on_disconnect
+            self.mqtt_client.on_publish = self.on_publish
             self.mqtt_client.on_subscribe = self.on_subscribe
 
             self.publish_to_homie = bool(mqtt_broker_dev.pluginProps.get("mqtt_publish_to_homie", True))
@@ -120,78 +206,79 @@ class ThreadMqttHandler(threading.Thread):
                 self.globals[MQTT][self.mqtt_broker_dev_id][MQTT_SUBSCRIBED_TOPICS].append(f"{TASMOTA_ROOT_TOPIC_TASMOTA_DISCOVERY}/#")
                 self.globals[MQTT][self.mqtt_broker_dev_id][MQTT_SUBSCRIBED_TOPICS].append(f"{TASMOTA_ROOT_TOPIC_STAT}/#")
                 self.globals[MQTT][self.mqtt_broker_dev_id][MQTT_SUBSCRIBED_TOPICS].append(f"{TASMOTA_ROOT_TOPIC_TELE}/#")
-            if len(self.globals[MQTT][self.mqtt_broker_dev_id][MQTT_SUBSCRIBED_TOPICS]) > 0:
-                for mqtt_subscription in self.globals[MQTT][self.mqtt_broker_dev_id][MQTT_SUBSCRIBED_TOPICS]:
-                    self.mqtt_client.message_callback_add(mqtt_subscription, self.handle_message)
-            mqtt_connected = False
-            try:
-                broker_name = indigo.devices[self.mqtt_broker_dev_id].name
-                # self.mqttHandlerLogger.warning(f"Connect to {broker_name} [1] - User : {self.globals[MQTT][self.mqtt_broker_dev_id][MQTT_USERNAME]}")
-                decoded_password = ""
-                if self.globals[MQTT][self.mqtt_broker_dev_id][MQTT_PASSWORD] != "":
-                    encrypted_password = self.globals[MQTT][self.mqtt_broker_dev_id][MQTT_PASSWORD].encode()
-                    # self.mqttHandlerLogger.warning(f"Connect to {broker_name} [2] - Encrypted Password [{type(encrypted_password)}]: '{encrypted_password}'")
-                    decoded_password = decode(self.globals[MQTT][self.mqtt_broker_dev_id][MQTT_ENCRYPTION_KEY], encrypted_password)
-                    # self.mqttHandlerLogger.warning(f"Connect to {broker_name} [3] - Decoded Password [{type(decoded_password)}]: '{decoded_password}'")
-
-                if decoded_password != "" or self.globals[MQTT][self.mqtt_broker_dev_id][MQTT_USERNAME] != "":
-                    self.mqtt_client.username_pw_set(username=self.globals[MQTT][self.mqtt_broker_dev_id][MQTT_USERNAME],
-                                                     password=decoded_password)
-
-                self.mqtt_client.connect(host=self.globals[MQTT][self.mqtt_broker_dev_id][MQTT_IP],
-                                         port=self.globals[MQTT][self.mqtt_broker_dev_id][MQTT_PORT],
-                                         keepalive=60,
-                                         bind_address="")
-                mqtt_connected = True
-            except Exception as exception_error:
-                # DONE: Make this more user friendly!
-                error_intercepted = False
-                base_error_message = (f"Plugin is unable to connect to the MQTT Broker at "
-                                      f"{self.globals[MQTT][self.mqtt_broker_dev_id][MQTT_IP]}:{self.globals[MQTT][self.mqtt_broker_dev_id][MQTT_PORT]}."
-                                      f" Is it running?")
-                try:
-                    errno = exception_error.errno  # noqa
-                    strerror = exception_error.strerror  # noqa
-                    if errno == 61:
-                        self.mqttHandlerLogger.error(f"{base_error_message} Error: {strerror}.")
-                        error_intercepted = True
-                except:
-                    pass
-                if not error_intercepted:
-                    self.exception_handler(f"{base_error_message} Connection error reported as: {exception_error}", False)  # Log error
-
-            if mqtt_connected:
-                self.globals[MQTT][self.mqtt_broker_dev_id][MQTT_CLIENT] = self.mqtt_client
-
-                self.mqtt_client.loop_start()
-
-                while not self.threadStop.is_set():
-                    try:
-                        time.sleep(2)
-                    except self.threadStop:
-                        pass  # Optionally catch the StopThread exception and do any needed cleanup.
-                        self.mqtt_client.loop_stop()
-                        # self.globals[HE_HUBS][self.hubitat_hub_name][HE_HUB_MQTT_INITIALISED] = False
-            else:
-                pass
-                # TODO: At this point, queue a recovery for n seconds time
-                # TODO: In the meanwhile, just disable and then enable the Indigo Hubitat Elevation Hub device
+            self.mqtt_client.on_message = self.handle_message  # Subscriptions vary by mode, so route every received message
+            decoded_password = ""
+            if self.globals[MQTT][self.mqtt_broker_dev_id][MQTT_PASSWORD] != "":
+                encrypted_password = self.globals[MQTT][self.mqtt_broker_dev_id][MQTT_PASSWORD].encode()
+                decoded_password = decode(self.globals[MQTT][self.mqtt_broker_dev_id][MQTT_ENCRYPTION_KEY], encrypted_password)
 
-            self.mqttHandlerLogger.debug("MQTT Handler Thread close-down commencing.")
+            if decoded_password != "" or self.globals[MQTT][self.mqtt_broker_dev_id][MQTT_USERNAME] != "":
+                self.mqtt_client.username_pw_set(username=self.globals[MQTT][self.mqtt_broker_dev_id][MQTT_USERNAME],
+                                                 password=decoded_password)
 
-            self.handle_quit()
+            self.globals[MQTT][self.mqtt_broker_dev_id][MQTT_CLIENT] = self.mqtt_client
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def report_connection_lost(self):
+        # Report a lost connection that paho didn't e.g. the socket failed before the MQTT Broker acknowledged the connection
+        try:
+            if self.globals[MQTT][self.mqtt_broker_dev_id].get(MQTT_CONNECTED, False):
+                self.on_disconnect(self.mqtt_client, None, mqtt.MQTT_ERR_CONN_LOST)
 
         except Exception as exception_error:
             self.exception_handler(exception_error, True)  # Log error and display failing statement
 
+    def housekeeping(self):
+        # Called every MQTT_SUPERVISOR_INTERVAL whilst connected
+        self.update_ingest_queue_states()
+        self.check_subscription_mode()
+
+    def connect_to_broker(self, log_failure):
+        # Attempt to connect to the MQTT Broker, returning True if the connection was initiated (on_connect follows once the broker accepts it)
+        try:
+            self.connect_started = time.monotonic()
+            self.mqtt_client.connect(host=self.globals[MQTT][self.mqtt_broker_dev_id][MQTT_IP],
+                                     port=self.globals[MQTT][self.mqtt_broker_dev_id][MQTT_PORT],
+                                     keepalive=60,
+                                     bind_address="")
+            return True
+        except Exception as exception_error:
+            if not log_failure:
+                return False  # Already reported when the first attempt failed
+            # DONE: Make this more user friendly!
+            error_intercepted = False
+            base_error_message = (f"Plugin is unable to connect to the MQTT Broker at "
+                                  f"{self.globals[MQTT][self.mqtt_broker_dev_id][MQTT_IP]}:{self.globals[MQTT][self.mqtt_broker_dev_id][MQTT_PORT]}."
+                                  f" Is it running?")
+            try:
+                errno = exception_error.errno  # noqa
+                strerror = exception_error.strerror  # noqa
+                if errno == 61:
+                    self.mqttHandlerLogger.error(f"{base_error_message} Error: {strerror}.")
+                    error_intercepted = True
+            except:
+                pass
+            if not error_intercepted:
+                self.exception_handler(f"{base_error_message} Connection error reported as: {exception_error}", False)  # Log error
+            return False
+
     def on_publish(self, client, userdata, mid):  # noqa [parameter value is not used]
         try:
-            pass
+            self.globals[EXPORT][EXPORT_PUBLISHER].acknowledge(self.mqtt_broker_dev_id, mid)
         except Exception as exception_error:
             self.exception_handler(exception_error, True)  # Log error and display failing statement
 
     def on_connect(self, client, userdata, flags, rc):  # noqa [Unused parameter values]
         try:
+            if rc != 0:
+                # Connection refused by the MQTT Broker (e.g. not authorised) - have the supervisor retry with backoff
+                self.mqttHandlerLogger.error(f"MQTT Broker at {self.globals[MQTT][self.mqtt_broker_dev_id][MQTT_IP]}:{self.globals[MQTT][self.mqtt_broker_dev_id][MQTT_PORT]} refused the connection [Code {rc}]")
+                self.bad_disconnection = True
+                self.connection_lost = True
+                return
+
             # TODO: Loop round the Hub, tasmota and Export devices and set their connected status ???
 
             # for dev in indigo.devices.iter("self"):
@@ -200,23 +287,31 @@ class ThreadMqttHandler(threading.Thread):
             #             dev.updateStateOnServer(key='status', value="Connected")
             #             dev.updateStateImageOnServer(indigo.kStateImageSel.SensorOn)
 
-            for mqtt_subscription in self.globals[MQTT][self.mqtt_broker_dev_id][MQTT_SUBSCRIBED_TOPICS]:
-                self.mqtt_client.subscribe(mqtt_subscription, qos=1)
+            # Clean session: the broker holds no subscriptions for this client, so start again in discovery mode
+            with self.subscriptions_lock:
+                self.subscriptions = set()
+            self.start_discovery()
 
             self.globals[MQTT][self.mqtt_broker_dev_id][MQTT_SUBSCRIBE_TO_HOMIE] = self.subscribe_to_homie
             self.globals[MQTT][self.mqtt_broker_dev_id][MQTT_SUBSCRIBE_TO_TASMOTA] = self.subscribe_to_tasmota
             self.globals[MQTT][self.mqtt_broker_dev_id][MQTT_PUBLISH_TO_HOMIE] = self.publish_to_homie
             self.globals[MQTT][self.mqtt_broker_dev_id][MQTT_PUBLISH_TO_TASMOTA] = self.publish_to_tasmota
             self.globals[MQTT][self.mqtt_broker_dev_id][MQTT_CONNECTED] = True
-            mqtt_broker_dev = indigo.devices[self.mqtt_broker_dev_id]
-            mqtt_broker_dev.updateStateOnServer(key="status", value="connected")
-            mqtt_broker_dev.updateStateImageOnServer(indigo.kStateImageSel.SensorOn)
-
+            update_export_connected(self.globals)
+            self.failed_connection_attempts = 0
             if self.bad_disconnection:  # Check if previous disconnection was bad to set as "reconnected" as opposed to "connected"
                 self.bad_disconnection = False
+                self.reconnects += 1
                 connection_ui = "Reconnected"
             else:
                 connection_ui = "Connected"
+
+            connect_latency_ms = round((time.monotonic() - self.connect_started) * 1000.0, 1)
+            mqtt_broker_dev = indigo.devices[self.mqtt_broker_dev_id]
+            mqtt_broker_dev.updateStatesOnServer([{"key": "status", "value": "connected"},
+                                                  {"key": "connectLatency", "value": connect_latency_ms, "uiValue": f"{connect_latency_ms} ms"},
+                                                  {"key": "reconnects", "value": self.reconnects}])
+            mqtt_broker_dev.updateStateImageOnServer(indigo.kStateImageSel.SensorOn)
             self.mqttHandlerLogger.info(f"{connection_ui} to MQTT Broker at {self.globals[MQTT][self.mqtt_broker_dev_id][MQTT_IP]}:{self.globals[MQTT][self.mqtt_broker_dev_id][MQTT_PORT]}")
 
         except Exception as exception_error:
@@ -225,15 +320,20 @@ class ThreadMqttHandler(threading.Thread):
     def on_disconnect(self, client, userdata, rc):  # noqa [Unused parameter values]
         try:
             self.globals[MQTT][self.mqtt_broker_dev_id][MQTT_CONNECTED] = False
+            update_export_connected(self.globals)
+            self.globals[EXPORT][EXPORT_PUBLISHER].reset(self.mqtt_broker_dev_id)
+            if self.mqtt_broker_dev_id in self.globals[EXPORT][MQTT_BROKERS]:
+                # The MQTT Broker may not hold the export's retained topics when it is back, so the next export is published in full
+                self.globals[EXPORT][EXPORT_PUBLISHED_NODES] = None
             if rc != 0:
                 # TODO - Interpret RC code
                 self.mqttHandlerLogger.warning(
                     f"Plugin encountered an unexpected disconnection from MQTT Broker at {self.globals[MQTT][self.mqtt_broker_dev_id][MQTT_IP]}:{self.globals[MQTT][self.mqtt_broker_dev_id][MQTT_PORT]}. MQTT Broker [Code {rc}]. Retrying connection ...")
 
                 self.bad_disconnection = True
+                self.connection_lost = True  # The supervisor in run reconnects with backoff
             else:
                 self.mqttHandlerLogger.warning(f"Disconnected from MQTT Broker at {self.globals[MQTT][self.mqtt_broker_dev_id][MQTT_IP]}:{self.globals[MQTT][self.mqtt_broker_dev_id][MQTT_PORT]}")
-                self.mqtt_client.loop_stop()
             try:
                 for dev in indigo.devices.iter("self"):
                     if dev.deviceTypeId == "hubitatElevationHub" or dev.deviceTypeId == "indigoExport" or dev.deviceTypeId == "tasmota":
@@ -251,10 +351,94 @@ class ThreadMqttHandler(threading.Thread):
         except Exception as exception_error:
             self.exception_handler(exception_error, True)  # Log error and display failing statement
 
+    def start_discovery(self):
+        # Subscribe to everything, to receive the retained topics of all devices, until the discovery period ends
+        try:
+            with self.subscriptions_lock:
+                self.subscription_mode = MQTT_SUBSCRIPTION_MODE_DISCOVERY
+                self.subscription_mode_started = time.monotonic()
+            self.update_subscriptions()
+            indigo.devices[self.mqtt_broker_dev_id].updateStateOnServer(key="subscriptionMode", value="discovery")
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def check_subscription_mode(self):
+        try:
+            if self.subscription_mode != MQTT_SUBSCRIPTION_MODE_DISCOVERY or not self.globals[MQTT][self.mqtt_broker_dev_id].get(MQTT_CONNECTED, False):
+                return
+            if (time.monotonic() - self.subscription_mode_started) < MQTT_DISCOVERY_PERIOD:
+                return
+
+            with self.subscriptions_lock:
+                self.subscription_mode = MQTT_SUBSCRIPTION_MODE_OPERATIONAL
+            self.update_subscriptions()
+            indigo.devices[self.mqtt_broker_dev_id].updateStateOnServer(key="subscriptionMode", value="operational")
+            self.mqttHandlerLogger.debug(f"MQTT subscriptions narrowed to linked devices: {', '.join(sorted(self.subscriptions))}")
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def required_subscriptions(self):
+        # Returns the topic filters required in the current mode and the hubs still being discovered in operational mode
+        if self.subscription_mode == MQTT_SUBSCRIPTION_MODE_DISCOVERY:
+            return set(self.globals[MQTT][self.mqtt_broker_dev_id][MQTT_SUBSCRIBED_TOPICS]), frozenset()
+
+        subscriptions = set()
+        discovering_hubs = set()
+        if self.subscribe_to_homie:
+            for hubitat_hub_name, hub in list(self.globals[HE_HUBS].items()):
+                if HE_HUB_THREAD not in hub or self.mqtt_broker_dev_id not in hub.get(MQTT_BROKERS, list()):
+                    continue  # Hub is stopped or uses other MQTT Brokers
+                linked_device_names = [hubitat_device_name for hubitat_device_name, hubitat_device in list(hub.get(HE_DEVICES, dict()).items())
+                                       if len(hubitat_device.get(HE_LINKED_INDIGO_DEVICES, dict())) > 0]
+                if len(linked_device_names) == 0:
+                    subscriptions.add(f"{MQTT_ROOT_TOPIC}/{hubitat_hub_name}/#")
+                    discovering_hubs.add(hubitat_hub_name)
+                    continue
+                subscriptions.add(f"{MQTT_ROOT_TOPIC}/{hubitat_hub_name}/$heartbeat")
+                subscriptions.add(f"{MQTT_ROOT_TOPIC}/{hubitat_hub_name}/hub/#")
+                for hubitat_device_name in linked_device_names:
+                    subscriptions.add(f"{MQTT_ROOT_TOPIC}/{hubitat_hub_name}/{hubitat_device_name}/#")
+
+            export_root_topic_id = self.globals[EXPORT].get(EXPORT_ROOT_TOPIC_ID, "")
+            if export_root_topic_id != "" and self.mqtt_broker_dev_id in self.globals[EXPORT].get(MQTT_BROKERS, list()):
+                subscriptions.add(f"{MQTT_ROOT_TOPIC}/{export_root_topic_id}/+/+/set")
+
+        if self.subscribe_to_tasmota:
+            subscriptions.add(f"{TASMOTA_ROOT_TOPIC_TASMOTA_DISCOVERY}/#")  # One small retained message per outlet, kept so new outlets can still be found
+            tasmota_keys = [tasmota_key for tasmota_key, mqtt_broker_dev_id in list(self.globals[TASMOTA][MQTT_BROKERS].items()) if mqtt_broker_dev_id == self.mqtt_broker_dev_id]
+            if len(tasmota_keys) == 0:
+                subscriptions.add(f"{TASMOTA_ROOT_TOPIC_STAT}/#")
+                subscriptions.add(f"{TASMOTA_ROOT_TOPIC_TELE}/#")
+            for tasmota_key in tasmota_keys:
+                subscriptions.add(f"{TASMOTA_ROOT_TOPIC_STAT}/tasmota_{tasmota_key}/#")
+                subscriptions.add(f"{TASMOTA_ROOT_TOPIC_TELE}/tasmota_{tasmota_key}/#")
+
+        return subscriptions, frozenset(discovering_hubs)
+
+    def update_subscriptions(self):
+        # Subscribe to the required topic filters not yet subscribed and then unsubscribe from those no longer required
+        #   Called by the plugin as devices start and stop, so that it takes effect before any command is published to a newly started device
+        try:
+            with self.subscriptions_lock:
+                if self.mqtt_client is None or not self.mqtt_client.is_connected():
+                    return
+                required_subscriptions, self.discovering_hubs = self.required_subscriptions()
+                new_subscriptions = required_subscriptions - self.subscriptions
+                old_subscriptions = self.subscriptions - required_subscriptions
+                if len(new_subscriptions) > 0:
+                    self.mqtt_client.subscribe([(mqtt_subscription, 1) for mqtt_subscription in sorted(new_subscriptions)])
+                if len(old_subscriptions) > 0:
+                    self.mqtt_client.unsubscribe(sorted(old_subscriptions))
+                self.subscriptions = required_subscriptions
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
     def handle_quit(self):
         try:
             self.mqtt_client.disconnect()
-            self.mqtt_client.loop_stop()
             self.mqttHandlerLogger.warning(f"Disconnected from MQTT Broker at {self.globals[MQTT][self.mqtt_broker_dev_id][MQTT_IP]}:{self.globals[MQTT][self.mqtt_broker_dev_id][MQTT_PORT]}")
         except Exception as exception_error:
             self.exception_handler(exception_error, True)  # Log error and display failing statement
@@ -267,38 +451,127 @@ class ThreadMqttHandler(threading.Thread):
 
     def handle_message(self, client, userdata, msg):  # noqa [Unused parameter values: client, userdata]
         try:
+            received = time.monotonic()
             self.mqtt_message_sequence += 1
 
             topic_list = msg.topic.split("/")  # noqa [Duplicated code fragment!]
-            payload = msg.payload.decode('utf-8')
 
             if len(topic_list) < 3:
                 return
 
-            if topic_list[0] == "homie":
-                hub_name = topic_list[1]
-                if hub_name in self.globals[HE_HUBS]:
-                    hub_id = self.globals[HE_HUBS][hub_name][HE_INDIGO_HUB_ID]
-                    if hub_id is None or hub_id == 0:
-                        return
-                    hub_dev = indigo.devices[hub_id]
-                    if hub_dev.states["status"] == "disconnected":
-                        hub_dev.updateStateOnServer(key=u'status', value="connected")
-                        hub_dev.updateStateImageOnServer(indigo.kStateImageSel.SensorOn)
-
-                    self.globals[QUEUES][MQTT_HUB_QUEUE].put([self.mqtt_message_sequence, MQTT_PROCESS_COMMAND_HANDLE_TOPICS, hub_id, msg.topic, topic_list, payload])
+            # Retained messages sent when narrowing the subscriptions repeat the discovery snapshot, so only a hub still being discovered needs them
+            if msg.retain and self.subscription_mode == MQTT_SUBSCRIPTION_MODE_OPERATIONAL and topic_list[0] == MQTT_ROOT_TOPIC and topic_list[1] not in self.discovering_hubs:
+                return
+
+            route = self.topic_routes.get(topic_list[0], None)
+            if route is None:
+                return
+
+            if self.globals[MQTT_DUPLICATE_FILTER].is_duplicate(msg.topic, msg.payload, self.mqtt_broker_dev_id, received):
+                self.duplicates_suppressed += 1
+                return
+
+            route(msg.topic, topic_list, msg.payload.decode('utf-8'), received, msg.retain)
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def route_homie_topic(self, topic, topic_list, payload, received, retained):
+        try:
+            hub = self.globals[HE_HUBS].get(topic_list[1], None)
+            if hub is not None:
+                hub_id = hub[HE_INDIGO_HUB_ID]
+                if hub_id is None or hub_id == 0:
+                    return
+                if self.runtime is None:
+                    self.update_hub_connected(hub_id)
                 else:
-                    if EXPORT_ROOT_TOPIC_ID in self.globals[EXPORT]:
-                        if not self.globals[EXPORT][EXPORT_ROOT_TOPIC_ID] is None:
-                            if self.globals[EXPORT][EXPORT_ROOT_TOPIC_ID] == topic_list[1]:
-                                self.globals[QUEUES][MQTT_EXPORT_QUEUE].put([self.mqtt_message_sequence, MQTT_PROCESS_COMMAND_HANDLE_TOPICS, msg.topic, topic_list, payload])
+                    self.runtime.submit(hub_id, self.update_hub_connected, hub_id)  # Keep Indigo server calls off the event loop
+
+                # Route to the queue dedicated to this hub (only present whilst the hub's handler thread is running)
+                hub_queue = self.globals[QUEUES][MQTT_HUB_QUEUE].get(hub_id, None)
+                if hub_queue is None:
                     return
+                self.ingest_queues[hub_id] = hub_queue
+                coalescible = len(topic_list) < 4 or topic_list[3] not in HE_COALESCE_EXEMPT_PROPERTIES
+                process_command = MQTT_PROCESS_COMMAND_HANDLE_RETAINED_TOPICS if retained else MQTT_PROCESS_COMMAND_HANDLE_TOPICS
+                enqueued = self.record_decode_latency(hub_id, received)
+                self.ingest_dropped += hub_queue.put_message([self.mqtt_message_sequence, received, enqueued, process_command, hub_id, topic, topic_list, payload],
+                                                             self.globals[MQTT_INGEST_OVERLOAD_POLICY], self.threadStop, coalescible)
+                if self.runtime is not None:
+                    self.runtime.queued(hub_id)
+
+            elif self.globals[EXPORT].get(EXPORT_ROOT_TOPIC_ID, None) == topic_list[1]:
+                if retained and topic_list[-1] != "set":
+                    # The Indigo Export's own topics retained by the broker: used to skip publishing unchanged payloads, there is nothing to process
+                    self.globals[EXPORT][EXPORT_PUBLISHER].seed(self.mqtt_broker_dev_id, topic, payload)
+                    return
+                export_queue = self.globals[QUEUES][MQTT_EXPORT_QUEUE]
+                self.ingest_queues[MQTT_EXPORT_QUEUE] = export_queue
+                enqueued = self.record_decode_latency(MQTT_EXPORT_QUEUE, received)
+                self.ingest_dropped += export_queue.put_message([self.mqtt_message_sequence, received, enqueued, MQTT_PROCESS_COMMAND_HANDLE_TOPICS, topic, topic_list, payload],
+                                                                self.globals[MQTT_INGEST_OVERLOAD_POLICY], self.threadStop)
+                if self.runtime is not None:
+                    self.runtime.queued(MQTT_EXPORT_QUEUE)
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def update_hub_connected(self, hub_id):
+        try:
+            hub_dev = indigo.devices[hub_id]
+            if hub_dev.states["status"] == "disconnected":
+                hub_dev.updateStateOnServer(key=u'status', value="connected")
+                hub_dev.updateStateImageOnServer(indigo.kStateImageSel.SensorOn)
 
-            elif topic_list[0] in (TASMOTA_ROOT_TOPIC_TASMOTA, TASMOTA_ROOT_TOPIC_STAT, TASMOTA_ROOT_TOPIC_TELE):
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
 
-                # TODO: Remove this - 18-March-2022. = self.mqttHandlerLogger.error(f"PAYLOAD TYPE: {type(payload)}, PAYLOAD DATA: {payload}")
+    def route_tasmota_topic(self, topic, topic_list, payload, received, retained):  # noqa [parameter value is not used]
+        try:
+            tasmota_queue = self.globals[QUEUES][MQTT_TASMOTA_QUEUE]
+            self.ingest_queues[MQTT_TASMOTA_QUEUE] = tasmota_queue
+            enqueued = self.record_decode_latency(MQTT_TASMOTA_QUEUE, received)
+            self.ingest_dropped += tasmota_queue.put_message([self.mqtt_message_sequence, received, enqueued, MQTT_PROCESS_COMMAND_HANDLE_TOPICS, topic, topic_list, payload],
+                                                             self.globals[MQTT_INGEST_OVERLOAD_POLICY], self.threadStop)
+            if self.runtime is not None:
+                self.runtime.queued(MQTT_TASMOTA_QUEUE)
 
-                self.globals[QUEUES][MQTT_TASMOTA_QUEUE].put([self.mqtt_message_sequence, MQTT_PROCESS_COMMAND_HANDLE_TOPICS, msg.topic, topic_list, payload])
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def record_decode_latency(self, latency_key, received):
+        # Record the time from receiving the message to queueing it, returning the time it is queued
+        enqueued = time.monotonic()
+        histograms = self.globals[LATENCY_HISTOGRAMS].get(latency_key, None)
+        if histograms is not None:
+            histograms[LATENCY_STAGE_DECODE].record(enqueued - received)
+        return enqueued
+
+    def update_ingest_queue_states(self):
+        # Publish the depth and high-water mark of the ingest queues this broker feeds, and the messages it has dropped or suppressed as duplicates, on the MQTT Broker device
+        try:
+            published_states, published_time = self.ingest_states_published
+            now = time.monotonic()
+            if published_states is not None and (now - published_time) < MQTT_INGEST_STATES_UPDATE_INTERVAL:
+                return
+
+            depth = 0
+            high_water_mark = 0
+            for ingest_queue in list(self.ingest_queues.values()):
+                depth += ingest_queue.qsize()
+                high_water_mark = max(high_water_mark, ingest_queue.high_water_mark)
+            ingest_states = (depth, high_water_mark, self.ingest_dropped, self.duplicates_suppressed)
+
+            self.ingest_states_published = [ingest_states, now]
+            if ingest_states == published_states:
+                return
+
+            mqtt_broker_dev = indigo.devices[self.mqtt_broker_dev_id]
+            mqtt_broker_dev.updateStatesOnServer([{"key": "queueDepth", "value": depth},
+                                                  {"key": "queueHighWaterMark", "value": high_water_mark},
+                                                  {"key": "queueDrops", "value": self.ingest_dropped},
+                                                  {"key": "duplicatesSuppressed", "value": self.duplicates_suppressed}])
 
         except Exception as exception_error:
             self.exception_handler(exception_error, True)  # Log error and display failing statement
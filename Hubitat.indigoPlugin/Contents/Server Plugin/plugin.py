@@ -17,11 +17,11 @@ from datetime import datetime
 import logging
 import os
 import platform
-import queue
 import re
 import socket
 import sys
 import threading
+import time
 import traceback
 
 
@@ -39,10 +39,16 @@ except ImportError:
     import_errors.append("paho-mqtt")
 
 from constants import *
+from asyncRuntime import AsyncRuntime
 from hubHandler import ThreadHubHandler
 from tasmotaHandler import ThreadTasmotaHandler
-from mqttHandler import ThreadMqttHandler
+from mqttHandler import ThreadMqttHandler, update_export_connected
 from exportHandler import ThreadExportHandler
+from ingestPlan import IngestPlan
+from ingestQueue import IngestQueue
+from duplicateFilter import DuplicateFilter
+from exportPublisher import ExportPublisher
+from latencyHistogram import new_latency_histograms
 
 # ================================== Header ===================================
 __author__    = "Autolog"
@@ -95,9 +101,10 @@ class Plugin(indigo.PluginBase):
         logging.addLevelName(LOG_LEVEL_TOPIC, "topic")
 
         def topic(self, message, *args, **kws):  # noqa [Shadowing names from outer scope = self]
-            # if self.isEnabledFor(LOG_LEVEL_TOPIC):
-            # Yes, logger takes its '*args' as 'args'.
-            self.log(LOG_LEVEL_TOPIC, message, *args, **kws)
+            # Only effective as the 'Plugin' logger's level tracks the handler levels (see closedPrefsConfigUi)
+            if self.isEnabledFor(LOG_LEVEL_TOPIC):
+                # Yes, logger takes its '*args' as 'args'.
+                self._log(LOG_LEVEL_TOPIC, message, args, **kws)
 
         logging.Logger.topic = topic
 
@@ -107,7 +114,7 @@ class Plugin(indigo.PluginBase):
         self.globals[COLOR_DEBUG] = False
 
         self.globals[LOCK_MQTT] = threading.Lock()  # Used to lock updating of self.globals[MQTT]
-        self.globals[LOCK_HE_LINKED_INDIGO_DEVICES] = threading.Lock()  # Used to lock updating of 'self.globals[HE_HUBS][hubitat_hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES]'
+        self.globals[LOCK_HE_LINKED_INDIGO_DEVICES] = threading.Lock()  # Serialises replacement of 'self.globals[HE_HUBS][hubitat_hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES]' - readers don't lock as it is never updated in place
         self.globals[QUEUES] = dict()
 
         self.globals[LOCALIP] = socket.gethostbyname('localhost')
@@ -121,7 +128,7 @@ class Plugin(indigo.PluginBase):
         self.globals[PLUGIN_INFO][API_VERSION] = indigo.server.apiVersion
         self.globals[PLUGIN_INFO][ADDRESS] = indigo.server.address
 
-        log_format = logging.Formatter("%(asctime)s.%(msecs)03d\t%(levelname)-12s\t%(name)s.%(funcName)-25s %(msg)s", datefmt="%Y-%m-%d %H:%M:%S")
+        log_format = logging.Formatter("%(asctime)s.%(msecs)03d\t%(levelname)-12s\t%(name)s.%(funcName)-25s %(message)s", datefmt="%Y-%m-%d %H:%M:%S")
         self.plugin_file_handler.setFormatter(log_format)
         self.plugin_file_handler.setLevel(LOG_LEVEL_INFO)  # Logging Level for plugin log file
         self.indigo_log_handler.setLevel(LOG_LEVEL_INFO)   # Logging level for Indigo Event Log
@@ -129,15 +136,29 @@ class Plugin(indigo.PluginBase):
         self.logger = logging.getLogger("Plugin.Hubitat")
 
         self.globals[MQTT] = dict()
+        self.globals[MQTT_DUPLICATE_FILTER] = DuplicateFilter()  # Suppresses messages received through more than one MQTT Broker
 
         # Setup stores for Hubitat and Tasmota devices
         self.globals[HE_HUBS] = dict()
-        self.globals[HE_MQTT_FILTERS] = list()
+        self.globals[HE_MQTT_FILTERS] = (MQTT_LOG_FILTER_NONE, frozenset())
+        self.globals[HE_HUB_STATISTICS] = dict()  # Processing statistics for each Hubitat hub handler thread keyed by Indigo hub device id
+        self.globals[LATENCY_HISTOGRAMS] = dict()  # Ingest latency histograms keyed by Indigo hub device id, MQTT_TASMOTA_QUEUE or MQTT_EXPORT_QUEUE
+        self.globals[HE_HUB_LAST_MESSAGE] = dict()  # Most recent (topic, payload) received from each Hubitat hub keyed by Indigo hub device id
+        self.globals[HE_INGEST_PLANS] = dict()  # Compiled plugin properties (IngestPlan) of Hubitat devices keyed by Indigo device id - used on every received Hubitat MQTT message
+        self.globals[HE_LAST_WRITTEN_STATES] = dict()  # Last state values and state image written to the Indigo server for Hubitat devices keyed by Indigo device id
+        self.globals[HE_RATE_LIMITS] = dict()  # Last accepted value and time of deadband / minimum interval limited Hubitat properties keyed by Indigo device id
+        self.globals[HE_SECONDARY_DEVICES] = dict()  # Secondary device ids keyed by (Indigo primary device id, secondary device type id) - used to route received Hubitat MQTT messages
 
         self.globals[TASMOTA] = dict()
         self.globals[TASMOTA][TASMOTA_DEVICES] = dict()
         self.globals[TASMOTA][TASMOTA_QUEUE] = dict()
-        self.globals[TASMOTA_MQTT_FILTERS] = list()
+        self.globals[TASMOTA_MQTT_FILTERS] = (MQTT_LOG_FILTER_NONE, frozenset())
+        self.globals[EXPORT_FILTERS] = (MQTT_LOG_FILTER_NONE, frozenset())
+        self.globals[MQTT_INGEST_QUEUE_SIZE] = MQTT_INGEST_QUEUE_SIZE_DEFAULT
+        self.globals[MQTT_INGEST_OVERLOAD_POLICY] = MQTT_INGEST_POLICY_COALESCE
+        self.globals[EXPORT_SET_QUIET_PERIOD] = EXPORT_SET_QUIET_PERIOD_DEFAULT / 1000.0
+        self.globals[MQTT_SINGLE_EVENT_LOOP] = False
+        self.globals[ASYNC_RUNTIME] = None  # Created in startup if MQTT_SINGLE_EVENT_LOOP is set
         self.globals[TASMOTA][MQTT_BROKERS] = dict()
 
         # Set Plugin Config Values
@@ -158,6 +179,14 @@ class Plugin(indigo.PluginBase):
         self.globals[EXPORT][MQTT_BROKERS] = list()
         self.globals[EXPORT][EXPORT_DEVICES] = dict()
         self.globals[EXPORT][EXPORT_ROOT_TOPIC_ID] = ""
+        self.globals[EXPORT][EXPORT_PUBLISHER] = ExportPublisher()
+        self.globals[EXPORT][EXPORT_PUBLISHED_NODES] = None
+        self.globals[EXPORT][EXPORT_NODE_TOPICS] = dict()
+        self.globals[EXPORT][EXPORT_CONNECTED] = False
+        self.globals[EXPORT][EXPORT_INDIGO_DEV_ID] = None
+
+        self.globals[PLUGIN_DEVICE_IDS] = set()
+        self.globals[DEVICE_UPDATED_ROUTES] = frozenset()
 
     def __del__(self):
 
@@ -179,6 +208,37 @@ class Plugin(indigo.PluginBase):
                 startup_message_ui += f"{'Mac OS Version:':<30} {platform.mac_ver()[0]}\n"
                 startup_message_ui += f"{'Plugin Process ID:':<30} {os.getpid()}\n"
                 startup_message_ui += f"{'':={'^'}80}\n"
+                for hub_dev_id, hub_statistics in self.globals[HE_HUB_STATISTICS].items():
+                    if hub_dev_id not in indigo.devices:
+                        continue
+                    messages = hub_statistics[HE_STATISTICS_MESSAGES]
+                    state_updates = hub_statistics[HE_STATISTICS_STATE_UPDATES]
+                    server_round_trips = hub_statistics[HE_STATISTICS_SERVER_ROUND_TRIPS]
+                    state_updates_suppressed = hub_statistics[HE_STATISTICS_STATE_UPDATES_SUPPRESSED]
+                    startup_message_ui += f"{'Hubitat Hub:':<30} {indigo.devices[hub_dev_id].name}\n"
+                    startup_message_ui += f"{'  MQTT Messages Processed:':<30} {messages}\n"
+                    startup_message_ui += f"{'  State Updates Requested:':<30} {state_updates}\n"
+                    startup_message_ui += f"{'  Unchanged Updates Skipped:':<30} {state_updates_suppressed}\n"
+                    startup_message_ui += f"{'  Retained Messages Ingested:':<30} {hub_statistics[HE_STATISTICS_RETAINED_MESSAGES]}\n"
+                    startup_message_ui += f"{'  Server Round Trips:':<30} {server_round_trips}\n"
+                    hub_queue = self.globals[QUEUES].get(MQTT_HUB_QUEUE, dict()).get(hub_dev_id, None)
+                    if hub_queue is not None and hub_queue.coalescing:
+                        startup_message_ui += f"{'  Queued Updates Coalesced:':<30} {hub_queue.coalesced}\n"
+                    if messages > 0:
+                        startup_message_ui += f"{'  Round Trips Per Message:':<30} {server_round_trips / messages:.2f} [{state_updates / messages:.2f} if unbatched]\n"
+                    last_topic, last_payload = self.globals[HE_HUB_LAST_MESSAGE].get(hub_dev_id, (None, None))
+                    if last_topic is not None:
+                        startup_message_ui += f"{'  Last Topic:':<30} {last_topic}\n"
+                        startup_message_ui += f"{'  Last Payload:':<30} {last_payload}\n"
+                if len(self.globals[HE_HUB_STATISTICS]) > 0:
+                    startup_message_ui += f"{'':={'^'}80}\n"
+                export_thread = self.globals[EXPORT].get(EXPORT_THREAD, None)
+                if export_thread is not None and export_thread.set_commands_received > 0:
+                    startup_message_ui += f"{'Indigo Export:':<30}\n"
+                    startup_message_ui += f"{'  /set Commands Received:':<30} {export_thread.set_commands_received}\n"
+                    startup_message_ui += f"{'  /set Commands Coalesced:':<30} {export_thread.set_commands_coalesced}\n"
+                    startup_message_ui += f"{'  /set Commands Dropped:':<30} {export_thread.set_commands_dropped}\n"
+                    startup_message_ui += f"{'':={'^'}80}\n"
                 return startup_message_ui
 
             self.logger.info(plugin_information_message())
@@ -186,6 +246,79 @@ class Plugin(indigo.PluginBase):
         except Exception as exception_error:
             self.exception_handler(exception_error, True)  # Log error and display failing statement
 
+    def display_latency_report(self):
+        try:
+            def latency_report_message():
+                report_message_ui = "\n"  # Start with a line break
+                report_message_ui += f"{' Ingest Latency Report ':={'^'}80}\n"
+                report_message_ui += f"{'Path / Stage':<30} {'Count':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'Max':>9}   [milliseconds]\n"
+                for latency_key, histograms in self.globals[LATENCY_HISTOGRAMS].items():
+                    if latency_key == MQTT_TASMOTA_QUEUE:
+                        path_name = "Tasmota"
+                    elif latency_key == MQTT_EXPORT_QUEUE:
+                        path_name = "Indigo Export"
+                    elif latency_key in indigo.devices:
+                        path_name = f"Hubitat Hub: {indigo.devices[latency_key].name}"
+                    else:
+                        continue
+                    report_message_ui += f"{'':-{'^'}80}\n"
+                    report_message_ui += f"{path_name}\n"
+                    for latency_stage in LATENCY_STAGES:
+                        histogram = histograms[latency_stage]
+                        if histogram.count == 0:
+                            continue
+                        percentiles_ui = "".join(f" {histogram.percentile(percent) * 1000.0:>9.2f}" for percent in (50, 95, 99))
+                        report_message_ui += f"{'  ' + LATENCY_STAGE_NAMES[latency_stage]:<30} {histogram.count:>9}{percentiles_ui} {histogram.maximum * 1000.0:>9.2f}\n"
+                export_publisher = self.globals[EXPORT][EXPORT_PUBLISHER]
+                if export_publisher.requested > 0:
+                    report_message_ui += f"{'':-{'^'}80}\n"
+                    report_message_ui += "Indigo Export Publishing\n"
+                    throughput = export_publisher.throughput()
+                    throughput_ui = "n/a" if throughput is None else f"{throughput:.1f} per second"
+                    report_message_ui += f"{'  Published / Acknowledged:':<30} {export_publisher.published} / {export_publisher.acknowledged}\n"
+                    report_message_ui += f"{'  Failed / Deferred:':<30} {export_publisher.failed} / {export_publisher.deferrals}\n"
+                    report_message_ui += f"{'  Throughput:':<30} {throughput_ui}\n"
+                    skip_ratio = export_publisher.skip_ratio()
+                    skip_ratio_ui = "n/a" if skip_ratio is None else f"{skip_ratio * 100.0:.1f}%"
+                    report_message_ui += f"{'  Skipped as Unchanged:':<30} {export_publisher.skipped} ({skip_ratio_ui})\n"
+                    ack_latency = export_publisher.ack_latency
+                    if ack_latency.count > 0:
+                        percentiles_ui = "".join(f" {ack_latency.percentile(percent) * 1000.0:>9.2f}" for percent in (50, 95, 99))
+                        report_message_ui += f"{'  Acknowledgement':<30} {ack_latency.count:>9}{percentiles_ui} {ack_latency.maximum * 1000.0:>9.2f}\n"
+                report_message_ui += f"{'':={'^'}80}\n"
+                report_message_ui += "Percentiles are the upper bound of the histogram bucket containing them\n"
+                report_message_ui += "End to End percentiles are also states of the Hubitat Elevation Hub, Indigo Export and (Tasmota) MQTT Broker devices\n"
+                return report_message_ui
+
+            self.logger.info(latency_report_message())
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def benchmark_device_updated(self):
+        try:
+            # Replay a burst of updates of devices that this plugin doesn't process, as received from subscribeToChanges
+            unrelated_devices = [dev for dev in indigo.devices if dev.id not in self.globals[DEVICE_UPDATED_ROUTES]]
+            if len(unrelated_devices) == 0:
+                self.logger.warning("Benchmark cancelled: there are no Indigo devices unrelated to this plugin to replay updates of")
+                return
+
+            updates = [unrelated_devices[index % len(unrelated_devices)] for index in range(DEVICE_UPDATED_BENCHMARK_UPDATES)]
+            started = time.perf_counter()
+            for dev in updates:
+                self.deviceUpdated(dev, dev)
+            elapsed = time.perf_counter() - started
+
+            self.logger.info(f"Benchmark: {DEVICE_UPDATED_BENCHMARK_UPDATES} unrelated device updates processed in {elapsed * 1000.0:.1f} ms"
+                             f" ({elapsed * 1000000.0 / DEVICE_UPDATED_BENCHMARK_UPDATES:.2f} µs per update)")
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def update_device_updated_routes(self):
+        # Rebuild the device ids processed by deviceUpdated, called as this plugin's devices are created and deleted and as the export changes
+        self.globals[DEVICE_UPDATED_ROUTES] = frozenset(self.globals[PLUGIN_DEVICE_IDS]) | frozenset(self.globals[EXPORT][ENABLED].keys())
+
     def exception_handler(self, exception_error_message, log_failing_statement):
         filename, line_number, method, statement = traceback.extract_tb(sys.exc_info()[2])[-1]
         module = filename.split('/')
@@ -704,6 +837,12 @@ class Plugin(indigo.PluginBase):
             if user_cancelled:
                 self.logger.threaddebug(f"'closedDeviceConfigUi' called with userCancelled = {str(user_cancelled)}")
                 return
+
+            # A started device's ingest plan is replaced (in a single assignment) from the saved properties. Changing a device's properties also
+            #   restarts it, when deviceStartComm builds the plan again, so deviceUpdated never has to compare properties.
+            if int(dev_id) in self.globals[HE_INGEST_PLANS]:
+                self.globals[HE_INGEST_PLANS][int(dev_id)] = IngestPlan(values_dict)
+
             if type_id == "mqttBroker":
                 self.closedDeviceConfigUiMqttBroker(values_dict, user_cancelled, type_id, dev_id)
 
@@ -788,6 +927,7 @@ class Plugin(indigo.PluginBase):
 
             for key, value in self.globals[EXPORT][SELECTED].items():  # Copy Selected devices to Enabled
                 self.globals[EXPORT][ENABLED][key] = value
+            self.update_device_updated_routes()
 
             # export_dev = indigo.devices[export_dev_id]
             for key, value in self.globals[EXPORT][ENABLED].items():
@@ -822,6 +962,7 @@ class Plugin(indigo.PluginBase):
             event_log_level = int(values_dict.get("eventLogLevel", LOG_LEVEL_INFO))
 
             # Ensure following logging level messages are output
+            logging.getLogger("Plugin").setLevel(LOG_LEVEL_INFO)
             self.indigo_log_handler.setLevel(LOG_LEVEL_INFO)
             self.plugin_file_handler.setLevel(LOG_LEVEL_INFO)
 
@@ -833,8 +974,15 @@ class Plugin(indigo.PluginBase):
             self.indigo_log_handler.setLevel(event_log_level)
             self.plugin_file_handler.setLevel(plugin_log_level)
 
+            # Set Indigo's 'Plugin' logger, which the handlers are attached to, to the lowest handler level. The 'Plugin.xxx' loggers (Hubitat,
+            #   HE_HUB, TASMOTA, MQTT etc.) have no level of their own, so they take this level and their isEnabledFor() guards skip building
+            #   messages that neither handler would output - NOTSET would defer to the root logger, so use the lowest real level
+            logging.getLogger("Plugin").setLevel(max(min(event_log_level, plugin_log_level), 1))
+
             # Set Hubitat MQTT Message Filter
-            self.globals[HE_MQTT_FILTERS] = list()  # Initialise Hubitat MQTT filter dictionary
+            # Each filter is compiled into an immutable (mode, frozenset) and replaced as a whole, which invalidates the handlers' cached decisions
+            log_filter_mode = MQTT_LOG_FILTER_SELECTED
+            log_filter_keys = set()
             mqtt_hubitat_message_filter = values_dict.get("mqttHubitatDeviceMessageFilter", ["-0-|||-- Don't Log Any Devices --"])
             log_message = "MQTT Topic Filtering active for the following Hubitat device(s):"  # Not used if no logging required
             filtering_required = False
@@ -842,30 +990,34 @@ class Plugin(indigo.PluginBase):
             spaces = " " * 35  # used to pad log messages
 
             if len(mqtt_hubitat_message_filter) == 0:
-                self.globals[HE_MQTT_FILTERS] = ["-0-"]
+                log_filter_mode = MQTT_LOG_FILTER_NONE
             else:
                 for entry in mqtt_hubitat_message_filter:
                     hubitat_hub_name, hubitat_device_name = entry.split("|||")
                     if hubitat_hub_name == "-0-":  # Ignore '-- Don't Log Any Devices --'
-                        self.globals[HE_MQTT_FILTERS] = ["-0-"]
+                        log_filter_mode = MQTT_LOG_FILTER_NONE
                         break
                     elif hubitat_hub_name == "-1-":  # Ignore '-- Log All Devices --'
-                        self.globals[HE_MQTT_FILTERS] = ["-1-"]
+                        log_filter_mode = MQTT_LOG_FILTER_ALL
                         log_message = f"{log_message}\n{spaces}All Hubitat Devices"
                         filtering_required = True
                         break
                     else:
                         hubitat_hub_and_device_name_ui = f"{hubitat_hub_name} | {hubitat_device_name}"
-                        self.globals[HE_MQTT_FILTERS].append(f"{hubitat_hub_name.lower()}|{hubitat_device_name.lower()}")
+                        log_filter_keys.add(f"{hubitat_hub_name.lower()}|{hubitat_device_name.lower()}")
                         spaces = " " * 24
                         log_message = f"{log_message}\n{spaces}Hubitat Device: '{hubitat_hub_and_device_name_ui}'"
                         filtering_required = True
+            if log_filter_mode != MQTT_LOG_FILTER_SELECTED:
+                log_filter_keys = set()
+            self.globals[HE_MQTT_FILTERS] = (log_filter_mode, frozenset(log_filter_keys))
 
             if filtering_required:
                 self.logger.warning(f"{log_message}\n")
 
             # Set Export MQTT Message Filter
-            self.globals[EXPORT_FILTERS] = list()  # Initialise Export MQTT filter dictionary
+            log_filter_mode = MQTT_LOG_FILTER_SELECTED
+            log_filter_keys = set()
             mqtt_export_message_filter = values_dict.get("mqttExportDeviceMessageFilter", [0])
             log_message = "MQTT Topic Filtering active for the following Exported Indigo device(s):"  # Not used if no logging required
             filtering_required = False
@@ -873,56 +1025,79 @@ class Plugin(indigo.PluginBase):
             spaces = " " * 35  # used to pad log messages
 
             if len(mqtt_export_message_filter) == 0:
-                self.globals[EXPORT_FILTERS] = ["dev-none"]
+                log_filter_mode = MQTT_LOG_FILTER_NONE
             else:
                 for entry_dev_id in mqtt_export_message_filter:
                     entry_dev_id = int(entry_dev_id)
                     if entry_dev_id == 0:  # Ignore '-- Don't Log Any Devices --'
-                        self.globals[EXPORT_FILTERS] = ["dev-none"]
+                        log_filter_mode = MQTT_LOG_FILTER_NONE
                         break
                     elif entry_dev_id == 1:  # Ignore '-- Log All Devices --'
-                        self.globals[EXPORT_FILTERS] = ["dev-all"]
+                        log_filter_mode = MQTT_LOG_FILTER_ALL
                         log_message = f"{log_message}\n{spaces}All Exported Indigo Devices"
                         filtering_required = True
                         break
                     else:
                         pass
                         export_device_name_ui = f"{indigo.devices[int(entry_dev_id)].name}"
-                        self.globals[EXPORT_FILTERS].append(f"dev-{entry_dev_id}")
+                        log_filter_keys.add(f"dev-{entry_dev_id}")
                         spaces = " " * 24
                         log_message = f"{log_message}\n{spaces}Exported Indigo Device: '{export_device_name_ui}'"
                         filtering_required = True
+            if log_filter_mode != MQTT_LOG_FILTER_SELECTED:
+                log_filter_keys = set()
+            self.globals[EXPORT_FILTERS] = (log_filter_mode, frozenset(log_filter_keys))
 
             if filtering_required:
                 self.logger.warning(f"{log_message}\n")
 
             # Set Tasmota MQTT Message Filter
-            self.globals[TASMOTA_MQTT_FILTERS] = list()  # Initialise Tasmota MQTT filter dictionary
+            log_filter_mode = MQTT_LOG_FILTER_SELECTED
+            log_filter_keys = set()
             mqtt_tasmota_message_filter = values_dict.get("mqttTasmotaMessageFilter", ["-0-|||-- Don't Log Any Devices --"])
             log_message = "MQTT Topic Filtering active for the following Tasmota device(s):"  # Not used if no logging required
             filtering_required = False
 
             if len(mqtt_tasmota_message_filter) == 0:
-                self.globals[TASMOTA_MQTT_FILTERS] = ["-0-"]
+                log_filter_mode = MQTT_LOG_FILTER_NONE
             else:
                 for entry in mqtt_tasmota_message_filter:
                     entry_key, entry_name = entry.split("|||")
                     if entry_key == "-0-":  # Ignore '-- Don't Log Any Devices --'
-                        self.globals[TASMOTA_MQTT_FILTERS] = ["-0-"]
+                        log_filter_mode = MQTT_LOG_FILTER_NONE
                         break
                     elif entry_key == "-1-":  # Ignore '-- Log All Devices --'
-                        self.globals[TASMOTA_MQTT_FILTERS] = ["-1-"]
+                        log_filter_mode = MQTT_LOG_FILTER_ALL
                         log_message = f"{log_message}\n{spaces}All Tasmota Devices"
                         filtering_required = True
                         break
                     else:
-                        self.globals[TASMOTA_MQTT_FILTERS].append(entry_key)
+                        log_filter_keys.add(entry_key)
                         log_message = f"{log_message}\n{spaces}Tasmota Device: '{entry_name}'"
                         filtering_required = True
+            if log_filter_mode != MQTT_LOG_FILTER_SELECTED:
+                log_filter_keys = set()
+            self.globals[TASMOTA_MQTT_FILTERS] = (log_filter_mode, frozenset(log_filter_keys))
 
             if filtering_required:
                 self.logger.warning(f"{log_message}\n")
 
+            # Set MQTT ingest queue bound and overload policy - existing queues are resized in place
+            self.globals[MQTT_INGEST_QUEUE_SIZE] = int(values_dict.get("ingestQueueSize", MQTT_INGEST_QUEUE_SIZE_DEFAULT))
+            self.globals[MQTT_INGEST_OVERLOAD_POLICY] = MQTT_INGEST_POLICIES.get(values_dict.get("ingestOverloadPolicy", "coalesce"), MQTT_INGEST_POLICY_COALESCE)
+            ingest_queues = list(self.globals[QUEUES].get(MQTT_HUB_QUEUE, dict()).values())
+            for queue_key in (MQTT_TASMOTA_QUEUE, MQTT_EXPORT_QUEUE):
+                if queue_key in self.globals[QUEUES]:
+                    ingest_queues.append(self.globals[QUEUES][queue_key])
+            for ingest_queue in ingest_queues:
+                ingest_queue.resize(self.globals[MQTT_INGEST_QUEUE_SIZE])
+
+            # Set the quiet period of debounced Indigo Export /set commands (dim and color sliders)
+            self.globals[EXPORT_SET_QUIET_PERIOD] = int(values_dict.get("exportSetQuietPeriod", EXPORT_SET_QUIET_PERIOD_DEFAULT)) / 1000.0
+
+            # Run the MQTT Brokers and handlers in a single event loop - only takes effect when the plugin is next started
+            self.globals[MQTT_SINGLE_EVENT_LOOP] = bool(values_dict.get("singleEventLoop", False))
+
         except Exception as exception_error:
             self.exception_handler(exception_error, True)  # Log error and display failing statement
             return True
@@ -984,7 +1159,10 @@ class Plugin(indigo.PluginBase):
 
             self.globals[MQTT][dev_id][MQTT_EVENT] = threading.Event()
             self.globals[MQTT][dev_id][MQTT_THREAD] = ThreadMqttHandler(self.globals, self.globals[MQTT][dev_id][MQTT_EVENT], dev_id)
-            self.globals[MQTT][dev_id][MQTT_THREAD].start()
+            if self.globals[ASYNC_RUNTIME] is None:
+                self.globals[MQTT][dev_id][MQTT_THREAD].start()
+            else:
+                self.globals[ASYNC_RUNTIME].add_mqtt_broker(self.globals[MQTT][dev_id][MQTT_THREAD])
 
             pass
         except Exception as exception_error:
@@ -1011,21 +1189,31 @@ class Plugin(indigo.PluginBase):
             for mqtt_broker in dev.pluginProps.get("mqttBrokers", list()):
                 self.globals[HE_HUBS][hubitat_hub_name][MQTT_BROKERS].append(int(mqtt_broker))
 
+            # Each hub has its own queue and handler thread so that messages for a hub (and therefore its devices) are processed in arrival order
+            self.globals[QUEUES][MQTT_HUB_QUEUE][dev.id] = IngestQueue(self.globals[MQTT_INGEST_QUEUE_SIZE], bool(hub_props.get("coalesceQueuedUpdates", False)))
+
+            self.globals[HE_INGEST_PLANS][dev.id] = IngestPlan(hub_props)
+
             self.globals[HE_HUBS][hubitat_hub_name][HE_HUB_EVENT] = threading.Event()
             self.globals[HE_HUBS][hubitat_hub_name][HE_HUB_THREAD] = ThreadHubHandler(self.globals, dev.id, self.globals[HE_HUBS][hubitat_hub_name][HE_HUB_EVENT])
-            self.globals[HE_HUBS][hubitat_hub_name][HE_HUB_THREAD].start()
+            self.start_handler(dev.id, self.globals[HE_HUBS][hubitat_hub_name][HE_HUB_THREAD], self.globals[QUEUES][MQTT_HUB_QUEUE][dev.id])
+            self.mqtt_subscriptions_changed()
 
             self.process_hsm_secondary_device(dev)
+            self.index_secondary_devices(dev.id)
 
         except Exception as exception_error:
             self.exception_handler(exception_error, True)  # Log error and display failing statement
 
     def deviceStartComm_indigoExport(self, dev):
         try:
+            self.globals[EXPORT][EXPORT_INDIGO_DEV_ID] = dev.id
 
             self.globals[EXPORT][MQTT_BROKERS] = list()
             for mqtt_broker in dev.pluginProps.get("mqttBrokers", list()):
                 self.globals[EXPORT][MQTT_BROKERS].append(int(mqtt_broker))
+            update_export_connected(self.globals)
+            self.mqtt_subscriptions_changed()
 
             dev_props = dev.pluginProps
             initiate_export = dev_props.get("initiateExport", False)
@@ -1044,6 +1232,9 @@ class Plugin(indigo.PluginBase):
         try:
             self.logger.info(f"Publishing Indigo Export devices commencing for '{dev.name}' . . .")
 
+            export_publisher = self.globals[EXPORT][EXPORT_PUBLISHER]
+            requested_before, skipped_before = export_publisher.requested, export_publisher.skipped
+
             plugin_props = dev.pluginProps
 
             indigo_root_topic_id = plugin_props.get("export_root_topic_id", "indigo-1")
@@ -1051,11 +1242,25 @@ class Plugin(indigo.PluginBase):
             if indigo_root_name == "":
                 indigo_root_name = EXPORT_ROOT_TOPIC_DEFAULT_NAME
 
+            # Once published, devices added to or removed from the export are applied incrementally: only the changed nodes and $nodes are published
+            #   without cycling $state through init, so that Hubitat doesn't rediscover every device
+            published_nodes = self.globals[EXPORT][EXPORT_PUBLISHED_NODES]
+            incremental = published_nodes is not None and self.globals[EXPORT][EXPORT_ROOT_TOPIC_ID] == indigo_root_topic_id
+            enabled_nodes = list(self.globals[EXPORT][ENABLED].keys())
+            if incremental:
+                added_nodes = [dev_id for dev_id in enabled_nodes if dev_id not in published_nodes]
+                removed_nodes = [dev_id for dev_id in published_nodes if dev_id not in self.globals[EXPORT][ENABLED]]
+            else:
+                added_nodes = enabled_nodes
+                removed_nodes = list()
+
             self.globals[EXPORT][EXPORT_ROOT_TOPIC_ID] = indigo_root_topic_id  # used in mqttHandler.py to identify export related topics
+            self.mqtt_subscriptions_changed()
 
-            topic = f"homie/{indigo_root_topic_id}/$state"
-            payload = "init"
-            self. publish_export_topic("dev-root", None, topic, payload)
+            if not incremental:
+                topic = f"homie/{indigo_root_topic_id}/$state"
+                payload = "init"
+                self. publish_export_topic("dev-root", None, topic, payload)
 
             topic = f"homie/{indigo_root_topic_id}/$fw/indigo"
             payload = f"{indigo.server.version}"
@@ -1081,42 +1286,72 @@ class Plugin(indigo.PluginBase):
             payload = self.globals[LOCALIP]
             self. publish_export_topic("dev-root", None, topic, payload)
 
-            nodes = ""
-            for key, value in self.globals[EXPORT][ENABLED].items():
-                node_id = f"dev-{key}"
-                if nodes == "":
-                    nodes = nodes + f"{node_id}"
-                else:
-                    nodes = nodes + f",{node_id}"
-
             topic = f"homie/{indigo_root_topic_id}/$nodes"
-            payload = nodes
-            self.publish_export_topic("dev-root", None, topic, payload)
+            payload = ",".join(f"dev-{dev_id}" for dev_id in enabled_nodes)
+            if incremental:
+                # Publish the added nodes before listing them in $nodes, so that Hubitat finds them complete
+                for dev_id in added_nodes:
+                    self.process_export_indigo_device(dev_id, indigo_root_topic_id)
+                nodes_published = self.publish_export_topic("dev-root", None, topic, payload)
+                # Clear the removed nodes' retained topics after they are no longer listed in $nodes
+                for dev_id in removed_nodes:
+                    self.clear_export_indigo_device(dev_id)
+            else:
+                nodes_published = self.publish_export_topic("dev-root", None, topic, payload)
+                for dev_id in added_nodes:
+                    self.process_export_indigo_device(dev_id, indigo_root_topic_id)
+
+            if not incremental:
+                topic = f"homie/{indigo_root_topic_id}/$state"
+                payload = "ready"
+                self. publish_export_topic("dev-root", None, topic, payload)
+
+            # Only record the published nodes if an MQTT Broker accepted $nodes, otherwise the next export would wrongly be incremental
+            if nodes_published:
+                self.globals[EXPORT][EXPORT_PUBLISHED_NODES] = set(enabled_nodes)
+            else:
+                self.globals[EXPORT][EXPORT_PUBLISHED_NODES] = None
+                self.logger.warning(f"Indigo Export devices not published: no MQTT Broker of '{dev.name}' is connected")
 
-            for key, value in self.globals[EXPORT][ENABLED].items():
-                export_dev = indigo.devices[key]
-                device_key = f"dev-{export_dev.id}"
+            if incremental:
+                self.logger.info(f"Indigo Export devices: {len(added_nodes)} added, {len(removed_nodes)} removed")
+            requested = export_publisher.requested - requested_before
+            skipped = export_publisher.skipped - skipped_before
+            skipped_ui = f", {skipped} of {requested} topics unchanged ({skipped * 100.0 / requested:.0f}% skipped)" if skipped > 0 else ""
+            self.logger.info(f"Publishing Indigo Export devices complete{skipped_ui}")
 
-                topic = f"homie/{indigo_root_topic_id}/{device_key}"
-                payload = export_dev.name
-                self.publish_export_topic(device_key, export_dev.name, topic, payload)
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
 
-                topic = f"homie/{indigo_root_topic_id}/{device_key}/$name"
-                payload = export_dev.name
-                self.publish_export_topic(device_key, export_dev.name, topic, payload)
+    def process_export_indigo_device(self, dev_id, indigo_root_topic_id):
+        try:
+            export_dev = indigo.devices[dev_id]
+            device_key = f"dev-{export_dev.id}"
 
-                if isinstance(export_dev, indigo.DimmerDevice):
-                    self.process_export_indigo_devices_dimmer(export_dev, indigo_root_topic_id, device_key)
-                elif  isinstance(export_dev, indigo.RelayDevice):
-                    self.process_export_indigo_devices_relay(export_dev, indigo_root_topic_id, device_key)
-                elif  isinstance(export_dev, indigo.SensorDevice):
-                    self.process_export_indigo_devices_sensor(export_dev, indigo_root_topic_id, device_key)
+            topic = f"homie/{indigo_root_topic_id}/{device_key}"
+            payload = export_dev.name
+            self.publish_export_topic(device_key, export_dev.name, topic, payload)
 
-            topic = f"homie/{indigo_root_topic_id}/$state"
-            payload = "ready"
-            self. publish_export_topic("dev-root", None, topic, payload)
+            topic = f"homie/{indigo_root_topic_id}/{device_key}/$name"
+            payload = export_dev.name
+            self.publish_export_topic(device_key, export_dev.name, topic, payload)
+
+            if isinstance(export_dev, indigo.DimmerDevice):
+                self.process_export_indigo_devices_dimmer(export_dev, indigo_root_topic_id, device_key)
+            elif  isinstance(export_dev, indigo.RelayDevice):
+                self.process_export_indigo_devices_relay(export_dev, indigo_root_topic_id, device_key)
+            elif  isinstance(export_dev, indigo.SensorDevice):
+                self.process_export_indigo_devices_sensor(export_dev, indigo_root_topic_id, device_key)
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
 
-            self.logger.info(f"Publishing Indigo Export devices complete")
+    def clear_export_indigo_device(self, dev_id):
+        try:
+            # Publishing an empty retained payload removes the topic from the MQTT Broker
+            device_key = f"dev-{dev_id}"
+            for topic in sorted(self.globals[EXPORT][EXPORT_NODE_TOPICS].pop(device_key, set())):
+                self.publish_export_topic(device_key, None, topic, "")
 
         except Exception as exception_error:
             self.exception_handler(exception_error, True)  # Log error and display failing statement
@@ -1531,6 +1766,8 @@ class Plugin(indigo.PluginBase):
                             if linked_dev_id != dev.id:
                                 linked_dev = indigo.devices[linked_dev_id]
                                 linked_props = linked_dev.pluginProps
+                                if not bool(linked_props.get("member_of_device_group", False)):
+                                    self.globals[HE_SECONDARY_DEVICES][(linked_dev_id, dev.deviceTypeId)] = dev.id  # Linked device is the primary device
                                 hubitat_device_name = linked_props.get("hubitatDevice", "")
                                 if hubitat_device_name != "":
                                     if dev.address != hubitat_device_name:
@@ -1559,6 +1796,7 @@ class Plugin(indigo.PluginBase):
             #     return
 
             self.process_sub_models(dev, hubitat_hub_name)  # Check if Sub-Model(s) required to be created and create as necessary
+            self.index_secondary_devices(dev.id)
 
             dev_props = dev.pluginProps
             if "associatedHubitatDevice" in dev_props and dev_props.get("associatedHubitatDevice", "") != "":
@@ -1568,12 +1806,12 @@ class Plugin(indigo.PluginBase):
 
             if hubitat_device_name not in self.globals[HE_HUBS][hubitat_hub_name][HE_DEVICES]:
                 self.globals[HE_HUBS][hubitat_hub_name][HE_DEVICES][hubitat_device_name] = dict()  # Hubitat device name
-            with self.globals[LOCK_HE_LINKED_INDIGO_DEVICES]:
-                if HE_LINKED_INDIGO_DEVICES not in self.globals[HE_HUBS][hubitat_hub_name][HE_DEVICES][hubitat_device_name]:
-                    self.globals[HE_HUBS][hubitat_hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES] = dict()
-                self.globals[HE_HUBS][hubitat_hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES][dev.id] = dev.id
+            self.link_indigo_device(hubitat_hub_name, hubitat_device_name, dev.id)
             if HE_PROPERTIES not in self.globals[HE_HUBS][hubitat_hub_name][HE_DEVICES][hubitat_device_name]:
                 self.globals[HE_HUBS][hubitat_hub_name][HE_DEVICES][hubitat_device_name][HE_PROPERTIES] = None
+            # Build the device's ingest plan so that received MQTT messages don't need to access the device's plugin properties
+            self.globals[HE_INGEST_PLANS][dev.id] = IngestPlan(dev_props)
+
             if self.globals[HE_HUBS][hubitat_hub_name][HE_DEVICES][hubitat_device_name][HE_PROPERTIES] is None:
                 stored_hubitat_properties = dev_props.get("storedHubitatDeviceProperties", "")
                 if stored_hubitat_properties != "":
@@ -1593,7 +1831,7 @@ class Plugin(indigo.PluginBase):
             if TASMOTA_THREAD not in self.globals[TASMOTA]:
                 self.globals[TASMOTA][TASMOTA_EVENT] = threading.Event()
                 self.globals[TASMOTA][TASMOTA_THREAD] = ThreadTasmotaHandler(self.globals, dev.id, self.globals[TASMOTA][TASMOTA_EVENT])
-                self.globals[TASMOTA][TASMOTA_THREAD].start()
+                self.start_handler(MQTT_TASMOTA_QUEUE, self.globals[TASMOTA][TASMOTA_THREAD], self.globals[QUEUES][MQTT_TASMOTA_QUEUE])
 
             if float(indigo.server.apiVersion) >= 2.5:
                 if dev.subType != indigo.kRelayDeviceSubType.Outlet:
@@ -1657,6 +1895,7 @@ class Plugin(indigo.PluginBase):
             if dev.address not in self.globals[TASMOTA][MQTT_BROKERS]:  # dev.address is the Tasmota Key e.g. 6C39A6
                 self.globals[TASMOTA][MQTT_BROKERS][dev.address] = 0  # Defaulting the Indigo MQTT Broker Device Id to zero
             self.globals[TASMOTA][MQTT_BROKERS][dev.address] = int(dev.pluginProps.get("mqttBroker", 0))  # Pickup the select MQTT Broker Id from props
+            self.mqtt_subscriptions_changed()  # Subscribe to the outlet's topics before requesting its status
             mqtt_connected = False
             if self.globals[TASMOTA][MQTT_BROKERS][dev.address] != 0:
                 mqtt_broker_device_id = self.globals[TASMOTA][MQTT_BROKERS][dev.address]
@@ -1677,12 +1916,20 @@ class Plugin(indigo.PluginBase):
 
     def deviceStopComm(self, dev):
         try:
+            if dev.id in self.globals[HE_INGEST_PLANS]:
+                del self.globals[HE_INGEST_PLANS][dev.id]
+            if dev.id in self.globals[HE_LAST_WRITTEN_STATES]:
+                del self.globals[HE_LAST_WRITTEN_STATES][dev.id]
+            if dev.id in self.globals[HE_RATE_LIMITS]:
+                del self.globals[HE_RATE_LIMITS][dev.id]
+
             if dev.deviceTypeId == "mqttBroker":
                 if MQTT_EVENT in self.globals[MQTT][dev.id]:
                     self.globals[MQTT][dev.id][MQTT_EVENT].set()  # Stop the MQTT Client
                 return
 
             if dev.deviceTypeId == "indigoExport":
+                self.globals[EXPORT][EXPORT_INDIGO_DEV_ID] = None
                 dev.updateStateOnServer(key="onOffState", value=False, uiValue="idle")
                 return
 
@@ -1691,10 +1938,16 @@ class Plugin(indigo.PluginBase):
                 hubitat_hub_name = hub_props["hub_name"]
 
                 self.globals[HE_HUBS][hubitat_hub_name][HE_HUB_EVENT].set()  # Stop the Hub handler Thread
-                self.globals[HE_HUBS][hubitat_hub_name][HE_HUB_THREAD].join(5.0)  # noqa [Expected type 'Iterable[str]', got 'float' instead] - Wait for up t0 5 seconds for it to end
+                self.stop_handler(dev.id, self.globals[HE_HUBS][hubitat_hub_name][HE_HUB_THREAD], 5.0)  # Wait for up t0 5 seconds for it to end
 
                 # Delete thread so that it can be recreated if Hubitat Elevation Hub devices is turned on again
                 del self.globals[HE_HUBS][hubitat_hub_name][HE_HUB_THREAD]
+                self.mqtt_subscriptions_changed()
+
+                # Delete the hub's queue so that MQTT topics are no longer queued for it whilst it is stopped
+                if dev.id in self.globals[QUEUES][MQTT_HUB_QUEUE]:
+                    self.globals[QUEUES][MQTT_HUB_QUEUE][dev.id].close()  # Release any MQTT Broker thread blocked on the full queue
+                    del self.globals[QUEUES][MQTT_HUB_QUEUE][dev.id]
 
                 dev.updateStateOnServer(key='status', value="disconnected")
                 dev.updateStateImageOnServer(indigo.kStateImageSel.SensorOff)
@@ -1702,6 +1955,9 @@ class Plugin(indigo.PluginBase):
                 return
 
             elif dev.deviceTypeId == "tasmotaOutlet":
+                if dev.address in self.globals[TASMOTA][MQTT_BROKERS]:
+                    self.globals[TASMOTA][MQTT_BROKERS][dev.address] = 0  # No longer linked to an MQTT Broker, so its topics are no longer subscribed to
+                    self.mqtt_subscriptions_changed()
                 return
 
             # As Hubitat device is being stopped - delete its id from internal Hubitat Devices table.
@@ -1729,15 +1985,45 @@ class Plugin(indigo.PluginBase):
             dev_props = dev.pluginProps
             hubitat_device_name = dev_props.get("hubitatDevice", "")  # Allows for entry not being present in Sub-Models
             if hubitat_device_name in self.globals[HE_HUBS][hubitat_hub_name][HE_DEVICES]:
-                with self.globals[LOCK_HE_LINKED_INDIGO_DEVICES]:
-                    if HE_LINKED_INDIGO_DEVICES in self.globals[HE_HUBS][hubitat_hub_name][HE_DEVICES][hubitat_device_name]:
-                        if dev.id in self.globals[HE_HUBS][hubitat_hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES]:
-                            del self.globals[HE_HUBS][hubitat_hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES][dev.id]
+                self.unlink_indigo_device(hubitat_hub_name, hubitat_device_name, dev.id)
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def deviceCreated(self, dev):
+        try:
+            super(Plugin, self).deviceCreated(dev)
+
+            if dev.pluginId == "com.autologplugin.indigoplugin.hubitat":
+                self.globals[PLUGIN_DEVICE_IDS].add(dev.id)
+                self.update_device_updated_routes()
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def deviceDeleted(self, dev):
+        try:
+            super(Plugin, self).deviceDeleted(dev)
+
+            if dev.id in self.globals[PLUGIN_DEVICE_IDS]:
+                self.globals[PLUGIN_DEVICE_IDS].discard(dev.id)
+                self.update_device_updated_routes()
+
+            for secondary_device_key in [key for key, value in self.globals[HE_SECONDARY_DEVICES].items() if key[0] == dev.id or value == dev.id]:
+                del self.globals[HE_SECONDARY_DEVICES][secondary_device_key]
 
         except Exception as exception_error:
             self.exception_handler(exception_error, True)  # Log error and display failing statement
 
     def deviceUpdated(self, origDev, newDev):
+        # Called for every device change on the Indigo server (subscribeToChanges), so updates of unrelated devices return after a single set lookup.
+        # The route check comes before the base class call: the base class only acts on this plugin's own devices (restarting them when their
+        #   pluginProps change) and all of those, started or not, are in PLUGIN_DEVICE_IDS and so in DEVICE_UPDATED_ROUTES.
+        if origDev.id not in self.globals[DEVICE_UPDATED_ROUTES]:
+            return
+
+        super(Plugin, self).deviceUpdated(origDev, newDev)
+
         try:
             if origDev.pluginId == "com.autologplugin.indigoplugin.hubitat":
                 if origDev.deviceTypeId == "dimmer":
@@ -1751,12 +2037,7 @@ class Plugin(indigo.PluginBase):
             elif origDev.id in self.globals[EXPORT][ENABLED]:
                 # Indigo Exported Device update checking follows . . .
                 device_type = self.globals[EXPORT][ENABLED][origDev.id][EXPORT_TYPE]
-                mqtt_connected = False
-                for mqtt_broker_device_id in self.globals[EXPORT][MQTT_BROKERS]:
-                    if self.globals[MQTT][mqtt_broker_device_id][MQTT_CONNECTED]:
-                        mqtt_connected = True
-                        break
-                if mqtt_connected:
+                if self.globals[EXPORT][EXPORT_CONNECTED]:
                     if device_type == HE_EXPORT_DEVICE_TYPE_DIMMER:
                         self.export_device_updated_dimmer(origDev, newDev)
                     elif device_type == HE_EXPORT_DEVICE_TYPE_RELAY:
@@ -1765,8 +2046,6 @@ class Plugin(indigo.PluginBase):
         except Exception as exception_error:
             self.exception_handler(exception_error, True)  # Log error and display failing statement
 
-        super(Plugin, self).deviceUpdated(origDev, newDev)
-
     def export_device_updated_relay(self, origDev, newDev):
         try:
             device_key = f"dev-{newDev.id}"
@@ -2489,19 +2768,28 @@ class Plugin(indigo.PluginBase):
             indigo.devices.subscribeToChanges()
 
             # Create Queues for receiving MQTT topics
-            self.globals[QUEUES][MQTT_HUB_QUEUE] = queue.Queue()  # Used to queue MQTT topics for Hubitat Hubs
-            self.globals[QUEUES][MQTT_TASMOTA_QUEUE] = queue.Queue()  # Used to queue MQTT topics for Tasmota Outlets
-            self.globals[QUEUES][MQTT_EXPORT_QUEUE] = queue.Queue()  # Used to queue MQTT topics for Indigo Export
+            self.globals[QUEUES][MQTT_HUB_QUEUE] = dict()  # Used to queue MQTT topics for Hubitat Hubs - one queue per Hubitat Hub keyed by Indigo Hub device id
+            self.globals[QUEUES][MQTT_TASMOTA_QUEUE] = IngestQueue(self.globals[MQTT_INGEST_QUEUE_SIZE])  # Used to queue MQTT topics for Tasmota Outlets
+            self.globals[QUEUES][MQTT_EXPORT_QUEUE] = IngestQueue(self.globals[MQTT_INGEST_QUEUE_SIZE])  # Used to queue MQTT topics for Indigo Export
+            self.globals[LATENCY_HISTOGRAMS][MQTT_TASMOTA_QUEUE] = new_latency_histograms()
+            self.globals[LATENCY_HISTOGRAMS][MQTT_EXPORT_QUEUE] = new_latency_histograms()
+
+            # Create the single event loop that runs the MQTT Brokers and handlers, if selected, before any are started
+            if self.globals[MQTT_SINGLE_EVENT_LOOP]:
+                self.globals[ASYNC_RUNTIME] = AsyncRuntime(self.globals, threading.Event())
+                self.globals[ASYNC_RUNTIME].start()
+                self.logger.info("MQTT Brokers and handlers are running in a single event loop")
 
             # Create the thread to handle export /set processing
             self.globals[EXPORT][EXPORT_EVENT] = threading.Event()
             self.globals[EXPORT][EXPORT_THREAD] = ThreadExportHandler(self.globals, self.globals[EXPORT][EXPORT_EVENT])
-            self.globals[EXPORT][EXPORT_THREAD].start()
+            self.start_handler(MQTT_EXPORT_QUEUE, self.globals[EXPORT][EXPORT_THREAD], self.globals[QUEUES][MQTT_EXPORT_QUEUE])
 
             # Initialise dictionary to record Tasmota Keys to Indigo Device IDs
             self.globals[TASMOTA][TASMOTA_KEYS_TO_INDIGO_DEVICE_IDS] = dict()
 
             for dev in indigo.devices.iter("self"):
+                self.globals[PLUGIN_DEVICE_IDS].add(dev.id)
                 if dev.deviceTypeId == "mqttBroker":  # Only process if MQTT Client
                     self.globals[MQTT][dev.id] = dict()
                     self.globals[MQTT][dev.id][MQTT_CONNECTED] = False
@@ -2572,9 +2860,25 @@ class Plugin(indigo.PluginBase):
                         self.globals[EXPORT][ENABLED][dev.id][EXPORT_TYPE] = determine_device_type(dev)
                         self.globals[EXPORT][ENABLED][dev.id][EXPORT_ROOT_TOPIC_ID] = dev.pluginProps.get("export_root_topic_id", "indigo-1")
 
+            self.update_device_updated_routes()
+
         except Exception as exception_error:
             self.exception_handler(exception_error, True)  # Log error and display failing statement
 
+    def start_handler(self, handler_key, handler, ingest_queue):
+        # Start a Hub, Tasmota or Export handler: as its own thread or, if the plugin was started with the single event loop, in that loop's pool
+        if self.globals[ASYNC_RUNTIME] is None:
+            handler.start()
+        else:
+            self.globals[ASYNC_RUNTIME].add_handler(handler_key, handler, ingest_queue)
+
+    def stop_handler(self, handler_key, handler, timeout):
+        # Wait up to timeout seconds for a handler, whose event has been set, to end
+        if self.globals[ASYNC_RUNTIME] is None:
+            handler.join(timeout)
+        else:
+            self.globals[ASYNC_RUNTIME].remove_handler(handler_key, timeout)
+
     def stopConcurrentThread(self):
         self.logger.info("Hubitat plugin closing down")
 
@@ -2735,6 +3039,19 @@ class Plugin(indigo.PluginBase):
 
             values_dict["address"] = values_dict["hubitatDevice"]
 
+            for rate_limited_property in HE_RATE_LIMITED_PROPERTIES:
+                if bool(values_dict.get(f"usp{rate_limited_property}", False)):
+                    for rate_limit_field in [f"usp{rate_limited_property}Deadband", f"usp{rate_limited_property}MinimumInterval"]:
+                        try:
+                            rate_limit_value = float(values_dict.get(rate_limit_field, "0"))
+                        except ValueError:
+                            rate_limit_value = -1.0
+                        if rate_limit_value < 0.0:
+                            error_message = "Must be a number greater than or equal to zero"
+                            error_dict[rate_limit_field] = error_message
+                            error_dict["showAlertText"] = error_message
+                            return False, values_dict, error_dict
+
             # TODO: Consider using $nodes to check if device address is still valid - old nodes can be left behind in MQTT?
 
             if type_id == "button":
@@ -2991,6 +3308,28 @@ class Plugin(indigo.PluginBase):
                         values_dict["mqttTasmotaMessageFilter"] = ["-1-|||-- Log All Devices --"]
                         break
 
+            try:
+                ingest_queue_size = int(values_dict.get("ingestQueueSize", MQTT_INGEST_QUEUE_SIZE_DEFAULT))
+                if ingest_queue_size < 0:
+                    raise ValueError
+            except ValueError:
+                error_message = "MQTT Ingest Queue Size must be a whole number, zero or greater (zero = unbounded)."
+                error_dict = indigo.Dict()
+                error_dict["ingestQueueSize"] = error_message
+                error_dict["showAlertText"] = error_message
+                return False, values_dict, error_dict
+
+            try:
+                export_set_quiet_period = int(values_dict.get("exportSetQuietPeriod", EXPORT_SET_QUIET_PERIOD_DEFAULT))
+                if export_set_quiet_period < 0:
+                    raise ValueError
+            except ValueError:
+                error_message = "Slider Quiet Period must be a whole number of milliseconds, zero or greater (zero = apply every value)."
+                error_dict = indigo.Dict()
+                error_dict["exportSetQuietPeriod"] = error_message
+                error_dict["showAlertText"] = error_message
+                return False, values_dict, error_dict
+
             return True, values_dict
 
         except Exception as exception_error:
@@ -3766,6 +4105,70 @@ class Plugin(indigo.PluginBase):
         except Exception as exception_error:
             self.exception_handler(exception_error, True)  # Log error and display failing statement
 
+    def link_indigo_device(self, hubitat_hub_name, hubitat_device_name, dev_id):
+        try:
+            # Replace (rather than update) the linked Indigo devices of the Hubitat device, so that the hub handler threads can
+            #   iterate the current mapping without holding a lock whilst they update the Indigo server
+            with self.globals[LOCK_HE_LINKED_INDIGO_DEVICES]:
+                linked_indigo_devices = dict(self.globals[HE_HUBS][hubitat_hub_name][HE_DEVICES][hubitat_device_name].get(HE_LINKED_INDIGO_DEVICES, dict()))
+                linked_indigo_devices[dev_id] = dev_id
+                self.globals[HE_HUBS][hubitat_hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES] = linked_indigo_devices
+            if len(linked_indigo_devices) == 1:
+                self.mqtt_subscriptions_changed()  # Hubitat device is now linked
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def unlink_indigo_device(self, hubitat_hub_name, hubitat_device_name, dev_id):
+        try:
+            with self.globals[LOCK_HE_LINKED_INDIGO_DEVICES]:
+                linked_indigo_devices = self.globals[HE_HUBS][hubitat_hub_name][HE_DEVICES][hubitat_device_name].get(HE_LINKED_INDIGO_DEVICES, dict())
+                if dev_id in linked_indigo_devices:
+                    linked_indigo_devices = dict(linked_indigo_devices)
+                    del linked_indigo_devices[dev_id]
+                    self.globals[HE_HUBS][hubitat_hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES] = linked_indigo_devices
+            if len(linked_indigo_devices) == 0:
+                self.mqtt_subscriptions_changed()  # Hubitat device is no longer linked
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def mqtt_subscriptions_changed(self):
+        try:
+            # Devices have started or stopped, so have each MQTT Broker thread bring its subscriptions up to date
+            for mqtt_broker_device_id, mqtt_broker in list(self.globals[MQTT].items()):
+                mqtt_thread = mqtt_broker.get(MQTT_THREAD, None)
+                if mqtt_thread is not None and mqtt_thread.is_running():
+                    mqtt_thread.update_subscriptions()
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def mqtt_rediscover_devices(self):
+        try:
+            # Subscribe to everything again for the discovery period, so that newly added Hubitat devices and Tasmota outlets can be found
+            for mqtt_broker_device_id, mqtt_broker in list(self.globals[MQTT].items()):
+                mqtt_thread = mqtt_broker.get(MQTT_THREAD, None)
+                if mqtt_thread is not None and mqtt_thread.is_running():
+                    mqtt_thread.start_discovery()
+            self.logger.info(f"Discovering Hubitat devices and Tasmota outlets for the next {int(MQTT_DISCOVERY_PERIOD)} seconds")
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def index_secondary_devices(self, primary_dev_id):
+        try:
+            # Rebuild the secondary device index entries for a device group from its current members
+            for secondary_device_key in [key for key in self.globals[HE_SECONDARY_DEVICES] if key[0] == primary_dev_id]:
+                del self.globals[HE_SECONDARY_DEVICES][secondary_device_key]
+
+            for grouped_dev_id in indigo.device.getGroupList(primary_dev_id):
+                if grouped_dev_id != primary_dev_id:
+                    self.globals[HE_SECONDARY_DEVICES][(primary_dev_id, indigo.devices[grouped_dev_id].deviceTypeId)] = grouped_dev_id
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
     def process_hsm_secondary_device(self, hub_dev):
         try:
             hub_dev_id = hub_dev.id
@@ -3910,10 +4313,7 @@ class Plugin(indigo.PluginBase):
                         self.logger.warning(f"Secondary Device '{secondary_dev.name}' ungrouped from Primary Device '{primary_dev.name}' - please delete it!")
 
                         if hubitat_device_name in self.globals[HE_HUBS][hubitat_hub_name][HE_DEVICES]:
-                            with self.globals[LOCK_HE_LINKED_INDIGO_DEVICES]:
-                                if HE_LINKED_INDIGO_DEVICES in self.globals[HE_HUBS][hubitat_hub_name][HE_DEVICES][hubitat_device_name]:
-                                    if secondary_device_id in self.globals[HE_HUBS][hubitat_hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES]:
-                                        del self.globals[HE_HUBS][hubitat_hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES][secondary_device_id]
+                            self.unlink_indigo_device(hubitat_hub_name, hubitat_device_name, secondary_device_id)
 
                 else:
                     # TODO: CHECK FOR USP = TRUE
@@ -3975,10 +4375,7 @@ class Plugin(indigo.PluginBase):
 
                         if hubitat_device_name not in self.globals[HE_HUBS][hubitat_hub_name][HE_DEVICES]:
                             self.globals[HE_HUBS][hubitat_hub_name][HE_DEVICES][hubitat_device_name] = dict()  # Hubitat device name
-                        with self.globals[LOCK_HE_LINKED_INDIGO_DEVICES]:
-                            if HE_LINKED_INDIGO_DEVICES not in self.globals[HE_HUBS][hubitat_hub_name][HE_DEVICES][hubitat_device_name]:
-                                self.globals[HE_HUBS][hubitat_hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES] = dict()
-                            self.globals[HE_HUBS][hubitat_hub_name][HE_DEVICES][hubitat_device_name][HE_LINKED_INDIGO_DEVICES][secondary_dev_id] = secondary_dev_id
+                        self.link_indigo_device(hubitat_hub_name, hubitat_device_name, secondary_dev_id)
 
                         # sub_model_device.model = primary_dev.model
                         #
@@ -4016,15 +4413,12 @@ class Plugin(indigo.PluginBase):
                         published = True
 
             if published:
-                log_mqtt_msg = False  # Assume MQTT message should NOT be logged
-                # Check if MQTT message filtering required
-                if HE_MQTT_FILTERS in self.globals:
-                    if len(self.globals[HE_MQTT_FILTERS]) > 0 and self.globals[HE_MQTT_FILTERS] != ["-0-"]:
-                        # As entries exist in the filter list, only log MQTT message in Hubitat device in the filter list
-                        if self.globals[HE_MQTT_FILTERS] == ["-1-"] or hubitat_key in self.globals[HE_MQTT_FILTERS]:
-                            log_mqtt_msg = True
+                if not self.logger.isEnabledFor(LOG_LEVEL_TOPIC):
+                    return
+                log_filter_mode, log_filter_keys = self.globals[HE_MQTT_FILTERS]
+                log_mqtt_msg = log_filter_mode == MQTT_LOG_FILTER_ALL or (log_filter_mode == MQTT_LOG_FILTER_SELECTED and hubitat_key in log_filter_keys)
                 if log_mqtt_msg:
-                    self.logger.topic(f">>> Published to '{hubitat_hub_name}': Topic='{topic}', Payload='{payload}'")  # noqa [unresolved attribute reference]
+                    self.logger.topic(">>> Published to '%s': Topic='%s', Payload='%s'", hubitat_hub_name, topic, payload)  # noqa [unresolved attribute reference]
             else:
                 pass
                 self.logger.error(f">>> MQTT not connected: Hubitat Topic='{topic}', Payload='{payload}' dropped")  # noqa [unresolved attribute reference]  # TODO: TESTING ONLY
@@ -4044,16 +4438,12 @@ class Plugin(indigo.PluginBase):
                         self.globals[MQTT][mqtt_broker_device_id][MQTT_CLIENT].publish(topic, payload, 1, True)  # noqa [parameter value is not used] - n.b. QOS=1 Retain=True
                         published = True
             if published:
-                log_mqtt_msg = False  # Assume MQTT message should NOT be logged
-                # Check if MQTT message filtering required
-                if TASMOTA_MQTT_FILTERS in self.globals:
-                    if len(self.globals[TASMOTA_MQTT_FILTERS]) > 0 and self.globals[TASMOTA_MQTT_FILTERS] != ["-0-"]:
-                        # As entries exist in the filter list, only log MQTT message in Tasmota device in the filter list
-                        if self.globals[TASMOTA_MQTT_FILTERS] == ["-1-"] or tasmota_key in self.globals[TASMOTA_MQTT_FILTERS]:
-                            log_mqtt_msg = True
+                if self.logger.isEnabledFor(LOG_LEVEL_TOPIC):
+                    log_filter_mode, log_filter_keys = self.globals[TASMOTA_MQTT_FILTERS]
+                    log_mqtt_msg = log_filter_mode == MQTT_LOG_FILTER_ALL or (log_filter_mode == MQTT_LOG_FILTER_SELECTED and tasmota_key in log_filter_keys)
 
-                if log_mqtt_msg:
-                    self.logger.topic(f">>> Published to Tasmota: Topic='{topic}', Payload='{payload.decode('utf-8')}'")  # noqa [unresolved attribute reference]
+                    if log_mqtt_msg:
+                        self.logger.topic(">>> Published to Tasmota: Topic='%s', Payload='%s'", topic, payload)  # noqa [unresolved attribute reference]
             else:
                 pass
                 self.logger.error(f">>> MQTT not connected: Tasmota Topic='{topic}', Payload='{payload}' dropped")  # noqa [unresolved attribute reference]  # TODO: TESTING ONLY
@@ -4062,47 +4452,42 @@ class Plugin(indigo.PluginBase):
             self.exception_handler(exception_error, True)  # Log error and display failing statement
 
     def publish_export_topic(self, device_key, device_name, topic, payload):
+        # Returns True if at least one MQTT Broker accepted (or already holds) the topic
         try:
             published = False
+            unchanged = False
             for mqtt_broker_device_id in self.globals[EXPORT][MQTT_BROKERS]:
                 if self.globals[MQTT][mqtt_broker_device_id][MQTT_CONNECTED]:
                     if self.globals[MQTT][mqtt_broker_device_id][MQTT_PUBLISH_TO_HOMIE]:
-                        self.globals[MQTT][mqtt_broker_device_id][MQTT_CLIENT].publish(topic, payload, 1, True)  # noqa [parameter value is not used] - n.b. QOS=1 Retain=True
-                        published = True
+                        publish_result = self.globals[EXPORT][EXPORT_PUBLISHER].publish(self.globals[MQTT][mqtt_broker_device_id][MQTT_CLIENT], mqtt_broker_device_id, topic, payload)
+                        if publish_result == EXPORT_PUBLISH_SENT or publish_result == EXPORT_PUBLISH_DEFERRED:
+                            published = True
+                        elif publish_result == EXPORT_PUBLISH_UNCHANGED:
+                            unchanged = True
 
-            published = False
-            for mqtt_broker_device_id in self.globals[EXPORT][MQTT_BROKERS]:
-                if self.globals[MQTT][mqtt_broker_device_id][MQTT_CONNECTED]:
-                    if self.globals[MQTT][mqtt_broker_device_id][MQTT_PUBLISH_TO_HOMIE]:
-                        self.globals[MQTT][mqtt_broker_device_id][MQTT_CLIENT].publish(topic, payload, 1, True)  # noqa [parameter value is not used] - n.b. QOS=1 Retain=True
-                        published = True
+            if (published or unchanged) and device_key != "dev-root" and payload != "":  # The broker holds the topic, so it must be cleared if the node is removed
+                self.globals[EXPORT][EXPORT_NODE_TOPICS].setdefault(device_key, set()).add(topic)
 
             # Now check if topic should be logged
             if published:
-                log_mqtt_msg = False  # Assume MQTT message should NOT be logged
-                # Check if MQTT message filtering required
-                if EXPORT_FILTERS in self.globals:
-                    if len(self.globals[EXPORT_FILTERS]) > 0:
-                        if len(self.globals[EXPORT_FILTERS]) == 1:
-                            if self.globals[EXPORT_FILTERS][0] == "dev-none":
-                                return
-                            elif self.globals[EXPORT_FILTERS][0] == "dev-all":
-                                log_mqtt_msg = True
-                        else:
-                            # As entries exist in the filter list, only log MQTT message in Export device in the filter list
-                            if device_key in self.globals[EXPORT_FILTERS]:
-                                log_mqtt_msg = True
-                
+                if not self.logger.isEnabledFor(LOG_LEVEL_TOPIC):
+                    return True
+                log_filter_mode, log_filter_keys = self.globals[EXPORT_FILTERS]
+                log_mqtt_msg = log_filter_mode == MQTT_LOG_FILTER_ALL or (log_filter_mode == MQTT_LOG_FILTER_SELECTED and device_key in log_filter_keys)
+
                 # Only log if check result is True
                 if log_mqtt_msg:
                     if device_name is not None:
-                        self.logger.topic(f">>> Published Indigo Exported: Topic='{topic}', Payload='{payload}' for {device_name}")
+                        self.logger.topic(">>> Published Indigo Exported: Topic='%s', Payload='%s' for %s", topic, payload, device_name)  # noqa [unresolved attribute reference]
                     else:
-                        self.logger.topic(f">>> Published Indigo Exported: Topic='{topic}', Payload='{payload}'")
+                        self.logger.topic(">>> Published Indigo Exported: Topic='%s', Payload='%s'", topic, payload)  # noqa [unresolved attribute reference]
                 # self.logger.warning(f">>> Published Export [RC={rc}]: Topic='{topic}', Payload='{payload.decode('utf-8')}'")  # noqa [unresolved attribute reference]  # TODO: TESTING ONLY
-            else:
+            elif not unchanged:
                 pass
                 self.logger.error(f">>> MQTT not connected: Indigo Exported Topic='{topic}', Payload='{payload}' dropped")  # noqa [unresolved attribute reference]  # TODO: TESTING ONLY
 
+            return published or unchanged
+
         except Exception as exception_error:
             self.exception_handler(exception_error, True)  # Log error and display failing statement
+            return False
@@ -25,6 +25,7 @@ import traceback
 import time
 
 from constants import *
+from latencyHistogram import latency_percentile_states, record_ingest_latency
 
 
 # noinspection PyPep8Naming
@@ -41,8 +42,13 @@ class ThreadTasmotaHandler(threading.Thread):
 
             self.tasmotaHandlerLogger = logging.getLogger("Plugin.TASMOTA")
 
+            # Log filter decision for each Tasmota device, valid whilst the compiled filter it was derived from is current
+            self.log_filter_decisions = (None, dict())
+
             self.threadStop = event
 
+            self.latency_published = [None, 0.0]  # Message count when the latency states were last written and when
+
         except Exception as exception_error:
             self.exception_handler(exception_error, True)  # Log error and display failing statement
 
@@ -59,26 +65,69 @@ class ThreadTasmotaHandler(threading.Thread):
     def run(self):
         try:
             while not self.threadStop.is_set():
-                try:
-                    mqtt_message_sequence, mqtt_process_command, mqtt_topics, mqtt_topics_list, mqtt_payload = self.globals[QUEUES][MQTT_TASMOTA_QUEUE].get(True, 5)
-
-                    if mqtt_process_command == MQTT_PROCESS_COMMAND_HANDLE_TOPICS:
-                        self.handle_topics(mqtt_topics, mqtt_topics_list, mqtt_payload)
-
-                except queue.Empty:
-                    pass
-                except Exception as exception_error:
-                    self.exception_handler(exception_error, True)  # Log error and display failing statement
+                self.process_queue(self.queue_timeout())
             else:
                 pass
                 # TODO: At this point, queue a recovery for n seconds time
                 # TODO: In the meanwhile, just disable and then enable the Indigo Hubitat Elevation Hub device
 
-            self.tasmotaHandlerLogger.debug("Tasmota Handler Thread close-down commencing.")
+            self.close_down()
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def queue_timeout(self):
+        # Seconds to wait for the next message before the latency states are checked
+        return 5
+
+    def process_queue(self, timeout):
+        # Process the next queued message, waiting up to timeout seconds for one, and then update the latency states if due
+        #   Called repeatedly by run or, if the plugin uses the single event loop, by the AsyncRuntime with a zero timeout whilst messages are queued
+        try:
+            try:
+                mqtt_message_sequence, mqtt_message_received, mqtt_message_enqueued, mqtt_process_command, mqtt_topics, mqtt_topics_list, mqtt_payload = self.globals[QUEUES][MQTT_TASMOTA_QUEUE].get(True, timeout)
+
+                if mqtt_process_command == MQTT_PROCESS_COMMAND_HANDLE_TOPICS:
+                    dequeued = time.monotonic()
+                    self.handle_topics(mqtt_topics, mqtt_topics_list, mqtt_payload)
+                    record_ingest_latency(self.globals[LATENCY_HISTOGRAMS][MQTT_TASMOTA_QUEUE], mqtt_message_received, mqtt_message_enqueued, dequeued, time.monotonic())
+
+            except queue.Empty:
+                pass
+            except Exception as exception_error:
+                self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+            self.update_latency_states()
 
         except Exception as exception_error:
             self.exception_handler(exception_error, True)  # Log error and display failing statement
 
+    def update_latency_states(self):
+        try:
+            # Expose the end to end Tasmota latency percentiles (milliseconds) as states of the MQTT Broker devices subscribed to Tasmota, at most once per interval
+            #   One handler processes the Tasmota messages of all the MQTT Brokers, so each of those brokers shows the same percentiles
+            total_histogram = self.globals[LATENCY_HISTOGRAMS][MQTT_TASMOTA_QUEUE][LATENCY_STAGE_TOTAL]
+            published_count, published_time = self.latency_published
+            if total_histogram.count == published_count:
+                return
+            now = time.monotonic()
+            if published_count is not None and (now - published_time) < HE_LATENCY_STATES_UPDATE_INTERVAL:
+                return
+            self.latency_published = [total_histogram.count, now]
+
+            latency_states = latency_percentile_states(total_histogram, "tasmotaLatencyP")
+            if len(latency_states) == 0:
+                return
+            for mqtt_broker_dev_id, mqtt_broker in list(self.globals[MQTT].items()):
+                if mqtt_broker.get(MQTT_SUBSCRIBE_TO_TASMOTA, False) and mqtt_broker_dev_id in indigo.devices:
+                    indigo.devices[mqtt_broker_dev_id].updateStatesOnServer(latency_states)
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def close_down(self):
+        self.tasmotaHandlerLogger.debug("Tasmota Handler Thread close-down commencing.")
+
     def handle_topics(self, topics, topics_list, payload):
         try:
             # Note that there are a minimum of three topic entries in the topics_list
@@ -145,7 +194,7 @@ class ThreadTasmotaHandler(threading.Thread):
             if topics_list[3] == "config":
                 try:
                     payload_data = json.loads(payload)
-                    self.tasmotaHandlerLogger.debug(f'Received [Payload Data]: \'{payload_data}\'')
+                    self.tasmotaHandlerLogger.debug("Received [Payload Data]: '%s'", payload_data)
                 except ValueError:
                     self.tasmotaHandlerLogger.warning(f'Received [JSON Payload Data] could not be decoded: \'{payload}\'')
                     return
@@ -196,7 +245,7 @@ class ThreadTasmotaHandler(threading.Thread):
             elif topics_list[3] == "sensors":
                 try:
                     payload_data = json.loads(payload)
-                    self.tasmotaHandlerLogger.debug(f'Received [Payload Data]: \'{payload_data}\'')
+                    self.tasmotaHandlerLogger.debug("Received [Payload Data]: '%s'", payload_data)
                 except ValueError:
                     self.tasmotaHandlerLogger.warning(f'Received [JSON Payload Data] could not be decoded: \'{payload}\'')
                     return
@@ -275,7 +324,7 @@ class ThreadTasmotaHandler(threading.Thread):
             elif topics_list[2] == "STATUS8":
                 try:
                     payload_data = json.loads(payload)
-                    self.tasmotaHandlerLogger.debug(f'Received [Payload Data]: \'{payload_data}\'')
+                    self.tasmotaHandlerLogger.debug("Received [Payload Data]: '%s'", payload_data)
                 except ValueError:
                     self.tasmotaHandlerLogger.warning(f'Received [JSON Payload Data] could not be decoded: \'{payload}\'')
                     return
@@ -286,7 +335,7 @@ class ThreadTasmotaHandler(threading.Thread):
             elif topics_list[2] == "RESULT":  # Result of Resetting Total
                 try:
                     payload_data = json.loads(payload)
-                    self.tasmotaHandlerLogger.debug(f'Received [Payload Data]: \'{payload_data}\'')
+                    self.tasmotaHandlerLogger.debug("Received [Payload Data]: '%s'", payload_data)
                 except ValueError:
                     self.tasmotaHandlerLogger.warning(f'Received [JSON Payload Data] could not be decoded: \'{payload}\'')
                     return
@@ -377,7 +426,7 @@ class ThreadTasmotaHandler(threading.Thread):
             elif topics_list[2] == "SENSOR":
                 try:
                     payload_data = json.loads(payload)
-                    self.tasmotaHandlerLogger.debug(f'Received [Payload Data]: \'{payload_data}\'')
+                    self.tasmotaHandlerLogger.debug("Received [Payload Data]: '%s'", payload_data)
                 except ValueError:
                     self.tasmotaHandlerLogger.warning(f'Received [JSON Payload Data] could not be decoded: \'{payload}\'')
                     return
@@ -388,16 +437,20 @@ class ThreadTasmotaHandler(threading.Thread):
             self.exception_handler(exception_error, True)  # Log error and display failing statement
 
     def mqtt_filter_log_processing(self, tasmota_key, msg_topic, payload):
-        log_mqtt_msg = False  # Assume MQTT message should NOT be logged
-        # Check if MQTT message filtering required
-        if TASMOTA_MQTT_FILTERS in self.globals:
-            if len(self.globals[TASMOTA_MQTT_FILTERS]) > 0 and self.globals[TASMOTA_MQTT_FILTERS] != ["-0-"]:
-                # As entries exist in the filter list, only log MQTT message in Tasmota device in the filter list
-                if self.globals[TASMOTA_MQTT_FILTERS] == ["-1-"] or tasmota_key in self.globals[TASMOTA_MQTT_FILTERS]:
-                    log_mqtt_msg = True
+        if not self.tasmotaHandlerLogger.isEnabledFor(LOG_LEVEL_TOPIC):
+            return
+
+        log_filter = self.globals[TASMOTA_MQTT_FILTERS]
+        if self.log_filter_decisions[0] is not log_filter:  # Filter replaced by closedPrefsConfigUi - discard decisions
+            self.log_filter_decisions = (log_filter, dict())
+        log_mqtt_msg = self.log_filter_decisions[1].get(tasmota_key, None)
+        if log_mqtt_msg is None:
+            log_filter_mode, log_filter_keys = log_filter
+            log_mqtt_msg = log_filter_mode == MQTT_LOG_FILTER_ALL or (log_filter_mode == MQTT_LOG_FILTER_SELECTED and tasmota_key in log_filter_keys)
+            self.log_filter_decisions[1][tasmota_key] = log_mqtt_msg
 
         if log_mqtt_msg:
-            self.tasmotaHandlerLogger.topic(f"Received from Tasmota: Topic='{msg_topic}', Payload='{payload.decode('utf-8')}'")  # noqa [unresolved attribute reference]
+            self.tasmotaHandlerLogger.topic("Received from Tasmota: Topic='%s', Payload='%s'", msg_topic, payload)  # noqa [unresolved attribute reference]
 
     def update_tasmota_status(self, tasmota_key):
         try:
@@ -429,17 +482,12 @@ class ThreadTasmotaHandler(threading.Thread):
                     if self.globals[MQTT][mqtt_client_device_id][MQTT_PUBLISH_TO_HOMIE]:
                         self.globals[MQTT][mqtt_client_device_id][MQTT_CLIENT].publish(topic, payload, 1, True)  # noqa [parameter value is not used] - n.b. QOS=1 Retain=True
                         published = True
-            if published:
-                log_mqtt_msg = False  # Assume MQTT message should NOT be logged
-                # Check if MQTT message filtering required
-                if TASMOTA_MQTT_FILTERS in self.globals:
-                    if len(self.globals[TASMOTA_MQTT_FILTERS]) > 0 and self.globals[TASMOTA_MQTT_FILTERS] != ["-0-"]:
-                        # As entries exist in the filter list, only log MQTT message in Tasmota device in the filter list
-                        if self.globals[TASMOTA_MQTT_FILTERS] == ["-1-"] or tasmota_key in self.globals[TASMOTA_MQTT_FILTERS]:
-                            log_mqtt_msg = True
+            if published and self.tasmotaHandlerLogger.isEnabledFor(LOG_LEVEL_TOPIC):
+                log_filter_mode, log_filter_keys = self.globals[TASMOTA_MQTT_FILTERS]
+                log_mqtt_msg = log_filter_mode == MQTT_LOG_FILTER_ALL or (log_filter_mode == MQTT_LOG_FILTER_SELECTED and tasmota_key in log_filter_keys)
 
                 if log_mqtt_msg:
-                    self.tasmotaHandlerLogger.topic(f">>> Published to Tasmota: Topic='{topic}', Payload='{payload.decode('utf-8')}'")  # noqa [unresolved attribute reference]
+                    self.tasmotaHandlerLogger.topic(">>> Published to Tasmota: Topic='%s', Payload='%s'", topic, payload)  # noqa [unresolved attribute reference]
 
         except Exception as exception_error:
             self.exception_handler(exception_error, True)  # Log error and display failing statement
@@ -0,0 +1,23 @@
+# The plugin modules import 'indigo', which only exists inside the Indigo Plugin Host. These tests exercise modules whose logic doesn't
+#   call the Indigo server, so a stand-in module is installed before they are imported.
+
+import os
+import sys
+import types
+from unittest import mock
+
+PLUGIN_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Hubitat.indigoPlugin", "Contents", "Server Plugin")
+sys.path.insert(0, PLUGIN_DIRECTORY)
+
+
+class IndigoStandIn(types.ModuleType):
+    def __getattr__(self, name):
+        value = mock.MagicMock(name=f"indigo.{name}")
+        setattr(self, name, value)
+        return value
+
+
+try:
+    import indigo  # noqa
+except ImportError:
+    sys.modules["indigo"] = IndigoStandIn("indigo")
@@ -0,0 +1,185 @@
+import logging
+import queue
+import socket
+import threading
+import time
+import types
+from unittest import mock
+
+import pytest
+
+import asyncRuntime
+from asyncRuntime import AsyncRuntime
+from constants import EXPORT, EXPORT_PUBLISHER, MQTT, MQTT_IP, MQTT_PORT
+
+MQTT_BROKER_DEV_ID = 1001
+HUB_DEV_ID = 2001
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("Timed out")
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def runtime():
+    plugin_globals = {MQTT: {MQTT_BROKER_DEV_ID: {MQTT_IP: "127.0.0.1", MQTT_PORT: 1883}}, EXPORT: {EXPORT_PUBLISHER: mock.MagicMock()}}
+    async_runtime = AsyncRuntime(plugin_globals, threading.Event())
+    async_runtime.start()
+    yield async_runtime
+    async_runtime.threadStop.set()
+    async_runtime.join(5.0)
+    assert not async_runtime.is_alive()
+
+
+class FakeHandler:
+    # Stands in for a Hub, Tasmota or Export handler: records the messages it processes and the threads that process them
+
+    def __init__(self):
+        self.threadStop = threading.Event()
+        self.ingest_queue = queue.Queue()
+        self.processed = list()
+        self.threads = set()
+        self.concurrent = 0
+        self.overlapped = False
+        self.closed_down = 0
+
+    def queue_timeout(self):
+        return 60.0
+
+    def process_queue(self, timeout):
+        self.concurrent += 1
+        self.overlapped = self.overlapped or self.concurrent > 1
+        self.threads.add(threading.current_thread())
+        try:
+            self.processed.append(self.ingest_queue.get(True, timeout))
+            time.sleep(0.001)
+        except queue.Empty:
+            pass
+        self.concurrent -= 1
+
+    def close_down(self):
+        self.closed_down += 1
+
+
+def test_lane_runs_functions_in_submitted_order(runtime):
+    results = list()
+    futures = [runtime.submit(HUB_DEV_ID, results.append, sequence) for sequence in range(200)]
+    futures[-1].result(5.0)
+    assert results == list(range(200))
+
+
+def test_handler_processes_queued_messages_in_order_off_the_event_loop(runtime):
+    handler = FakeHandler()
+    for sequence in range(3):
+        handler.ingest_queue.put(sequence)  # Queued before the handler is added
+    runtime.add_handler(HUB_DEV_ID, handler, handler.ingest_queue)
+    wait_until(lambda: handler.processed == [0, 1, 2])
+
+    for sequence in range(3, 100):
+        handler.ingest_queue.put(sequence)
+        runtime.queued(HUB_DEV_ID)
+    wait_until(lambda: len(handler.processed) == 100)
+
+    assert handler.processed == list(range(100))
+    assert not handler.overlapped
+    assert runtime not in handler.threads
+
+    handler.threadStop.set()
+    runtime.remove_handler(HUB_DEV_ID, 5.0)
+    assert handler.closed_down == 1
+
+
+class FakeMqttClient:
+    # Just enough of paho's external event loop API: the broker end of the connection is a socket pair
+
+    def __init__(self):
+        self.on_socket_open = None
+        self.on_socket_close = None
+        self.on_socket_register_write = None
+        self.on_socket_unregister_write = None
+        self.on_connect = None
+        self.on_disconnect = None
+        self.sock = None
+        self.broker = None
+        self.received = list()
+        self.read_threads = set()
+
+    def connect(self):
+        self.sock, self.broker = socket.socketpair()
+        self.sock.setblocking(False)
+        self.on_socket_open(self, None, self.sock)
+
+    def socket(self):
+        return self.sock
+
+    def loop_read(self):
+        self.read_threads.add(threading.current_thread())
+        self.received.append(self.sock.recv(1024))
+        return 0
+
+    def loop_write(self):
+        return 0
+
+    def loop_misc(self):
+        return 0
+
+    def close(self):
+        sock, self.sock = self.sock, None  # As paho: the client has no socket once it is closed
+        self.on_socket_close(self, None, sock)
+        sock.close()
+        self.broker.close()
+
+
+class FakeMqttHandler:
+    # Stands in for ThreadMqttHandler: records which threads create the client, connect and close down
+
+    def __init__(self):
+        self.mqtt_broker_dev_id = MQTT_BROKER_DEV_ID
+        self.mqttHandlerLogger = logging.getLogger("Plugin.MQTT")
+        self.threadStop = threading.Event()
+        self.runtime = None
+        self.mqtt_client = None
+        self.network_connected = False
+        self.connection_lost = False
+        self.failed_connection_attempts = 0
+        self.calling_threads = dict()
+
+    def create_client(self):
+        self.calling_threads["create_client"] = threading.current_thread()
+        self.mqtt_client = FakeMqttClient()
+
+    def connect_to_broker(self, log_failure):
+        self.calling_threads["connect_to_broker"] = threading.current_thread()
+        self.mqtt_client.connect()
+        return True
+
+    def housekeeping(self):
+        pass
+
+    def report_connection_lost(self):
+        pass
+
+    def handle_quit(self):
+        self.calling_threads["handle_quit"] = threading.current_thread()
+        self.mqtt_client.close()
+
+
+def test_mqtt_broker_socket_is_read_by_the_event_loop(runtime, monkeypatch):
+    monkeypatch.setattr(asyncRuntime, "mqtt", types.SimpleNamespace(MQTT_ERR_SUCCESS=0), raising=False)
+    mqtt_handler = FakeMqttHandler()
+    runtime.add_mqtt_broker(mqtt_handler)
+    assert mqtt_handler.runtime is runtime
+
+    wait_until(lambda: mqtt_handler.network_connected)
+    mqtt_handler.mqtt_client.broker.sendall(b"PUBLISH")
+    wait_until(lambda: mqtt_handler.mqtt_client.received == [b"PUBLISH"])
+    assert mqtt_handler.mqtt_client.read_threads == {runtime}  # Network traffic on the event loop thread ...
+    assert runtime not in (mqtt_handler.calling_threads["create_client"], mqtt_handler.calling_threads["connect_to_broker"])  # ... Indigo calls off it
+
+    mqtt_handler.threadStop.set()
+    wait_until(lambda: "handle_quit" in mqtt_handler.calling_threads)
+    assert mqtt_handler.calling_threads["handle_quit"] is not runtime
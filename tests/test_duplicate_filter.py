@@ -0,0 +1,41 @@
+from constants import MQTT_DUPLICATE_WINDOW
+from duplicateFilter import DuplicateFilter
+
+BROKER_A = 1
+BROKER_B = 2
+TOPIC = "homie/hub/meter/power"
+
+
+def test_copy_through_another_broker_is_suppressed():
+    duplicate_filter = DuplicateFilter()
+    assert not duplicate_filter.is_duplicate(TOPIC, b"10", BROKER_A, 100.0)
+    assert duplicate_filter.is_duplicate(TOPIC, b"10", BROKER_B, 100.1)
+
+
+def test_repeat_through_the_same_broker_is_not_suppressed():
+    duplicate_filter = DuplicateFilter()
+    assert not duplicate_filter.is_duplicate(TOPIC, b"pushed", BROKER_A, 100.0)
+    assert not duplicate_filter.is_duplicate(TOPIC, b"pushed", BROKER_A, 100.1)
+
+
+def test_interleaved_copies_are_suppressed():
+    # A:10, A:20, B:10, B:20 - the late B:10 must not replay the older value after A:20
+    duplicate_filter = DuplicateFilter()
+    assert not duplicate_filter.is_duplicate(TOPIC, b"10", BROKER_A, 100.0)
+    assert not duplicate_filter.is_duplicate(TOPIC, b"20", BROKER_A, 100.1)
+    assert duplicate_filter.is_duplicate(TOPIC, b"10", BROKER_B, 100.2)
+    assert duplicate_filter.is_duplicate(TOPIC, b"20", BROKER_B, 100.3)
+
+
+def test_copy_outside_the_window_is_not_suppressed_and_expired_entries_are_pruned():
+    duplicate_filter = DuplicateFilter()
+    assert not duplicate_filter.is_duplicate(TOPIC, b"10", BROKER_A, 100.0)
+    assert not duplicate_filter.is_duplicate(TOPIC, b"20", BROKER_A, 100.5)
+    assert not duplicate_filter.is_duplicate(TOPIC, b"10", BROKER_B, 100.0 + MQTT_DUPLICATE_WINDOW)
+    assert [entry[1:] for entry in duplicate_filter.recently_received[TOPIC]] == [(BROKER_A, 100.5), (BROKER_B, 100.0 + MQTT_DUPLICATE_WINDOW)]
+
+
+def test_topics_are_independent():
+    duplicate_filter = DuplicateFilter()
+    assert not duplicate_filter.is_duplicate(TOPIC, b"10", BROKER_A, 100.0)
+    assert not duplicate_filter.is_duplicate("homie/hub/meter/voltage", b"10", BROKER_B, 100.1)
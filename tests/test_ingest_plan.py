@@ -0,0 +1,41 @@
+import types
+
+import hubHandler
+from constants import HE_INGEST_PLANS
+from hubHandler import ThreadHubHandler
+from ingestPlan import IngestPlan
+
+DEV_ID = 3001
+
+
+def hub_handler(ingest_plans):
+    return types.SimpleNamespace(globals={HE_INGEST_PLANS: ingest_plans}, exception_handler=None)
+
+
+def test_started_device_uses_its_compiled_plan():
+    dev_plan = IngestPlan({"uspPower": True})
+    ingest_plans = {DEV_ID: dev_plan}
+    dev = types.SimpleNamespace(id=DEV_ID, pluginProps={})
+    assert ThreadHubHandler.ingest_plan(hub_handler(ingest_plans), dev) is dev_plan
+
+
+def test_stopped_device_plan_is_not_recreated():
+    # deviceStopComm has deleted the plan whilst the hub thread was processing a message for the device
+    ingest_plans = dict()
+    dev = types.SimpleNamespace(id=DEV_ID, pluginProps={"uspPower": True, "uspPowerDecimalPlaces": "2"})
+    dev_plan = ThreadHubHandler.ingest_plan(hub_handler(ingest_plans), dev)
+    assert dev_plan.properties["Power"].enabled and dev_plan.properties["Power"].decimal_places == 2
+    assert DEV_ID not in ingest_plans
+
+
+def test_secondary_device_follows_its_primary_plan_without_indigo_calls(monkeypatch):
+    monkeypatch.setattr(hubHandler, "indigo", None)  # Any Indigo server call fails the test
+    primary_dev_id = DEV_ID + 1
+    handler = hub_handler({DEV_ID: IngestPlan({"linkedPrimaryIndigoDeviceId": str(primary_dev_id)}),
+                           primary_dev_id: IngestPlan({"forceStateRefresh": True})})
+    handler.ingest_plan = lambda dev: ThreadHubHandler.ingest_plan(handler, dev)
+    secondary_dev = types.SimpleNamespace(id=DEV_ID, pluginProps={})
+    assert ThreadHubHandler.force_state_refresh(handler, secondary_dev)
+
+    del handler.globals[HE_INGEST_PLANS][primary_dev_id]  # Primary stopped: the secondary's own setting applies
+    assert not ThreadHubHandler.force_state_refresh(handler, secondary_dev)
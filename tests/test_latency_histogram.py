@@ -0,0 +1,16 @@
+from latencyHistogram import LatencyHistogram, latency_percentile_states
+
+
+def test_no_states_until_a_latency_is_recorded():
+    assert latency_percentile_states(LatencyHistogram()) == []
+
+
+def test_percentile_states_are_in_milliseconds():
+    histogram = LatencyHistogram()
+    for _ in range(100):
+        histogram.record(0.004)
+    histogram.record(0.250)
+    states = latency_percentile_states(histogram, "tasmotaLatencyP")
+    assert [state["key"] for state in states] == ["tasmotaLatencyP50", "tasmotaLatencyP95", "tasmotaLatencyP99"]
+    assert all(isinstance(state["value"], float) and state["uiValue"] == f"{state['value']} ms" for state in states)
+    assert states[0]["value"] <= states[1]["value"] <= states[2]["value"] <= 250.0
@@ -0,0 +1,120 @@
+import random
+import types
+from unittest import mock
+
+import pytest
+
+import mqttHandler
+from constants import (EXPORT, EXPORT_CONNECTED, EXPORT_PUBLISHED_NODES, EXPORT_PUBLISHER, MQTT, MQTT_BROKERS, MQTT_CLIENT_ID, MQTT_CONNECTED, MQTT_IP,
+                       MQTT_PASSWORD, MQTT_PORT, MQTT_PROTOCOL, MQTT_RECONNECT_DELAY_MAXIMUM, MQTT_RECONNECT_DELAY_MINIMUM, MQTT_USERNAME)
+from mqttHandler import ThreadMqttHandler, reconnect_delay
+
+MQTT_BROKER_DEV_ID = 1001
+
+
+def delay_cap(failed_connection_attempts):
+    return min(MQTT_RECONNECT_DELAY_MAXIMUM, MQTT_RECONNECT_DELAY_MINIMUM * 2 ** (failed_connection_attempts - 1))
+
+
+def test_reconnect_delay_doubles_with_jitter_up_to_the_maximum():
+    random.seed(1)
+    for failed_connection_attempts in range(1, 40):
+        cap = delay_cap(failed_connection_attempts)
+        for _ in range(20):
+            assert cap / 2.0 <= reconnect_delay(failed_connection_attempts) <= cap
+    assert delay_cap(39) == MQTT_RECONNECT_DELAY_MAXIMUM
+
+
+class FakeStop:
+    # The MQTT Broker thread's stop event: records the backoff delays instead of waiting
+
+    def __init__(self):
+        self.delays = list()
+        self.stopped = False
+
+    def is_set(self):
+        return self.stopped
+
+    def wait(self, delay):
+        self.delays.append(delay)
+        return False
+
+
+class FakeMqttClient:
+    # The broker refuses the first 'failures' connections: either the socket connection (refuse_socket) or the MQTT CONNECT (CONNACK code 5)
+
+    def __init__(self, handler, failures, refuse_socket):
+        self.handler = handler
+        self.failures = failures
+        self.refuse_socket = refuse_socket
+        self.attempts = 0
+
+    def connect(self, **kwargs):
+        self.attempts += 1
+        if self.refuse_socket and self.attempts <= self.failures:
+            raise ConnectionRefusedError(61, "Connection refused")
+
+    def loop(self, timeout):
+        if not self.refuse_socket and self.attempts <= self.failures:
+            self.handler.on_connect(self, None, {}, 5)  # Not authorised
+        elif not self.handler.globals[MQTT][MQTT_BROKER_DEV_ID].get(MQTT_CONNECTED, False):
+            self.handler.on_connect(self, None, {}, 0)
+        else:
+            self.handler.threadStop.stopped = True  # Connected: end the test
+        return 0
+
+    def is_connected(self):
+        return self.handler.globals[MQTT][MQTT_BROKER_DEV_ID].get(MQTT_CONNECTED, False)
+
+    def subscribe(self, topics):
+        pass
+
+    def unsubscribe(self, topics):
+        pass
+
+    def disconnect(self):
+        pass
+
+
+@pytest.mark.parametrize("failures", [0, 1, 3, 10])
+@pytest.mark.parametrize("refuse_socket", [True, False], ids=["socket refused", "connect refused"])
+def test_supervisor_backs_off_until_connected(monkeypatch, failures, refuse_socket):
+    plugin_globals = {MQTT: {MQTT_BROKER_DEV_ID: {MQTT_CLIENT_ID: "indigo_mac-D1001", MQTT_PROTOCOL: 4, MQTT_PASSWORD: "", MQTT_USERNAME: "",
+                                                  MQTT_IP: "127.0.0.1", MQTT_PORT: 1883}},
+                      EXPORT: {MQTT_BROKERS: list(), EXPORT_PUBLISHER: mock.MagicMock()}}
+    handler = ThreadMqttHandler(plugin_globals, FakeStop(), MQTT_BROKER_DEV_ID)
+    clients = list()
+
+    def new_client(**kwargs):
+        clients.append(FakeMqttClient(handler, failures, refuse_socket))
+        return clients[-1]
+
+    monkeypatch.setattr(mqttHandler, "mqtt", types.SimpleNamespace(Client=new_client, MQTT_ERR_SUCCESS=0, MQTT_ERR_CONN_LOST=7), raising=False)
+    monkeypatch.setattr(handler, "housekeeping", lambda: None)
+    random.seed(1)
+
+    handler.run()
+
+    delays = handler.threadStop.delays
+    assert len(clients) == 1
+    assert clients[0].attempts == failures + 1
+    assert len(delays) == failures
+    for failed_connection_attempts, delay in enumerate(delays, start=1):
+        assert delay_cap(failed_connection_attempts) / 2.0 <= delay <= delay_cap(failed_connection_attempts)
+    assert handler.failed_connection_attempts == 0  # Reset by on_connect
+    assert plugin_globals[MQTT][MQTT_BROKER_DEV_ID][MQTT_CONNECTED]
+    assert handler.reconnects == (1 if failures > 0 and not refuse_socket else 0)
+
+
+@pytest.mark.parametrize("export_broker", [True, False], ids=["export broker", "other broker"])
+def test_export_broker_disconnect_forgets_the_published_nodes(export_broker):
+    # The next export must be published in full, as the MQTT Broker may have lost the retained export topics
+    plugin_globals = {MQTT: {MQTT_BROKER_DEV_ID: {MQTT_CONNECTED: True, MQTT_IP: "127.0.0.1", MQTT_PORT: 1883}},
+                      EXPORT: {MQTT_BROKERS: [MQTT_BROKER_DEV_ID] if export_broker else list(), EXPORT_CONNECTED: export_broker,
+                               EXPORT_PUBLISHED_NODES: {12345678}, EXPORT_PUBLISHER: mock.MagicMock()}}
+    handler = ThreadMqttHandler(plugin_globals, FakeStop(), MQTT_BROKER_DEV_ID)
+
+    handler.on_disconnect(None, None, 7)
+
+    assert not plugin_globals[EXPORT][EXPORT_CONNECTED]
+    assert plugin_globals[EXPORT][EXPORT_PUBLISHED_NODES] == (None if export_broker else {12345678})
@@ -0,0 +1,25 @@
+import queue
+import threading
+
+from constants import HE_HUB_STATISTICS, LATENCY_HISTOGRAMS, MQTT_HUB_QUEUE, QUEUES
+from hubHandler import ThreadHubHandler
+
+HUB_DEV_ID = 2001
+
+# Hubitat properties (fourth topic level) and their handlers, as received from Hubitat Elevation hubs
+RECEIVED_PROPERTIES = {"acceleration": "acceleration", "battery": "battery", "measure-battery": "battery", "button": "button", "color": "color",
+                       "color-mode": "color_mode", "color-name": "color_name", "color-temperature": "color_temperature", "contact": "contact",
+                       "dim": "dim", "energy": "energy", "measure-energy": "energy", "humidity": "humidity", "measure-humidity": "humidity",
+                       "illuminance": "illuminance", "measure-illuminance": "illuminance", "lock": "lock", "mode": "hvac_mode", "motion": "motion",
+                       "onoff": "onoff", "position": "position", "power": "power", "measure-power": "power", "presence": "presence_and_radar",
+                       "presence-sensor": "presence", "presence_derived": "radar", "presence_event": "radar", "pressure": "pressure",
+                       "measure-pressure": "pressure", "state": "hvac_state", "temperature": "temperature", "measure-temperature": "temperature",
+                       "thermostat-setpoint": "setpoint", "voltage": "voltage", "measure-voltage": "voltage"}
+
+
+def test_property_dispatch_table_is_built_from_the_supported_properties():
+    plugin_globals = {QUEUES: {MQTT_HUB_QUEUE: {HUB_DEV_ID: queue.Queue()}}, HE_HUB_STATISTICS: dict(), LATENCY_HISTOGRAMS: dict()}
+    handler = ThreadHubHandler(plugin_globals, HUB_DEV_ID, threading.Event())
+
+    assert {topic_property: property_handler.__name__ for topic_property, property_handler in handler.property_handlers.items()} == \
+           {topic_property: f"handle_property_{handler_name}" for topic_property, handler_name in RECEIVED_PROPERTIES.items()}